@@ -314,6 +314,9 @@ def company_notifications(request):
 def payment_company_history(request):
     return render(request, 'payment_company_history.html')
 
+from django.conf import settings
+
+
 @login_required
 def interview_applicant_main(request, unique_link):
     # Получаем интервью по уникальной ссылке
@@ -338,6 +341,7 @@ def interview_applicant_main(request, unique_link):
             'questions': questions,  # Передаем все вопросы в шаблон
             'vacancy': vacancy,
             'resume': resume,
+            'reply_mode': settings.AVATAR_REPLY_MODE,  # "video" или "audio"
         }
     )
 
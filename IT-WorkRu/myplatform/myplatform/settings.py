@@ -167,6 +167,10 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ответ аватара на собеседовании: "video" — готовое видео на каждом ходе,
+# "audio" — только озвучка поверх закэшированного цикла шаблона (меньше нагрузка на сервис аватара)
+AVATAR_REPLY_MODE = os.getenv('AVATAR_REPLY_MODE', 'video')
+
 CORS_ALLOWED_ORIGINS = [
     # "https://disruptively-trustful-oryx.cloudpub.ru",
     # Добавьте другие доверенные домены, если нужно
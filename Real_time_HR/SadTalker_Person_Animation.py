@@ -2,6 +2,7 @@ import os
 import glob
 import subprocess
 from argparse import ArgumentParser
+from media_assembly import convert_to_webm
 
 # Указываем путь к FFmpeg
 FFMPEG_PATH = r"E:\ffmpeg-7.1-full_build\bin"
@@ -23,40 +24,40 @@ EXPRESSION_SCALE = 1.0  # Масштаб выражения
 PREPROCESS = 'full'  # Метод предварительной обработки
 STILL_MODE = True  # Режим неподвижного тела
 CHECKPOINT_DIR = 'SadTalker/checkpoints'  # Путь к контрольным точкам
-VENV_PATH = 'SadTalker/venv/Scripts/activate.bat'  # Путь к активации виртуальной среды (для Windows)
+# Python виртуальной среды SadTalker (вызывается напрямую, без activate.bat и shell)
+SADTALKER_PYTHON = os.getenv(
+    "SADTALKER_PYTHON",
+    os.path.join("SadTalker", "venv", "Scripts", "python.exe") if os.name == "nt" else os.path.join("SadTalker", "venv", "bin", "python"),
+)
 
 # Функция для обработки аудио через CLI интерфейс SadTalker
 def process_audio_with_sadtalker(audio_path, image_path, output_video_path):
-    # Формируем команду для вызова inference.py с активацией виртуальной среды
-    command = f'"{VENV_PATH}" && python SadTalker/inference.py ' \
-              f'--driven_audio {audio_path} ' \
-              f'--source_image {image_path} ' \
-              f'--checkpoint_dir {CHECKPOINT_DIR} ' \
-              f'--result_dir . ' \
-              f'--pose_style {POSE_STYLE} ' \
-              f'--batch_size {BATCH_SIZE} ' \
-              f'--size {SIZE} ' \
-              f'--expression_scale {EXPRESSION_SCALE} ' \
-              f'--preprocess {PREPROCESS} ' \
-              f'--still' if STILL_MODE else ''
+    # Формируем команду для вызова inference.py интерпретатором виртуальной среды
+    command = [
+        SADTALKER_PYTHON, "SadTalker/inference.py",
+        "--driven_audio", audio_path,
+        "--source_image", image_path,
+        "--checkpoint_dir", CHECKPOINT_DIR,
+        "--result_dir", ".",
+        "--pose_style", str(POSE_STYLE),
+        "--batch_size", str(BATCH_SIZE),
+        "--size", str(SIZE),
+        "--expression_scale", str(EXPRESSION_SCALE),
+        "--preprocess", PREPROCESS,
+    ]
+    if STILL_MODE:
+        command.append("--still")
 
     # Запуск процесса с помощью subprocess
     try:
-        subprocess.run(command, check=True, shell=True)
+        subprocess.run(command, check=True)
     except subprocess.CalledProcessError as e:
         print(f"Ошибка при обработке аудио: {audio_path}")
         print(e)
 
 
-# Функция конвертации MP4 → WebM
-def convert_mp4_to_webm(input_path, output_path):
-    command = f'ffmpeg -i "{input_path}" -c:v libvpx-vp9 -b:v 1M -c:a libopus "{output_path}" -y'
-    try:
-        subprocess.run(command, check=True, shell=True)
-        print(f"✅ Конвертировано: {output_path}")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Ошибка при конвертации {input_path}")
-        print(e)
+# Функция конвертации MP4 → WebM (общая сборка медиа, без shell)
+convert_mp4_to_webm = convert_to_webm
 
 
 # Тестирование через if __name__ == "__main__"
@@ -0,0 +1,162 @@
+import os
+import re
+import json
+import asyncio
+
+from dotenv import load_dotenv
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+# --- Оценка ответов кандидата ---
+# turn — каждый ответ оценивается отдельным запросом в фоне хода;
+# deferred — пары вопрос/ответ копятся и оцениваются пачками после интервью;
+# compare — оценки по ходам идут в отчёт, пачкой считаются для сравнения согласованности
+SCORING_MODE = os.getenv("SCORING_MODE", "turn")
+SCORING_MODES = ("turn", "deferred", "compare")
+# Сколько ответов оценивается одним запросом к LLM
+SCORING_BATCH_SIZE = int(os.getenv("SCORING_BATCH_SIZE", 12))
+
+if SCORING_MODE not in SCORING_MODES:
+    raise ValueError(f"Неизвестный режим оценки: {SCORING_MODE}. Доступны: {', '.join(SCORING_MODES)}")
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+# Запасной разбор строк вида «3: 7», «3) Оценка: 7», «#3 — 7/10»
+_LINE_SCORE = re.compile(r"^\W*(\d+)\s*[\).:\-–—]+\s*(?:оценка\s*[:\-–—]?\s*)?(\d+)", re.IGNORECASE)
+
+
+def format_items(items):
+    """Пары для промпта: номер, навык, вопрос и ответ."""
+    blocks = []
+    for number, (skill, question, answer) in enumerate(items, 1):
+        blocks.append(f"#{number}\nНавык: {skill}\nВопрос: {question}\nОтвет кандидата: {answer}")
+    return "\n\n".join(blocks)
+
+
+def _load_json(text):
+    text = _FENCE.sub("", text.strip())
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    # Модель добавила пояснения вокруг JSON — берём самый внешний массив или объект
+    for opening, closing in (("[", "]"), ("{", "}")):
+        start, end = text.find(opening), text.rfind(closing)
+        if 0 <= start < end:
+            try:
+                return json.loads(text[start:end + 1])
+            except ValueError:
+                continue
+    return None
+
+
+def _to_score(value):
+    if isinstance(value, str):
+        match = re.search(r"\d+", value)
+        value = int(match.group()) if match else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return min(10, max(1, int(round(value))))
+    return None
+
+
+def parse_batch_scores(text, count):
+    """
+    Оценки из ответа модели на пачку из count ответов; отсутствующие — None.
+
+    Понимает массив объектов {"id": 1, "score": 7}, массив чисел, объект {"1": 7}
+    (в том числе внутри ```json и с текстом вокруг), а если JSON не разобрался —
+    строки «1: 7». Пустой ответ (None) — ни одной оценки.
+    """
+    scores = [None] * count
+    if not text:
+        return scores
+
+    def put(number, value):
+        try:
+            index = int(number) - 1
+        except (TypeError, ValueError):
+            return
+        if 0 <= index < count and scores[index] is None:
+            scores[index] = _to_score(value)
+
+    data = _load_json(text)
+    if isinstance(data, dict):
+        nested = next((data[key] for key in ("scores", "results", "оценки") if key in data), None)
+        if nested is not None:
+            data = nested
+        else:
+            for number, value in data.items():
+                put(number, value.get("score") if isinstance(value, dict) else value)
+            data = None
+    if isinstance(data, list):
+        for position, entry in enumerate(data, 1):
+            if isinstance(entry, dict):
+                number = entry.get("id", entry.get("номер", position))
+                put(number, entry.get("score", entry.get("оценка")))
+            else:
+                put(position, entry)
+
+    if all(score is None for score in scores):
+        for line in text.splitlines():
+            match = _LINE_SCORE.match(line.strip())
+            if match:
+                put(match.group(1), int(match.group(2)))
+    return scores
+
+
+async def score_batches(items, generate, build_prompt, batch_size=None):
+    """
+    Оценивает все пары (навык, вопрос, ответ) пачками; пачки отправляются параллельно.
+    build_prompt(текст пачки, размер) — промпт, generate — асинхронный вызов LLM.
+    Если пачка не оценилась (ошибка запроса, пустой ответ, пропущенные номера),
+    неоценённые ответы оцениваются по одному тем же промптом — сбой одной пачки
+    не роняет остальные. Возвращает оценки в порядке items (None — ответ так и не оценён).
+    """
+    batch_size = batch_size or SCORING_BATCH_SIZE
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+    async def score(batch):
+        try:
+            text = await generate(build_prompt(format_items(batch), len(batch)))
+        except Exception as e:
+            print(f"❌ Ошибка оценки пачки из {len(batch)} ответов: {e}")
+            text = None
+        scores = parse_batch_scores(text, len(batch))
+        missing = [index for index, value in enumerate(scores) if value is None]
+        if len(batch) > 1 and missing:
+            retried = await asyncio.gather(*(score([batch[index]]) for index in missing))
+            for index, (value,) in zip(missing, retried):
+                scores[index] = value
+        return scores
+
+    results = await asyncio.gather(*(score(batch) for batch in batches))
+    return [value for batch_scores in results for value in batch_scores]
+
+
+def scores_by_skill(items, scores, skills):
+    """Раскладывает оценки пачки по навыкам (в порядке вопросов)."""
+    by_skill = {skill: [] for skill in skills}
+    for (skill, _, _), score in zip(items, scores):
+        if score is not None:
+            by_skill.setdefault(skill, []).append(score)
+    return by_skill
+
+
+def score_agreement(reference, candidate):
+    """
+    Согласованность двух наборов оценок по навыкам (сравниваются по порядку):
+    средняя абсолютная разница, доля совпадений с точностью до балла и разница сумм.
+    """
+    pairs = [
+        (a, b)
+        for skill in reference
+        for a, b in zip(reference[skill], candidate.get(skill, []))
+    ]
+    if not pairs:
+        return {"pairs": 0, "mean_abs_diff": None, "within_one": None, "total_diff": 0}
+    return {
+        "pairs": len(pairs),
+        "mean_abs_diff": sum(abs(a - b) for a, b in pairs) / len(pairs),
+        "within_one": sum(abs(a - b) <= 1 for a, b in pairs) / len(pairs),
+        "total_diff": sum(b for _, b in pairs) - sum(a for a, _ in pairs),
+    }
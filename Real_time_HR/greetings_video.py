@@ -3,7 +3,8 @@ import shutil
 import glob
 from datetime import datetime
 from try_TTS_Yandex import text_to_audio
-from SadTalker_Person_Animation import process_audio_with_sadtalker, convert_mp4_to_webm
+from SadTalker_Person_Animation import process_audio_with_sadtalker
+from media_assembly import convert_to_webm
 import time  # Импортируем модуль time для измерения времени
 
 def generate_talking_head_video(image_path: str, gender: str, text: str) -> str:
@@ -55,7 +56,8 @@ def generate_talking_head_video(image_path: str, gender: str, text: str) -> str:
     # === Конвертация в WebM ===
     webm_path = final_mp4.replace(".mp4", ".webm")
     print(f"[WEBM] Конвертация в: {webm_path}")
-    convert_mp4_to_webm(final_mp4, webm_path)
+    if not convert_to_webm(final_mp4, webm_path):
+        raise RuntimeError(f"Не удалось сконвертировать {final_mp4}")
 
     # === Очистка ===
     os.remove(audio_path)
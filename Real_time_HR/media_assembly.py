@@ -0,0 +1,261 @@
+import os
+import re
+import math
+import time
+import struct
+import asyncio
+import tempfile
+import subprocess
+
+from dotenv import load_dotenv
+
+from turn_runtime import run_ffmpeg, run_io
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+# --- Сборка видео ответа из заранее подготовленного цикла шаблона ---
+LOOP_DIR = os.getenv("LOOP_TEMPLATE_DIR", "GREETINGS_TEMP")
+# Из шаблона берётся не больше стольких секунд: цикл туда-обратно вдвое длиннее
+LOOP_MAX_SECONDS = float(os.getenv("LOOP_MAX_SECONDS", 5))
+LOOP_FPS = int(os.getenv("LOOP_FPS", 25))
+# video — на каждом ходе готовое видео ответа; audio — только звук, цикл шаблона браузер кэширует и зацикливает сам
+REPLY_MODE = os.getenv("REPLY_MODE", "video")
+REPLY_MODES = ("video", "audio")
+# Сколько браузер хранит цикл шаблона: он не меняется до конца сессии
+TEMPLATE_CACHE_MAX_AGE = int(os.getenv("TEMPLATE_CACHE_MAX_AGE", 86400))
+
+_DURATION = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+# Заголовок страницы Ogg: OggS, версия, флаги, granule position, serial, номер, CRC, число сегментов
+_OGG_PAGE = struct.Struct("<4sBBqIIIB")
+# Хвост файла, в котором ищется последняя страница (страница Ogg не длиннее ~64 КБ)
+_OGG_TAIL = 65536 + _OGG_PAGE.size + 255
+
+
+def ogg_duration(path):
+    """
+    Длительность Ogg/Opus (или Ogg/Vorbis) по заголовкам, без декодирования:
+    granule position последней страницы — число отсчётов с начала потока.
+    Возвращает None, если файл не Ogg.
+    """
+    with open(path, "rb") as f:
+        head = f.read(_OGG_PAGE.size + 255 + 32)
+        if len(head) < _OGG_PAGE.size or not head.startswith(b"OggS"):
+            return None
+        segments = head[_OGG_PAGE.size - 1]
+        packet = head[_OGG_PAGE.size + segments:]
+        if packet.startswith(b"OpusHead"):
+            # Opus всегда считает отсчёты в 48 кГц; pre-skip — служебные отсчёты в начале
+            rate, pre_skip = 48000, struct.unpack_from("<H", packet, 10)[0]
+        elif packet.startswith(b"\x01vorbis"):
+            rate, pre_skip = struct.unpack_from("<I", packet, 12)[0], 0
+        else:
+            return None
+
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - _OGG_TAIL))
+        tail = f.read()
+
+    position = len(tail)
+    while True:
+        position = tail.rfind(b"OggS", 0, position)
+        if position < 0 or len(tail) - position < _OGG_PAGE.size:
+            return None
+        granule = _OGG_PAGE.unpack_from(tail, position)[3]
+        if granule >= 0:  # -1 — на странице не заканчивается ни один пакет
+            return max(0, granule - pre_skip) / rate
+
+
+def probe_duration(path):
+    """Длительность любого медиафайла из заголовка контейнера (по выводу ffmpeg -i)."""
+    result = subprocess.run(ffmpeg_args("-i", path, quiet=False), capture_output=True)
+    return _parse_duration(result.stderr, path)
+
+
+def _parse_duration(stderr, path):
+    match = _DURATION.search(stderr.decode("utf-8", "replace"))
+    if not match:
+        raise RuntimeError(f"Не удалось определить длительность {path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def audio_duration(path):
+    """Длительность ответа: для ogg — из заголовков страниц, иначе — через ffmpeg."""
+    duration = ogg_duration(path)
+    return probe_duration(path) if duration is None else duration
+
+
+async def media_duration(path):
+    """Асинхронный вариант audio_duration: ffmpeg запускается без блокировки цикла событий."""
+    duration = ogg_duration(path)
+    if duration is not None:
+        return duration
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_args("-i", path, quiet=False),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    return _parse_duration(stderr, path)
+
+
+def ffmpeg_args(*args, quiet=True):
+    """Аргументы вызова ffmpeg списком — запускается без shell."""
+    return ["ffmpeg", "-hide_banner", *(["-loglevel", "error"] if quiet else []), *args]
+
+
+def run_ffmpeg_sync(*args):
+    """Синхронный запуск ffmpeg (для скриптов вне цикла событий); при ошибке — CalledProcessError."""
+    return subprocess.run(ffmpeg_args(*args), capture_output=True, check=True).stdout
+
+
+def reply_video_args(template_video, audio_path, output_video, duration):
+    """
+    Один проход ffmpeg: шаблон зацикливается и обрезается под длительность ответа
+    фильтром, видео кодируется в VP9, opus-дорожка ответа копируется без перекодирования.
+    """
+    return [
+        "-stream_loop", "-1", "-i", template_video, "-i", audio_path,
+        "-filter_complex", f"[0:v]trim=duration={duration:.3f},setpts=PTS-STARTPTS[v]",
+        "-map", "[v]", "-map", "1:a:0",
+        "-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1",
+        "-c:a", "copy", output_video, "-y",
+    ]
+
+
+def render_reply_video(template_video, audio_path, output_video):
+    """Видео ответа по шаблону одним вызовом ffmpeg (синхронно)."""
+    run_ffmpeg_sync(*reply_video_args(template_video, audio_path, output_video, audio_duration(audio_path)))
+    return output_video
+
+
+def convert_to_webm(input_path, output_path):
+    """Конвертация видео (MP4 от SadTalker) в WebM: VP9 + Opus."""
+    try:
+        run_ffmpeg_sync("-i", input_path, "-c:v", "libvpx-vp9", "-b:v", "1M", "-c:a", "libopus", output_path, "-y")
+        print(f"✅ Конвертировано: {output_path}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Ошибка при конвертации {input_path}")
+        print(e.stderr.decode("utf-8", "replace"))
+        return False
+
+
+class LoopTemplate:
+    """Зацикливаемый фрагмент шаблона сессии: путь и длительность."""
+
+    def __init__(self, path, duration):
+        self.path = path
+        self.duration = duration
+
+
+async def prepare_loop_template(template_video, output_path):
+    """
+    Один раз перекодирует шаблон в бесшовный цикл: фрагмент и его обратное
+    воспроизведение (последний кадр совпадает с первым), постоянная частота кадров,
+    без звука, ключевой кадр в начале. Такие фрагменты склеиваются копированием потока.
+    """
+    loop = (
+        f"[0:v]trim=duration={LOOP_MAX_SECONDS},fps={LOOP_FPS},setpts=PTS-STARTPTS,split[fwd][bwd];"
+        f"[bwd]reverse[rev];[fwd][rev]concat=n=2:v=1:a=0[out]"
+    )
+    # Своё временное имя у каждой подготовки: воркеры, готовящие цикл одной сессии, не пишут в один файл
+    fd, temp_path = tempfile.mkstemp(
+        prefix=os.path.basename(output_path) + ".", suffix=".tmp.webm", dir=os.path.dirname(output_path) or ".",
+    )
+    os.close(fd)
+    try:
+        await run_ffmpeg(
+            "-i", template_video, "-filter_complex", loop, "-map", "[out]", "-an",
+            "-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1",
+            temp_path, "-y",
+        )
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return LoopTemplate(output_path, await media_duration(output_path))
+
+
+# Подготовленные циклы по сессиям: { session_id: LoopTemplate }
+_loops = {}
+_loop_tasks = {}
+
+
+async def get_loop_template(session_id, template_video):
+    """Цикл шаблона сессии; готовится при первом обращении, параллельные ходы ждут одну подготовку."""
+    loop = _loops.get(session_id)
+    if loop is not None and os.path.exists(loop.path):
+        return loop
+
+    task = _loop_tasks.get(session_id)
+    if task is None:
+        output_path = os.path.join(LOOP_DIR, f"loop_{session_id}.webm")
+        task = asyncio.ensure_future(prepare_loop_template(template_video, output_path))
+        _loop_tasks[session_id] = task
+    try:
+        loop = await asyncio.shield(task)
+    finally:
+        if task.done():
+            _loop_tasks.pop(session_id, None)
+    _loops[session_id] = loop
+    return loop
+
+
+async def prefetch_loop_template(session_id, template_video):
+    """Фоновая подготовка цикла при загрузке шаблона; ошибка повторится и всплывёт на первом ходе."""
+    try:
+        await get_loop_template(session_id, template_video)
+    except Exception as e:
+        print(f"[VIDEO] Не удалось подготовить цикл шаблона {session_id}: {e}")
+
+
+def forget_loop_template(session_id):
+    """Удаляет цикл шаблона завершённой сессии."""
+    loop = _loops.pop(session_id, None)
+    if loop is not None and os.path.exists(loop.path):
+        os.remove(loop.path)
+
+
+async def assemble_reply_video(loop, audio_path, output_video, scratch):
+    """
+    Видео ответа без перекодирования видео: цикл повторяется целыми фрагментами
+    (concat с копированием потока), поверх кладётся opus-дорожка ответа.
+    """
+    duration = await media_duration(audio_path)
+    repeats = max(1, math.ceil(duration / loop.duration))
+    loop_path = os.path.abspath(loop.path).replace("'", "'\\''")
+    playlist = await run_io(scratch.write, "loop_playlist.txt", (f"file '{loop_path}'\n" * repeats).encode("utf-8"))
+
+    await run_ffmpeg(
+        "-f", "concat", "-safe", "0", "-i", playlist, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-t", f"{duration:.3f}",
+        output_video, "-y",
+    )
+    return output_video
+
+
+async def reencode_reply_video(template_video, audio_path, output_video):
+    """Сборка с перекодированием VP9 на каждом ходе — запасной путь и точка сравнения задержки."""
+    duration = await media_duration(audio_path)
+    await run_ffmpeg(*reply_video_args(template_video, audio_path, output_video, duration))
+    return output_video
+
+
+async def measure_assembly(template_video, audio_path, scratch):
+    """Сравнивает задержку сборки ответа: перекодирование против склейки цикла."""
+    start = time.perf_counter()
+    await reencode_reply_video(template_video, audio_path, scratch.file("reencoded.webm"))
+    reencode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loop = await prepare_loop_template(template_video, scratch.file("loop.webm"))
+    prepare = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await assemble_reply_video(loop, audio_path, scratch.file("remuxed.webm"), scratch)
+    remux = time.perf_counter() - start
+    return {"reencode": reencode, "prepare_once": prepare, "remux": remux}
@@ -129,8 +129,7 @@ if __name__ == "__main__":
 '''
 import numpy as np
 import os
-import subprocess
-import librosa
+from media_assembly import render_reply_video
 from datetime import datetime
 from dotenv import load_dotenv
 from try_TTS_Yandex import text_to_audio  # Импортируем функцию синтеза речи
@@ -186,46 +185,6 @@ def record_audio(output_path, sample_rate=44100):
     write(output_path, sample_rate, audio_data)
     print(f"🎧 Аудио записано: {output_path}")
 
-# Функция для замены аудиодорожки в видео
-def replace_audio_in_video(template_video, new_audio, output_video):
-    """
-    Заменяет аудиодорожку в существующем видео.
-    :param template_video: Путь к шаблонному видео.
-    :param new_audio: Путь к новому аудиофайлу.
-    :param output_video: Путь для сохранения результата.
-    """
-    command = (
-        f'ffmpeg -i "{template_video}" -i "{new_audio}" '
-        f'-c:v copy -map 0:v:0 -map 1:a:0 -shortest "{output_video}" -y'
-    )
-    try:
-        subprocess.run(command, check=True, shell=True)
-        print(f"🎥 Видео с новым аудио создано: {output_video}")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Ошибка при обработке видео: {e}")
-
-# Функция для изменения длительности видео под аудио
-def adjust_video_duration(video_path, audio_path, output_video):
-    """
-    Изменяет длительность видео, чтобы она соответствовала длительности аудио.
-    :param video_path: Путь к исходному видео.
-    :param audio_path: Путь к аудиофайлу.
-    :param output_video: Путь для сохранения результата.
-    """
-    # Получаем длительность аудио
-    audio_duration = librosa.get_duration(path=audio_path)
-
-    # Создаем команду FFmpeg для изменения длительности видео
-    command = (
-        f'ffmpeg -stream_loop -1 -i "{video_path}" -i "{audio_path}" '
-        f'-c:v libvpx-vp9 -t {audio_duration} -c:a libopus "{output_video}" -y'
-    )
-    try:
-        subprocess.run(command, check=True, shell=True)
-        print(f"🎬 Видео адаптировано под аудио: {output_video}")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Ошибка при адаптации видео: {e}")
-
 def process_user_input():
     """
     Основная функция для обработки пользовательского ввода и создания видеоответа.
@@ -272,13 +231,10 @@ def process_user_input():
     template_video = os.path.join(GREETINGS_TEMP, template_video_name)
     print(f"[VIDEO] Используется шаблонное видео: {template_video}")
 
-    # === Шаг 6: Адаптация видео под новую аудиодорожку ===
-    adjusted_video = os.path.join(GREETINGS_TEMP, f"adjusted_video_{session_id}.webm")
-    adjust_video_duration(template_video, audio_path, adjusted_video)
-
-    # === Шаг 7: Замена аудиодорожки ===
+    # === Шаг 6: Видео ответа — один проход ffmpeg (длительность из заголовка ogg) ===
     output_video = os.path.join(TEMP_INFERENCE, f"final_response_{session_id}.webm")
-    replace_audio_in_video(adjusted_video, audio_path, output_video)
+    render_reply_video(template_video, audio_path, output_video)
+    print(f"🎥 Видео ответа создано: {output_video}")
 
     # === Общее время выполнения ===
     end_time = time.time()  # Конец замера времени
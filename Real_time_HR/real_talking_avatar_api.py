@@ -305,22 +305,59 @@ if __name__ == "__main__":
     # Запуск сервера FastAPI
     uvicorn.run(app, host="0.0.0.0", port=8101)'''
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Form
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 import os
-import shutil
-import subprocess
-import librosa
+import json
+import math
+import hashlib
+import asyncio
+import functools
 import uuid
 import time
-import requests
+from contextlib import AsyncExitStack, asynccontextmanager
 
 # Импорты из ваших модулей
 from try_TTS_Yandex import text_to_audio
-from try_generation_Yandex import generate_text
-from openai_whisper_STT import transcribe_wav_to_text
+from try_generation_Yandex import agenerate_text, astream_text
+from llm_client import close_llm_client
+from turn_runtime import turn_slot, run_cpu, run_io, run_ffmpeg, TurnsBusyError, shutdown_executors
+from scratch_files import TurnScratch, purge_stale_scratch
+from openai_whisper_STT import transcribe_audio_data
+from streaming_stt import StreamingTranscriber, store_final_transcript, take_final_transcript
+from reply_streaming import STREAM_REPLY, stream_reply_audio, start_reply_stream
+from session_store import InterviewSession, get_session_store
+from session_lifecycle import SessionLifecycle
+from session_tasks import SessionTasks
+from batch_scoring import SCORING_MODE, SCORING_BATCH_SIZE, score_batches, scores_by_skill, score_agreement
+from template_store import fetch_template
+from tts_cache import get_tts_cache
+from media_assembly import (
+    REPLY_MODE, REPLY_MODES, TEMPLATE_CACHE_MAX_AGE, get_loop_template, prefetch_loop_template,
+    forget_loop_template, assemble_reply_video, reencode_reply_video, media_duration,
+)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Запуск и остановка сервиса. Порядок остановки: уборка сессий, затем фоновые задачи
+    (оценки и отчёты успевают дописаться), затем пул соединений к LLM, которым они пользуются,
+    и последними — пулы потоков/процессов, в которых работают все предыдущие.
+    """
+    lifecycle.start()
+    try:
+        yield
+    finally:
+        await lifecycle.stop()
+        await session_tasks.drain(timeout=SHUTDOWN_TASKS_TIMEOUT)
+        # Закрываем пул keep-alive соединений к LLM
+        await close_llm_client()
+        await asyncio.to_thread(shutdown_executors)
+
+
+app = FastAPI(lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -330,28 +367,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Audio-Duration", "X-Template-Url", "ETag", "Retry-After"],
 )
 
 # --- Настройки ---
 os.environ["PATH"] += os.pathsep + r"E:\ffmpeg-7.1-full_build\bin"
 os.makedirs("GREETINGS_TEMP", exist_ok=True)
 os.makedirs("TEMP_INFERENCE", exist_ok=True)
+purge_stale_scratch()  # Удаляем папки ходов, оставшиеся после аварийной остановки
 
-# --- Сессии ---
-session_gender_map = {}
-session_skills_map = {}
-session_title_map = {}
-session_resume_map = {}
-
-# Хранение данных по сессиям
-session_history_map = {}  # история диалога
-session_base_questions_map = {}  # базовые вопросы
-session_question_stage_map = {}  # этапы по навыкам (0=базовый, 1-3=уточнения)
-session_skill_scores_map = {}  # оценки по каждому ответу
-session_first_answer_map = {}  # флаг первого сообщения
-session_completed_map = {}  # флаг завершения интервью
-session_address_map = {}  # { session_id: "Иван Петрович" }
-session_address_extracted_map = {}
+# Отчёт, который строится дольше этого, считается брошенным (например, воркер перезапустился)
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", 300))
+# Через сколько секунд клиенту стоит повторить запрос готовящегося отчёта
+REPORT_RETRY_AFTER = int(os.getenv("REPORT_RETRY_AFTER", 2))
+# Сколько при остановке сервиса ждать незавершённых оценок и отчётов
+SHUTDOWN_TASKS_TIMEOUT = float(os.getenv("SHUTDOWN_TASKS_TIMEOUT", 30))
+
+# --- Сессии: состояние интервью в общем хранилище (память процесса или SQLite для нескольких воркеров) ---
+sessions = get_session_store()
+# Оценка ответов идёт в фоне и дописывается в сессию под её блокировкой
+session_tasks = SessionTasks()
+# Просроченные и завершённые сессии удаляются вместе с их файлами в GREETINGS_TEMP/TEMP_INFERENCE
+lifecycle = SessionLifecycle(sessions, on_evict=[forget_loop_template, take_final_transcript, session_tasks.forget])
+
+
+@app.get("/session_stats/")
+async def session_stats():
+    """Число живых сессий и объём их файлов на диске."""
+    return await run_io(lifecycle.gauges)
+
+
+@app.get("/scoring_stats/")
+async def scoring_stats():
+    """Фоновые оценки ответов: в очереди, выполнено и сколько секунд вынесено с критического пути."""
+    return session_tasks.stats()
+
+
+@app.get("/tts_cache_stats/")
+async def tts_cache_stats():
+    """Попадания и промахи кэша синтезированных фраз."""
+    return get_tts_cache().stats()
 
 # --- Промпты ---
 
@@ -407,6 +462,23 @@ EVALUATION_PROMPT = SECURITY_BLOCK + """
 Комментарий: [краткий анализ]
 """
 
+BATCH_EVALUATION_PROMPT = SECURITY_BLOCK + """
+Оцените каждый из {count} ответов кандидата на вопросы интервью по шкале от 1 до 10.
+
+Учитывайте резюме кандидата — если у него мало опыта, оценивайте щадяще, если опыт большой — строже.
+
+Резюме кандидата:
+Специализация: {specialization}
+Ключевые навыки: {key_skills_str}
+Общий стаж: {general_experience}
+
+Ответы:
+{items}
+
+Формат ответа — только JSON-массив из {count} объектов в порядке номеров, без пояснений:
+[{{"id": 1, "score": 7}}, {{"id": 2, "score": 4}}]
+"""
+
 EXTRACT_ADDRESS_PROMPT = SECURITY_BLOCK + """
 Проанализируйте следующий текст и определите, как к человеку лучше обращаться.
 
@@ -479,24 +551,30 @@ async def upload_video_link(request: Request):
 
     # session_id = str(uuid.uuid4())
     session_id = interview_unique_link
-    session_gender_map[session_id] = gender
-    session_skills_map[session_id] = skills
-    session_title_map[session_id] = title
-    session_resume_map[session_id] = resume_data
-    session_first_answer_map[session_id] = True  # Добавлено
+    session = InterviewSession(session_id, gender=gender, skills=skills, title=title, resume=resume_data)
 
-    # Сохраняем видео
+    # Сохраняем видео: загрузка идёт параллельно с генерацией базовых вопросов,
+    # шаблон одной вакансии хранится один раз и не скачивается повторно
     video_path = os.path.join("GREETINGS_TEMP", f"uploaded_video_{session_id}.webm")
-    response = requests.get(f"http://127.0.0.1:8000/{video_url}", stream=True)
-    with open(video_path, "wb") as f:
-        for chunk in response.iter_content(1024):
-            if chunk:
-                f.write(chunk)
+    download = asyncio.ensure_future(fetch_template(video_url, video_path))
 
     # Генерируем базовые вопросы
     skills_list = [s.strip() for s in skills.split(',') if s.strip()]
     filled_prompt = BASE_QUESTIONS_PROMPT.format(title=title, skills_list=", ".join(skills_list))
-    base_questions_text = generate_text(filled_prompt)
+    try:
+        base_questions_text = await agenerate_text(filled_prompt)
+    except Exception:
+        download.cancel()
+        raise
+
+    try:
+        await download
+    except Exception as e:
+        print(f"❌ Не удалось загрузить видео {video_url}: {e}")
+        raise HTTPException(status_code=502, detail="Не удалось загрузить видео шаблона")
+
+    # Цикл шаблона готовится в фоне, пока идёт приветствие
+    asyncio.ensure_future(prefetch_loop_template(session_id, video_path))
 
     # Парсим вопросы
     base_questions = {}
@@ -508,10 +586,8 @@ async def upload_video_link(request: Request):
             base_questions[skill] = question
 
     # Инициализируем данные сессии
-    session_base_questions_map[session_id] = base_questions
-    session_question_stage_map[session_id] = {skill: 0 for skill in base_questions}
-    session_skill_scores_map[session_id] = {skill: [] for skill in base_questions}
-    session_history_map[session_id] = []
+    session.start(base_questions)
+    sessions.save(session)
 
     return {
         "status": "Видео успешно загружено",
@@ -520,16 +596,12 @@ async def upload_video_link(request: Request):
     }
 
 
-def get_next_skill(session_id):
-    stages = session_question_stage_map.get(session_id, {})
-    for skill, stage in stages.items():
-        if stage < 3:  # Теперь этапы: 0 (базовый), 1 (1-е уточнение), 2 (2-е уточнение)
-            return skill
-    return None
-
-
-def evaluate_answer(session_id, skill, question, answer):
-    resume = session_resume_map.get(session_id, {})
+async def evaluate_answer(session_id, resume, skill, question, answer):
+    """
+    Оценка ответа вне критического пути хода: запускается в фоне (session_tasks.spawn),
+    оценка дописывается в сессию из хранилища под блокировкой сессии.
+    """
+    start = time.perf_counter()
     specialization = resume.get("specialization", "не указана")
     key_skills = resume.get("key_skills", [])
     general_experience = resume.get("general_experience", "не указан")
@@ -543,7 +615,7 @@ def evaluate_answer(session_id, skill, question, answer):
         key_skills_str=key_skills_str,
         general_experience=general_experience
     )
-    evaluation_text = generate_text(filled_prompt)
+    evaluation_text = await agenerate_text(filled_prompt)
 
     try:
         score_line = [line for line in evaluation_text.split("\n") if "Оценка:" in line][0]
@@ -553,89 +625,278 @@ def evaluate_answer(session_id, skill, question, answer):
             score_str = score_str[:-1]
 
         score = int(score_str)
-        session_skill_scores_map[session_id][skill].append(score)
-
-        print(f"[ОЦЕНКА] {skill}: {score} | Ответ: {answer[:30]}...")
     except Exception as e:
         print(f"❌ Ошибка парсинга оценки: {e}")
+        return
+
+    async with session_tasks.lock(session_id):
+        session = sessions.get(session_id)
+        if session is None:
+            return
+        session.skill_scores[skill].append(score)
+        sessions.save(session)
+
+    print(f"[ОЦЕНКА] {skill}: {score} за {time.perf_counter() - start:.2f} с в фоне | Ответ: {answer[:30]}...")
+
+
+def resume_fields(resume):
+    """Поля резюме для промптов оценки."""
+    key_skills = resume.get("key_skills", [])
+    return {
+        "specialization": resume.get("specialization", "не указана"),
+        "key_skills_str": ", ".join(key_skills) if key_skills else "не указаны",
+        "general_experience": resume.get("general_experience", "не указан"),
+    }
+
+
+async def score_deferred(session_id):
+    """
+    Отложенная оценка (SCORING_MODE=deferred/compare): накопленные за интервью ответы
+    оцениваются пачками по SCORING_BATCH_SIZE — один-два запроса к LLM вместо запроса на каждый ход.
+    Вызывается из build_report перед запросом отчёта.
+    Неоценённые ответы остаются в qa_log; в режиме deferred отчёт по неполным оценкам
+    не строится — исключение уходит в build_report, и следующий /get_results/ повторит оценку.
+    """
+    session = sessions.get(session_id)
+    if session is None or not session.qa_log:
+        return
+    items = [tuple(item) for item in session.qa_log]
+    fields = resume_fields(session.resume)
+
+    start = time.perf_counter()
+    scores = await score_batches(
+        items, agenerate_text,
+        lambda text, count: BATCH_EVALUATION_PROMPT.format(items=text, count=count, **fields),
+    )
+    batches = math.ceil(len(items) / SCORING_BATCH_SIZE)
+    print(f"[ОЦЕНКА] Пачкой: {len(items)} ответов за {batches} запрос(а) к LLM, {time.perf_counter() - start:.2f} с")
+    missing = scores.count(None)
+    if missing:
+        print(f"❌ Модель не оценила {missing} из {len(items)} ответов")
+    unscored = [list(item) for item, score in zip(items, scores) if score is None]
+
+    if SCORING_MODE == "compare":
+        # Оценки по ходам должны успеть дописаться, чтобы сравнение было полным
+        await session_tasks.wait(session_id, kind="evaluate")
+
+    async with session_tasks.lock(session_id):
+        session = sessions.get(session_id)
+        if session is None:
+            return
+        batched = scores_by_skill(items, scores, session.skill_order)
+        if SCORING_MODE == "compare":
+            agreement = score_agreement(session.skill_scores, batched)
+            print(f"[ОЦЕНКА] По ходам: {session.skill_scores} | пачкой: {batched} | согласованность: {agreement}")
+        else:
+            # Оценки дописываются: при повторе пачкой оцениваются только оставшиеся ответы
+            for skill, skill_scores in batched.items():
+                session.skill_scores.setdefault(skill, []).extend(skill_scores)
+        session.qa_log = unscored + session.qa_log[len(items):]
+        sessions.save(session)
+
+    if unscored and SCORING_MODE == "deferred":
+        raise RuntimeError(f"не оценено {len(unscored)} из {len(items)} ответов")
+
+
+async def print_final_scores(session_id):
+    """Итоговая оценка в лог — после того, как завершились фоновые оценки ответов."""
+    await session_tasks.wait(session_id)
+    session = sessions.get(session_id)
+    if session is None:
+        return
+    scores = session.skill_scores
+    total_score = sum(sum(scores[skill]) for skill in scores)
+    max_score = sum(10 * 3 for skill in scores)  # 3 оценки × 10 баллов
+    percentage_score = (total_score / max_score) * 100 if max_score > 0 else 0
+
+    print("\n📊 ИТОГОВАЯ ОЦЕНКА:")
+    print(f"Общий балл: {total_score}/{max_score}")
+    print(f"Процент соответствия: {percentage_score:.2f}%\n")
+
+    for skill, skill_scores in scores.items():
+        print(f"🔹 {skill}: {sum(skill_scores)} баллов")
+        print(f"   Подробности: {skill_scores}")
+
+
+@app.websocket("/ws/stt/{session_id}")
+async def stream_stt(websocket: WebSocket, session_id: str):
+    """
+    Потоковое распознавание ответа: браузер шлёт куски записи (бинарные сообщения)
+    во время речи, сервер отвечает промежуточным текстом {"type": "partial"}.
+    По текстовому сообщению "stop" распознаётся остаток, текст сохраняется для
+    /process_audio/ и отправляется клиенту как {"type": "final"}.
+    """
+    await websocket.accept()
+    transcriber = StreamingTranscriber()
+    await transcriber.start()
+    pending = None
+
+    async def send_partial():
+        text = await transcriber.maybe_transcribe()
+        if text is not None:
+            await websocket.send_json({"type": "partial", "text": text, "audio_seconds": transcriber.audio_seconds})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes"):
+                await transcriber.feed(message["bytes"])
+                # Не больше одного прохода за раз: приём кусков не ждёт распознавания
+                if pending is None or pending.done():
+                    pending = asyncio.create_task(send_partial())
+            elif message.get("text") == "stop":
+                if pending is not None:
+                    await pending
+                start_time = time.time()
+                text = await transcriber.finish()
+                store_final_transcript(session_id, text)
+                print(f"[STT] Потоковый текст готов через {time.time() - start_time:.2f} с после остановки "
+                      f"({transcriber.audio_seconds:.1f} с аудио, проходов: {transcriber.passes})")
+                await websocket.send_json({"type": "final", "text": text, "audio_seconds": transcriber.audio_seconds})
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Обрыв соединения или любая ошибка: декодер и проход распознавания не должны остаться висеть
+        if pending is not None and not pending.done():
+            pending.cancel()
+        transcriber.abort()
 
 
 @app.post("/process_audio/")
-async def process_audio(file: UploadFile = File(...), session_id: str = Form(...)):
-    if session_id in session_completed_map:
+async def process_audio(file: UploadFile = File(None), session_id: str = Form(...), streamed: bool = Form(False),
+                        reply_mode: str = Form(None)):
+    session = sessions.get(session_id)
+    if session is not None and session.completed:
         raise HTTPException(status_code=400, detail="Интервью уже завершено")
+    reply_mode = reply_mode or REPLY_MODE
+    if reply_mode not in REPLY_MODES:
+        raise HTTPException(status_code=400, detail=f"Неизвестный режим ответа: {reply_mode}")
+    # Ограничиваем число одновременных ходов: остальные ждут в очереди, не блокируя сервер
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(turn_slot())
+    except TurnsBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    try:
+        response = await run_turn(file, session_id, streamed, reply_mode)
+    except BaseException:
+        await slot.aclose()
+        raise
+    turn_task = getattr(response, "turn_task", None)
+    if turn_task is None:
+        await slot.aclose()
+    else:
+        # Ответ досылается потоком: слот освобождается, когда ход озвучен до конца
+        turn_task.add_done_callback(lambda _: asyncio.ensure_future(slot.aclose()))
+    return response
+
+
+async def save_turn(session_id, session):
+    """
+    Сохраняет состояние хода: его видят другие воркеры.
+    Оценки пишет только фоновая задача — берём их актуальными из хранилища.
+    """
+    async with session_tasks.lock(session_id):
+        stored = sessions.get(session_id)
+        if stored is not None and stored is not session:
+            session.skill_scores = stored.skill_scores
+        sessions.save(session)
+
+
+async def run_turn(file: UploadFile, session_id: str, streamed: bool = False, reply_mode: str = "video"):
+    # Все файлы хода — в собственной временной папке: параллельные кандидаты не мешают друг другу
+    scratch = TurnScratch(session_id)
     try:
         start_time = time.time()
         print("⏳ Начало обработки запроса...")
 
-        # === Шаг 1: Сохранение аудио ===
-        audio_file_path = os.path.join("GREETINGS_TEMP", "user_input.wav")
-        with open(audio_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # === Шаг 2: Распознавание речи ===
-        user_text = transcribe_wav_to_text(audio_file_path)
+        # === Шаги 1–2: Текст ответа — готовый из /ws/stt/ или распознанный из загрузки ===
+        user_text = take_final_transcript(session_id) if streamed else None
+        if user_text is not None:
+            print("[STT] Используется текст потокового распознавания")
+        else:
+            if file is None:
+                raise ValueError("Не передан аудиофайл, а потоковый текст не найден")
+            # Аудио остаётся в памяти, на диск не пишется; распознавание — в пуле STT
+            upload_bytes = await file.read()
+            user_text = await run_cpu(transcribe_audio_data, upload_bytes)
         print(f"[STT] Распознанный текст: {user_text}")
 
         # === Шаг 3: Ответ от AI ===
-        if session_id not in session_base_questions_map:
+        session = sessions.get(session_id)
+        if session is None or not session.base_questions:
             raise ValueError("Базовые вопросы не найдены для этой сессии")
 
-        history = session_history_map[session_id]
-        history.append({"user": user_text})
+        # Вопрос, на который отвечал кандидат, — последняя реплика AI, и навык, по которому он задан
+        answered_question, answered_skill = session.last_reply(), session.asked_skill
+        session.add_answer(user_text)
 
-        is_first_answer = session_first_answer_map.get(session_id, False)
+        is_first_answer = session.first_answer
+
+        gender = session.gender
+        voice = "zahar" if gender == "МУЖ" else "oksana"
+        audio_path = None  # заполняется заранее, если ответ озвучивался по предложениям
 
         # Это первый ответ — извлекаем обращение
         if is_first_answer:
-            if session_address_map.get(session_id) is None:
+            if session.address is None:
                 filled_prompt = EXTRACT_ADDRESS_PROMPT.format(user_text=user_text)
-                address_response = generate_text(filled_prompt)
+                address_response = await agenerate_text(filled_prompt)
                 address = address_response.strip()
-                session_address_map[session_id] = address
+                session.address = address
                 print(f"[INFO] Обращение установлено: {address}")
 
             # Помечаем, что первый ответ уже был
-            session_first_answer_map[session_id] = True
-
-        current_skill = get_next_skill(session_id)
+            session.first_answer = True
+
+        # Ответ оценивается по навыку заданного вопроса: этап к этому моменту мог перейти к следующему навыку
+        if answered_skill is not None:
+            if SCORING_MODE != "turn":
+                # Отложенная оценка: пара копится в сессии и оценивается пачкой после интервью
+                session.qa_log.append([answered_skill, answered_question, user_text])
+            if SCORING_MODE != "deferred":
+                # Оценка ответа (отдельный запрос к LLM) идёт параллельно с генерацией
+                # следующего вопроса, синтезом и видео: кандидат её не ждёт
+                session_tasks.spawn(session_id, evaluate_answer(
+                    session_id, session.resume, answered_skill, answered_question, user_text,
+                ), kind="evaluate")
+
+        # Этапы: 0 (базовый), 1 (1-е уточнение), 2 (2-е уточнение); пройденные навыки пропускаются сразу
+        current_skill = session.current_skill
 
         if not current_skill:
-            address = session_address_map.get(session_id, "Кандидат")
+            address = session.address or "Кандидат"
             response_text = f"{address}, благодарю за интервью. Мы свяжемся с вами в ближайшее время."
             response_text = clean_response_text(response_text)
-            history[-1]["ai"] = response_text
+            session.set_reply(response_text)
 
-            session_completed_map[session_id] = True
+            session.completed = True
 
-            # Печать итоговых результатов
-            scores = session_skill_scores_map[session_id]
-            total_score = sum(sum(scores[skill]) for skill in scores)
-            max_score = sum(10 * 3 for skill in scores)  # 3 оценки × 10 баллов
-            percentage_score = (total_score / max_score) * 100
-
-            print("\n📊 ИТОГОВАЯ ОЦЕНКА:")
-            print(f"Общий балл: {total_score}/{max_score}")
-            print(f"Процент соответствия: {percentage_score:.2f}%\n")
-
-            for skill, skill_scores in scores.items():
-                print(f"🔹 {skill}: {sum(skill_scores)} баллов")
-                print(f"   Подробности: {skill_scores}")
+            # Печать итоговых результатов — когда допишутся фоновые оценки
+            asyncio.ensure_future(print_final_scores(session_id))
+            # Отчёт строится сразу, пока кандидат смотрит прощальное видео;
+            # накопленные ответы (SCORING_MODE=deferred/compare) оцениваются пачкой в его начале
+            session.report_started = time.time()
+            session_tasks.spawn(session_id, build_report(session_id), kind="report")
 
         else:
-            base_questions = session_base_questions_map[session_id]
-            stages = session_question_stage_map[session_id]
-            stage = stages[current_skill]
+            base_questions = session.base_questions
+            stage = session.current_stage
+            asked_skill = current_skill  # уточнения и базовый вопрос — по текущему навыку
 
             if stage == 0:
-                address = session_address_map.get(session_id, "Кандидат")
+                address = session.address or "Кандидат"
                 response_text = f"{address}, {base_questions[current_skill]}"
                 response_text = clean_response_text(response_text)
-                evaluate_answer(session_id, current_skill, response_text, user_text)
-                stages[current_skill] = 1
+                session.advance_stage()
             elif stage in [1, 2, 3]:  # Теперь обрабатываем 3 этапа
                 last_answer = user_text
-                resume = session_resume_map.get(session_id, {})
+                resume = session.resume
                 specialization = resume.get("specialization", "не указана")
                 key_skills = resume.get("key_skills", [])
                 general_experience = resume.get("general_experience", "не указан")
@@ -649,75 +910,211 @@ async def process_audio(file: UploadFile = File(...), session_id: str = Form(...
                     key_skills_str=key_skills_str,
                     general_experience=general_experience
                 )
-                response_text = generate_text(filled_prompt)
+                if STREAM_REPLY and reply_mode == "audio":
+                    # Предложения уходят клиенту по мере синтеза: первое звучит, пока модель дописывает остальные.
+                    # Состояние хода сохраняется, когда ответ сгенерирован целиком
+                    async def complete_turn(text):
+                        session.advance_stage()
+                        session.set_reply(clean_response_text(text), current_skill)
+                        await save_turn(session_id, session)
+
+                    turn_task, lines = start_reply_stream(
+                        astream_text(filled_prompt),
+                        functools.partial(text_to_audio, voice=voice),
+                        prepare=clean_response_text,
+                        on_complete=complete_turn,
+                        spawn=functools.partial(session_tasks.spawn, session_id, kind="reply"),
+                    )
+                    scratch.cleanup()
+                    print(f"⏱️ До начала потокового ответа: {time.time() - start_time:.2f} секунд")
+                    response = StreamingResponse(lines, media_type="application/x-ndjson",
+                                                 headers={"X-Template-Url": f"/template_video/{session_id}"})
+                    response.turn_task = turn_task
+                    return response
+                if STREAM_REPLY:
+                    # Синтез каждого предложения начинается, как только модель его закончила;
+                    # видео собирается после склейки всех предложений
+                    reply_start = time.perf_counter()
+                    response_text, audio_path, first_audio = await stream_reply_audio(
+                        astream_text(filled_prompt),
+                        functools.partial(text_to_audio, voice=voice),
+                        scratch,
+                        prepare=clean_response_text,
+                    )
+                    print(f"[TTS] Первое предложение синтезировано через {first_audio:.2f} с после запроса к LLM, "
+                          f"ответ озвучен и склеен через {time.perf_counter() - reply_start:.2f} с")
+                else:
+                    response_text = await agenerate_text(filled_prompt)
                 response_text = clean_response_text(response_text)
-                evaluate_answer(session_id, current_skill, response_text, user_text)
-                stages[current_skill] += 1
+                session.advance_stage()
             else:
                 response_text = "Перейдем к следующему навыку."
-                stages[current_skill] = 3  # помечаем как завершённый
-
-            history[-1]["ai"] = response_text
-            session_history_map[session_id] = history
-            session_question_stage_map[session_id] = stages
-
-        # === Шаг 4: Синтез речи ===
-        audio_path = os.path.join("GREETINGS_TEMP", f"response_audio_{session_id}.ogg")
-        gender = session_gender_map.get(session_id)
-        voice = "zahar" if gender == "МУЖ" else "oksana"
-        audio_bytes = text_to_audio(response_text, voice=voice)
-        with open(audio_path, "wb") as f:
-            f.write(audio_bytes)
-
-        # === Шаг 5: Обработка видео ===
+                session.advance_stage(3)  # помечаем как завершённый
+                asked_skill = None
+
+            session.set_reply(response_text, asked_skill)
+
+        # Состояние хода сохраняется до синтеза и видео
+        await save_turn(session_id, session)
+
+        # === Шаг 4: Синтез речи (блокирующий SDK — в пуле ввода-вывода) ===
+        if audio_path is None:
+            audio_bytes = await run_io(text_to_audio, response_text, voice=voice)
+            audio_path = await run_io(scratch.write, "response_audio.ogg", audio_bytes)
+
+        if reply_mode == "audio":
+            # Видео не собираем: браузер зацикливает закэшированный шаблон под длительность звука
+            audio_duration = await media_duration(audio_path)
+            if session.completed:
+                forget_loop_template(session_id)
+            print(f"⏱️ Общее время выполнения: {time.time() - start_time:.2f} секунд (только аудио)")
+            return FileResponse(
+                audio_path, media_type="audio/ogg", filename="response_audio.ogg",
+                headers={
+                    "X-Audio-Duration": f"{audio_duration:.3f}",
+                    "X-Template-Url": f"/template_video/{session_id}",
+                },
+                background=BackgroundTask(scratch.cleanup),
+            )
+
+        # === Шаг 5: Видео ответа — склейка готового цикла шаблона без перекодирования ===
         video_filename = f"uploaded_video_{session_id}.webm"
         template_video = os.path.join("GREETINGS_TEMP", video_filename)
-        adjusted_video = os.path.join("GREETINGS_TEMP", f"adjusted_video_{session_id}.webm")
-        output_video = os.path.join("TEMP_INFERENCE", f"final_response_{session_id}.webm")
-
-        adjust_video_duration(template_video, audio_path, adjusted_video)
-        replace_audio_in_video(adjusted_video, audio_path, output_video)
+        output_video = scratch.file("final_response.webm")
+
+        video_start = time.perf_counter()
+        try:
+            loop = await get_loop_template(session_id, template_video)
+        except Exception as e:
+            # Цикл не подготовился — собираем видео одним проходом с перекодированием
+            print(f"[VIDEO] Цикл шаблона недоступен ({e}), перекодирование шаблона")
+            await reencode_reply_video(template_video, audio_path, output_video)
+        else:
+            await assemble_reply_video(loop, audio_path, output_video, scratch)
+        print(f"[VIDEO] Сборка видео ответа: {time.perf_counter() - video_start:.2f} с")
+        if session.completed:
+            # Прощальное видео собрано — цикл шаблона больше не понадобится
+            forget_loop_template(session_id)
 
         end_time = time.time()
         total_time = end_time - start_time
         print(f"⏱️ Общее время выполнения: {total_time:.2f} секунд")
 
-        return FileResponse(output_video, media_type="video/webm", filename="response_video.webm")
+        # Папка хода удаляется после того, как видео отправлено клиенту
+        return FileResponse(output_video, media_type="video/webm", filename="response_video.webm",
+                            background=BackgroundTask(scratch.cleanup))
 
     except Exception as e:
+        scratch.cleanup()
         print(f"❌ Ошибка в /process_audio/: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Произошла ошибка: {str(e)}")
 
 
-def adjust_video_duration(video_path, audio_path, output_video):
-    audio_duration = librosa.get_duration(path=audio_path)
-    command = (
-        f'ffmpeg -stream_loop -1 -i "{video_path}" -i "{audio_path}" '
-        f'-c:v libvpx-vp9 -t {audio_duration} -c:a libopus "{output_video}" -y'
-    )
-    subprocess.run(command, check=True, shell=True)
+@app.get("/template_video/{session_id}")
+async def template_video(session_id: str):
+    """Цикл шаблона аватара для режима audio: отдаётся один раз за сессию и кэшируется браузером."""
+    template_path = os.path.join("GREETINGS_TEMP", f"uploaded_video_{session_id}.webm")
+    if sessions.get(session_id) is None or not os.path.exists(template_path):
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+    loop = await get_loop_template(session_id, template_path)
+    return FileResponse(loop.path, media_type="video/webm",
+                        headers={"Cache-Control": f"private, max-age={TEMPLATE_CACHE_MAX_AGE}, immutable"})
 
 
-def replace_audio_in_video(template_video, new_audio, output_video):
-    command = (
-        f'ffmpeg -i "{template_video}" -i "{new_audio}" '
-        f'-c:v copy -map 0:v:0 -map 1:a:0 -shortest "{output_video}" -y'
-    )
-    subprocess.run(command, check=True, shell=True)
+def report_etag(report):
+    body = json.dumps(report, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+async def build_report(session_id):
+    """
+    Итоговый отчёт строится один раз после завершения интервью (в фоне) и сохраняется
+    в сессии с ETag; /get_results/ отдаёт его без повторного запроса к LLM.
+    """
+    # Отчёт строится по всем оценкам: дожидаемся фоновых оценок последних ответов
+    await session_tasks.wait(session_id, kind="evaluate")
+    session = sessions.get(session_id)
+    if session is None or session.report is not None:
+        return
+    start = time.perf_counter()
+    try:
+        if session.qa_log:
+            # Накопленные ответы оцениваются пачкой здесь же, до запроса отчёта
+            await score_deferred(session_id)
+            session = sessions.get(session_id)
+        report = await generate_report(session)
+    except Exception as e:
+        # Отчёт не кэшируется: следующий запрос /get_results/ запустит построение заново
+        print(f"❌ Не удалось сгенерировать отчёт {session_id}: {e}")
+        async with session_tasks.lock(session_id):
+            session = sessions.get(session_id)
+            if session is not None:
+                session.report_started = 0.0
+                sessions.save(session)
+        return
+
+    async with session_tasks.lock(session_id):
+        session = sessions.get(session_id)
+        if session is None:
+            return
+        session.report = report
+        session.report_etag = report_etag(report)
+        session.report_started = 0.0
+        sessions.save(session)
+    print(f"[ОТЧЁТ] Отчёт {session_id} готов за {time.perf_counter() - start:.2f} с")
 
 
 @app.get("/get_results/{session_id}")
-async def get_results(session_id: str):
-    if session_id not in session_skill_scores_map:
+async def get_results(session_id: str, request: Request):
+    """
+    Готовый отчёт — 200 с ETag (304, если у клиента та же версия);
+    202 — интервью ещё идёт или отчёт ещё строится (повторить через Retry-After секунд).
+    """
+    session = sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Сессия не найдена")
 
+    if session.report is not None:
+        headers = {"ETag": session.report_etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), session.report_etag):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(session.report, headers=headers)
+
+    if session.completed:
+        building = session_tasks.pending(session_id) or time.time() - session.report_started < REPORT_TIMEOUT
+        if not building:
+            # Построение не запускалось или сорвалось — запускаем заново
+            async with session_tasks.lock(session_id):
+                session = sessions.get(session_id) or session
+                session.report_started = time.time()
+                sessions.save(session)
+            session_tasks.spawn(session_id, build_report(session_id), kind="report")
+
+    return JSONResponse(
+        {"session_id": session_id, "status": "pending" if session.completed else "in_progress",
+         "completed": session.completed},
+        status_code=202,
+        headers={"Retry-After": str(REPORT_RETRY_AFTER)},
+    )
+
+
+async def generate_report(session):
+    """Детальный отчёт по интервью: метрики, ответы и анализ LLM."""
+    session_id = session.session_id
+
     # --- Сбор данных ---
-    scores = session_skill_scores_map[session_id]
-    history = session_history_map[session_id]
-    resume = session_resume_map.get(session_id, {})
-    title = session_title_map.get(session_id, "не указана")
-    vacancy_skills = session_skills_map.get(session_id, "не указаны")
-    user_answers = [item["user"] for item in history if "user" in item]
+    scores = session.skill_scores
+    resume = session.resume
+    title = session.title or "не указана"
+    vacancy_skills = session.skills or "не указаны"
+    user_answers = session.answers()
     combined_user_answers = " ".join(user_answers)
 
     # --- Расчёт итоговых метрик ---
@@ -821,18 +1218,13 @@ async def get_results(session_id: str):
 - В разделах 4 и 5 имитируй структуру JSON-анализа, но оформляй как человекочитаемый текст.
 """
 
-    try:
-        full_report = generate_text(report_prompt)
-    except Exception as e:
-        full_report = f"❌ Не удалось сгенерировать отчёт. Ошибка: {str(e)}"
+    full_report = await agenerate_text(report_prompt)
+    if not full_report or not full_report.strip():
+        # agenerate_text возвращает None при ошибке API (429, 5xx, 401) — такой отчёт не кэшируется
+        raise RuntimeError("LLM не вернула текст отчёта")
 
     # --- Формируем лог диалога ---
-    conversation_log = []
-    for entry in history:
-        if "user" in entry:
-            conversation_log.append(f"Пользователь: {entry['user']}")
-        if "ai" in entry:
-            conversation_log.append(f"Бот: {entry['ai']}")
+    conversation_log = session.conversation_log()
 
     # --- Возвращаем результат ---
     return {
@@ -849,19 +1241,14 @@ async def get_current_question(session_id: str):
     Возвращает последний сгенерированный вопрос по session_id.
     """
 
-    if session_id not in session_history_map:
+    session = sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Сессия не найдена")
 
-    history = session_history_map[session_id]
-
-    if not history:
+    if not session.history:
         return {"question": "Нет активных вопросов"}
 
-    last_ai_message = ""
-    for entry in reversed(history):  # ищем последнее сообщение от AI
-        if "ai" in entry:
-            last_ai_message = entry["ai"]
-            break
+    last_ai_message = session.last_reply()  # последнее сообщение от AI
 
     if not last_ai_message or "Благодарю за интервью" in last_ai_message:
         return {"question": "Интервью завершено"}
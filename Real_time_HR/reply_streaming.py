@@ -0,0 +1,210 @@
+import os
+import re
+import json
+import time
+import base64
+import asyncio
+
+from dotenv import load_dotenv
+
+from turn_runtime import run_io, run_ffmpeg
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+# --- Озвучивание ответа по предложениям, пока модель ещё генерирует текст ---
+# В режиме audio клиент получает предложения потоком (start_reply_stream) и начинает
+# воспроизведение с первого; для видео предложения склеиваются в один файл (stream_reply_audio)
+# 0 — прежний режим: ждать весь ответ модели и озвучивать его целиком
+STREAM_REPLY = os.getenv("STREAM_REPLY", "1") == "1"
+# Более короткие предложения склеиваются со следующим: слишком мелкие куски звучат рвано
+SENTENCE_MIN_CHARS = int(os.getenv("TTS_SENTENCE_MIN_CHARS", 25))
+# Сколько предложений синтезируется одновременно
+TTS_SENTENCE_PARALLEL = int(os.getenv("TTS_SENTENCE_PARALLEL", 2))
+
+# Конец предложения: знак препинания (с закрывающими кавычками/скобками) и пробел
+_SENTENCE_END = re.compile(r'[.!?…]+["»)]*\s+')
+# Сокращения, после которых точка не завершает предложение
+_ABBREVIATIONS = {"т.е", "т.д", "т.п", "т.к", "др", "пр", "см", "напр", "г", "гг", "руб", "тыс", "млн", "им", "англ"}
+
+
+class SentenceSplitter:
+    """Инкрементально выделяет законченные предложения из потока фрагментов текста."""
+
+    def __init__(self, min_chars=None):
+        self.min_chars = SENTENCE_MIN_CHARS if min_chars is None else min_chars
+        self.buffer = ""
+
+    def _is_boundary(self, text, match):
+        if text[match.start()] != ".":
+            return True
+        words = text[:match.start()].split()
+        if not words:
+            return False
+        last = words[-1].lower().lstrip("(«\"")
+        # Сокращение («т.д.») или инициал («И. Петров»)
+        if last in _ABBREVIATIONS or (len(last) == 1 and last.isalpha()):
+            return False
+        return True
+
+    def feed(self, fragment):
+        """Добавляет фрагмент; возвращает список предложений, которые уже закончились."""
+        self.buffer += fragment
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self.buffer):
+            if not self._is_boundary(self.buffer, match):
+                continue
+            sentence = self.buffer[start:match.end()].strip()
+            if len(sentence) < self.min_chars:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+        self.buffer = self.buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Возвращает остаток текста после окончания потока."""
+        rest, self.buffer = self.buffer.strip(), ""
+        return [rest] if rest else []
+
+
+async def synthesize_sentences(fragments, synthesize, prepare=None, max_parallel=None):
+    """
+    Озвучивает поток текста по предложениям.
+
+    fragments — асинхронный поток фрагментов текста от модели, synthesize — блокирующая
+    функция синтеза (текст -> байты), prepare — очистка предложения перед синтезом.
+    Синтез каждого предложения запускается сразу, как только оно закончилось, не дожидаясь
+    конца генерации. Отдаёт пары (предложение, аудио) строго в порядке текста.
+    """
+    semaphore = asyncio.Semaphore(max_parallel or TTS_SENTENCE_PARALLEL)
+    queue = asyncio.Queue()
+    tasks = []
+
+    async def synthesize_one(sentence):
+        async with semaphore:
+            try:
+                return await run_io(synthesize, prepare(sentence) if prepare else sentence)
+            except Exception:
+                # Ответ уже не озвучить: ждущие очереди предложения отменяются, пока семафор не отпущен
+                for task in tasks:
+                    if task is not asyncio.current_task():
+                        task.cancel()
+                raise
+
+    async def start(sentence):
+        task = asyncio.create_task(synthesize_one(sentence))
+        tasks.append(task)
+        await queue.put((sentence, task))
+
+    async def produce():
+        splitter = SentenceSplitter()
+        try:
+            async for fragment in fragments:
+                for sentence in splitter.feed(fragment):
+                    await start(sentence)
+            for sentence in splitter.flush():
+                await start(sentence)
+        finally:
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            sentence, task = item
+            yield sentence, await task
+        # Пробрасываем ошибку генерации, если она была
+        await producer
+    finally:
+        producer.cancel()
+        # Ошибка синтеза или генерации: остальные предложения больше не нужны
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # ошибка уже обработана — без предупреждения «never retrieved»
+
+
+async def join_audio(parts, scratch, name="response_audio.ogg"):
+    """Склеивает озвученные предложения в один ogg/opus-файл в папке хода."""
+    if len(parts) == 1:
+        return await run_io(scratch.write, name, parts[0])
+
+    inputs = []
+    for index, audio in enumerate(parts):
+        path = await run_io(scratch.write, f"sentence_{index}.ogg", audio)
+        inputs += ["-i", path]
+    output = scratch.file(name)
+    concat = "".join(f"[{index}:a]" for index in range(len(parts))) + f"concat=n={len(parts)}:v=0:a=1[out]"
+    await run_ffmpeg(*inputs, "-filter_complex", concat, "-map", "[out]", "-c:a", "libopus", output, "-y")
+    return output
+
+
+async def stream_reply_audio(fragments, synthesize, scratch, prepare=None):
+    """
+    Генерирует и озвучивает ответ одновременно; аудио готово после синтеза и склейки всех предложений.
+    Возвращает (полный текст, путь к склеенному аудио, время до синтеза первого предложения на сервере).
+    """
+    start_time = time.perf_counter()
+    sentences, parts = [], []
+    first_audio = None
+    async for sentence, audio in synthesize_sentences(fragments, synthesize, prepare=prepare):
+        if first_audio is None:
+            first_audio = time.perf_counter() - start_time
+        sentences.append(sentence)
+        parts.append(audio)
+
+    if not parts:
+        raise ValueError("Модель вернула пустой ответ")
+    audio_path = await join_audio(parts, scratch)
+    return " ".join(sentences), audio_path, first_audio
+
+
+def start_reply_stream(fragments, synthesize, prepare=None, on_complete=None, spawn=asyncio.ensure_future):
+    """
+    Генерирует и озвучивает ответ в отдельной задаче, а клиенту отдаёт строки NDJSON по мере синтеза:
+    {"text": предложение, "audio": ogg/opus в base64} на каждое предложение, в конце {"done": true}
+    или {"error": текст}. Клиент начинает воспроизведение с первого предложения, не дожидаясь остальных.
+
+    Задача доводит ход до конца, даже если клиент отключился: on_complete(полный текст) сохраняет
+    состояние хода перед строкой "done". spawn запускает задачу (например, как фоновую задачу сессии).
+    Возвращает (задача, асинхронный поток строк).
+    """
+    queue = asyncio.Queue()
+
+    async def produce():
+        start_time = time.perf_counter()
+        sentences = []
+        try:
+            async for sentence, audio in synthesize_sentences(fragments, synthesize, prepare=prepare):
+                if not sentences:
+                    print(f"[TTS] Первое предложение отправлено клиенту через {time.perf_counter() - start_time:.2f} с "
+                          f"после запроса к LLM")
+                sentences.append(sentence)
+                await queue.put({"text": sentence, "audio": base64.b64encode(audio).decode("ascii")})
+            if not sentences:
+                raise ValueError("Модель вернула пустой ответ")
+            if on_complete is not None:
+                await on_complete(" ".join(sentences))
+            print(f"[TTS] Ответ из {len(sentences)} предложений озвучен за {time.perf_counter() - start_time:.2f} с")
+            await queue.put({"done": True})
+        except Exception as e:
+            print(f"❌ Ошибка потокового ответа: {e}")
+            await queue.put({"error": str(e)})
+        finally:
+            queue.put_nowait(None)
+
+    task = spawn(produce())
+
+    async def lines():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return task, lines()
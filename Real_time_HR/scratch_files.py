@@ -0,0 +1,66 @@
+import os
+import re
+import time
+import shutil
+import tempfile
+
+# Корень для временных файлов ходов интервью: у каждого хода своя подпапка
+SCRATCH_ROOT = os.getenv("TURN_SCRATCH_ROOT", os.path.join("GREETINGS_TEMP", "turns"))
+# Папки старше этого возраста считаются брошенными (например, после падения процесса)
+SCRATCH_MAX_AGE = float(os.getenv("TURN_SCRATCH_MAX_AGE", 3600))
+
+
+def _safe_name(value):
+    """Оставляет в идентификаторе сессии только безопасные для имени файла символы."""
+    return re.sub(r"[^\w-]", "_", str(value))[:64]
+
+
+class TurnScratch:
+    """
+    Изолированная временная папка одного хода интервью.
+
+    Одновременные кандидаты больше не перезаписывают общий user_input.wav:
+    каждый ход пишет загрузку и промежуточные файлы в собственную папку,
+    которая удаляется целиком после отправки ответа.
+    """
+
+    def __init__(self, session_id, root=None):
+        root = root or SCRATCH_ROOT
+        os.makedirs(root, exist_ok=True)
+        self.path = tempfile.mkdtemp(prefix=f"{_safe_name(session_id)}_", dir=root)
+
+    def file(self, name):
+        """Путь к файлу внутри папки хода."""
+        return os.path.join(self.path, name)
+
+    def write(self, name, data):
+        """Записывает байты в папку хода и возвращает путь к файлу."""
+        path = self.file(name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+
+def purge_stale_scratch(root=None, max_age=None):
+    """Удаляет папки ходов, оставшиеся после аварийного завершения. Возвращает число удалённых."""
+    root = root or SCRATCH_ROOT
+    max_age = SCRATCH_MAX_AGE if max_age is None else max_age
+    if not os.path.isdir(root):
+        return 0
+
+    removed = 0
+    now = time.time()
+    for entry in os.scandir(root):
+        if entry.is_dir() and now - entry.stat().st_mtime > max_age:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    return removed
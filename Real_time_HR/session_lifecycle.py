@@ -0,0 +1,149 @@
+import os
+import re
+import time
+import asyncio
+
+from dotenv import load_dotenv
+
+from scratch_files import SCRATCH_ROOT, purge_stale_scratch
+from turn_runtime import run_io
+from template_store import purge_unused_templates, template_bytes
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+# --- Жизненный цикл сессий: удаление просроченных интервью и их файлов ---
+# Как часто проверяются просроченные сессии и брошенные файлы
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", 300))
+# Файл без живой сессии удаляется не раньше, чем через столько секунд после записи
+# (шаблон сохраняется до того, как сессия попадает в хранилище)
+ARTIFACT_GRACE = float(os.getenv("SESSION_ARTIFACT_GRACE", 600))
+ARTIFACT_DIRS = ("GREETINGS_TEMP", "TEMP_INFERENCE")
+
+# Файлы сессий: <вид>_<session_id>.<расширение>
+_ARTIFACT = re.compile(
+    r"^(?:uploaded_video|adjusted_video|response_audio|final_response|loop)_(?P<session_id>.+)\.(?:webm|ogg|wav|mp4)$"
+)
+
+
+def iter_artifacts(dirs=None):
+    """Файлы сессий в рабочих папках: (путь, session_id, размер, время изменения)."""
+    for directory in dirs or ARTIFACT_DIRS:
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            match = _ARTIFACT.match(entry.name)
+            if match and entry.is_file():
+                stat = entry.stat()
+                yield entry.path, match.group("session_id"), stat.st_size, stat.st_mtime
+
+
+def _tree_size(root):
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class SessionLifecycle:
+    """
+    Периодическая уборка: просроченные сессии удаляются из хранилища,
+    файлы сессий, которых больше нет, — с диска, вместе с брошенными папками ходов.
+
+    on_evict — функции, которые получают session_id удалённой сессии
+    и освобождают связанное с ней состояние процесса (циклы шаблонов, тексты STT).
+    """
+
+    def __init__(self, store, dirs=None, interval=None, grace=None, on_evict=()):
+        self.store = store
+        self.dirs = tuple(dirs or ARTIFACT_DIRS)
+        self.interval = SESSION_SWEEP_INTERVAL if interval is None else interval
+        self.grace = ARTIFACT_GRACE if grace is None else grace
+        self.on_evict = list(on_evict)
+        self.evicted_sessions = 0
+        self.removed_files = 0
+        self.freed_bytes = 0
+        self.last_sweep = None
+        self._task = None
+
+    def sweep(self):
+        """Один проход уборки (блокирующий). Возвращает число удалённых сессий и файлов."""
+        expired = self.store.purge_expired()
+        for session_id in expired:
+            for callback in self.on_evict:
+                try:
+                    callback(session_id)
+                except Exception as e:
+                    print(f"[SESSIONS] Ошибка освобождения сессии {session_id}: {e}")
+
+        now = time.time()
+        alive = {}
+        removed = 0
+        for path, session_id, size, mtime in iter_artifacts(self.dirs):
+            if now - mtime < self.grace:
+                continue
+            if session_id not in alive:
+                alive[session_id] = self.store.get(session_id) is not None
+            if alive[session_id]:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            self.freed_bytes += size
+
+        purge_stale_scratch()
+        # Общие шаблоны, на которые больше не ссылается ни одна сессия
+        templates, template_freed = purge_unused_templates(self.grace)
+        removed += templates
+        self.freed_bytes += template_freed
+
+        self.evicted_sessions += len(expired)
+        self.removed_files += removed
+        self.last_sweep = now
+        if expired or removed:
+            print(f"[SESSIONS] Удалено сессий: {len(expired)}, файлов: {removed}")
+        return len(expired), removed
+
+    def gauges(self):
+        """Текущее число сессий и объём их файлов на диске."""
+        files = list(iter_artifacts(self.dirs))
+        return {
+            "live_sessions": len(self.store),
+            "artifact_files": len(files),
+            "artifact_bytes": sum(size for _, _, size, _ in files),
+            "template_bytes": template_bytes(),
+            "scratch_bytes": _tree_size(SCRATCH_ROOT),
+            "evicted_sessions": self.evicted_sessions,
+            "removed_files": self.removed_files,
+            "freed_bytes": self.freed_bytes,
+            "last_sweep": self.last_sweep,
+        }
+
+    async def run(self):
+        while True:
+            try:
+                await run_io(self.sweep)
+            except Exception as e:
+                print(f"[SESSIONS] Ошибка уборки сессий: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Запускает уборку в фоне текущего цикла событий."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
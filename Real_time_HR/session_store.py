@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+# --- Хранилище состояния интервью ---
+# memory — в процессе (один воркер); sqlite — общий файл для нескольких воркеров uvicorn и перезапусков
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", os.path.join("GREETINGS_TEMP", "sessions.sqlite3"))
+# Сессия без обращений дольше этого времени удаляется
+SESSION_TTL = float(os.getenv("SESSION_TTL", 24 * 3600))
+# Завершённое интервью хранится только до получения отчёта
+COMPLETED_SESSION_TTL = float(os.getenv("COMPLETED_SESSION_TTL", 3600))
+
+
+# Сколько вопросов задаётся по навыку: базовый и два уточняющих
+STAGES_PER_SKILL = 3
+
+
+@dataclass(slots=True)
+class InterviewSession:
+    """
+    Всё состояние одного интервью: вакансия, резюме, вопросы, этапы, оценки и история.
+
+    Объект со __slots__ вместо десятка параллельных словарей: один поиск сессии на ход.
+    Текущий навык — индекс в skill_order, который только сдвигается вперёд, поэтому
+    выбор следующего вопроса не перебирает навыки. История — список пар
+    [ответ кандидата, реплика AI], в который только добавляют.
+    """
+
+    session_id: str
+    gender: Optional[str] = None
+    skills: str = ""
+    title: str = ""
+    resume: dict = field(default_factory=dict)
+    base_questions: dict = field(default_factory=dict)  # { навык: базовый вопрос }
+    skill_order: list = field(default_factory=list)  # навыки в порядке опроса
+    stages: list = field(default_factory=list)  # этап по навыку (0=базовый, 1-2=уточнения, 3=пройден)
+    skill_scores: dict = field(default_factory=dict)  # { навык: [оценки] }
+    history: list = field(default_factory=list)  # [ [ответ кандидата, реплика AI или None], ... ]
+    qa_log: list = field(default_factory=list)  # [ [навык, вопрос, ответ], ... ] — ждут отложенной оценки
+    asked_skill: Optional[str] = None  # навык вопроса в последней реплике AI (None — вопрос не по навыку)
+    current: int = 0  # индекс текущего навыка в skill_order
+    first_answer: bool = True
+    completed: bool = False
+    address: Optional[str] = None  # «Иван Петрович»
+    report: Optional[dict] = None  # итоговый отчёт: строится один раз после интервью
+    report_etag: str = ""
+    report_started: float = 0.0  # когда начал строиться отчёт (0 — не строится)
+
+    def start(self, base_questions):
+        """Задаёт базовые вопросы и начинает опрос с первого навыка."""
+        self.base_questions = base_questions
+        self.skill_order = list(base_questions)
+        self.stages = [0] * len(self.skill_order)
+        self.skill_scores = {skill: [] for skill in self.skill_order}
+        self.current = 0
+
+    @property
+    def current_skill(self):
+        """Навык, по которому задаётся следующий вопрос; None — все навыки пройдены."""
+        return self.skill_order[self.current] if self.current < len(self.skill_order) else None
+
+    @property
+    def current_stage(self):
+        return self.stages[self.current]
+
+    def advance_stage(self, stage=None):
+        """Переводит текущий навык на следующий (или заданный) этап; пройденный навык сменяется следующим."""
+        self.stages[self.current] = self.stages[self.current] + 1 if stage is None else stage
+        if self.stages[self.current] >= STAGES_PER_SKILL:
+            self.current += 1
+
+    @property
+    def question_stages(self):
+        """Этапы по навыкам в виде словаря (для отчётов)."""
+        return dict(zip(self.skill_order, self.stages))
+
+    def add_answer(self, text):
+        self.history.append([text, None])
+
+    def set_reply(self, text, skill=None):
+        """Реплика AI на последний ответ кандидата; skill — навык, по которому в ней задан вопрос."""
+        self.history[-1][1] = text
+        self.asked_skill = skill
+
+    def answers(self):
+        return [user for user, _ in self.history]
+
+    def last_reply(self):
+        for _, ai in reversed(self.history):
+            if ai:
+                return ai
+        return ""
+
+    def conversation_log(self):
+        log = []
+        for user, ai in self.history:
+            log.append(f"Пользователь: {user}")
+            if ai:
+                log.append(f"Бот: {ai}")
+        return log
+
+    def to_json(self):
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(**json.loads(data))
+
+
+class MemorySessionStore:
+    """Сессии в памяти процесса с удалением по TTL с момента последнего сохранения."""
+
+    def __init__(self, ttl=None, completed_ttl=None):
+        self.ttl = SESSION_TTL if ttl is None else ttl
+        self.completed_ttl = COMPLETED_SESSION_TTL if completed_ttl is None else completed_ttl
+        self._sessions = {}  # session_id -> (сессия, время истечения)
+        self._lock = threading.Lock()
+
+    def get(self, session_id) -> Optional[InterviewSession]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._sessions[session_id]
+                return None
+            return entry[0]
+
+    def save(self, session: InterviewSession):
+        with self._lock:
+            self._sessions[session.session_id] = (session, time.time() + self._ttl_for(session))
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _ttl_for(self, session):
+        return self.completed_ttl if session.completed else self.ttl
+
+    def purge_expired(self):
+        """Удаляет просроченные сессии; возвращает их идентификаторы."""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._sessions.items() if expires_at < now]
+            for sid in expired:
+                del self._sessions[sid]
+        return expired
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SqliteSessionStore:
+    """
+    Сессии в файле SQLite (JSON по ключу session_id), общие для всех воркеров.
+
+    Режим WAL позволяет читать параллельно с записью из других процессов;
+    соединение у каждого потока своё.
+    """
+
+    def __init__(self, path=None, ttl=None, completed_ttl=None):
+        self.path = path or SESSION_STORE_PATH
+        self.ttl = SESSION_TTL if ttl is None else ttl
+        self.completed_ttl = COMPLETED_SESSION_TTL if completed_ttl is None else completed_ttl
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            self._local.db = db
+        return db
+
+    def get(self, session_id) -> Optional[InterviewSession]:
+        row = self._connect().execute(
+            "SELECT data FROM sessions WHERE session_id = ? AND expires_at >= ?", (session_id, time.time())
+        ).fetchone()
+        return InterviewSession.from_json(row[0]) if row else None
+
+    def save(self, session: InterviewSession):
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO sessions (session_id, data, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+                (session.session_id, session.to_json(), time.time() + self._ttl_for(session)),
+            )
+
+    def delete(self, session_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    _ttl_for = MemorySessionStore._ttl_for
+
+    def purge_expired(self):
+        now = time.time()
+        with self._connect() as db:
+            expired = [row[0] for row in db.execute("SELECT session_id FROM sessions WHERE expires_at < ?", (now,))]
+            db.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+        return expired
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+STORES = {
+    "memory": MemorySessionStore,
+    "sqlite": SqliteSessionStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Общее для процесса хранилище сессий, выбранное через SESSION_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if SESSION_STORE not in STORES:
+                    raise ValueError(f"Неизвестное хранилище сессий: {SESSION_STORE}. Доступны: {', '.join(STORES)}")
+                _store = STORES[SESSION_STORE]()
+    return _store
@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+
+class SessionTasks:
+    """
+    Фоновые задачи сессий (оценка ответов и т.п.), которые не должны задерживать ход.
+
+    Для каждой сессии — своя блокировка: под ней фоновые задачи и ход интервью
+    читают сессию из хранилища, дописывают свои поля и сохраняют, поэтому
+    результаты не затирают друг друга. Блокировка действует внутри процесса.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._tasks = {}  # session_id -> { незавершённая задача: вид задачи }
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0  # суммарное время задач, вынесенных с критического пути
+
+    def lock(self, session_id):
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = self._locks[session_id] = asyncio.Lock()
+        return lock
+
+    def spawn(self, session_id, coro, kind="task"):
+        """Запускает корутину в фоне; результат не ждётся ходом. kind — вид задачи для wait()."""
+        task = asyncio.ensure_future(self._run(coro))
+        self._tasks.setdefault(session_id, {})[task] = kind
+        task.add_done_callback(lambda done: self._discard(session_id, done))
+        return task
+
+    async def _run(self, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        except Exception as e:
+            self.failed += 1
+            print(f"❌ Ошибка фоновой задачи сессии: {e}")
+        finally:
+            self.busy_seconds += time.perf_counter() - start
+            self.completed += 1
+
+    def _discard(self, session_id, task):
+        tasks = self._tasks.get(session_id)
+        if tasks is not None:
+            tasks.pop(task, None)
+            if not tasks:
+                del self._tasks[session_id]
+
+    def pending(self, session_id):
+        return len(self._tasks.get(session_id, ()))
+
+    async def wait(self, session_id, timeout=None, kind=None):
+        """
+        Дожидается фоновых задач сессии (например, оценок перед построением отчёта);
+        kind — только задач этого вида. Задача, которая сама запущена через spawn,
+        должна ждать только задачи другого вида, иначе задачи могут ждать друг друга.
+        """
+        tasks = [task for task, task_kind in self._tasks.get(session_id, {}).items() if kind in (None, task_kind)]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    async def drain(self, timeout=None):
+        """Дожидается фоновых задач всех сессий при остановке сервиса; не успевшие к timeout отменяет."""
+        tasks = [task for session in self._tasks.values() for task in session]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def forget(self, session_id):
+        """Отменяет задачи удалённой сессии и освобождает её блокировку (можно вызывать из другого потока)."""
+        for task in self._tasks.pop(session_id, ()):
+            task.get_loop().call_soon_threadsafe(task.cancel)
+        self._locks.pop(session_id, None)
+
+    def stats(self):
+        return {
+            "pending": sum(len(tasks) for tasks in self._tasks.values()),
+            "completed": self.completed,
+            "failed": self.failed,
+            "off_critical_path_seconds": round(self.busy_seconds, 3),
+        }
@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+
+import numpy as np
+from dotenv import load_dotenv
+
+from openai_whisper_STT import SAMPLE_RATE, detect_speech, transcribe_audio_data
+from turn_runtime import run_cpu, turn_slot, TurnsBusyError
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+# --- Потоковое распознавание ответа, пока кандидат ещё говорит ---
+# Новый проход распознавания — после накопления STREAM_STEP секунд нового аудио
+STREAM_STEP = float(os.getenv("STT_STREAM_STEP", 2.0))
+# Окно длиннее этого фиксируется по последней паузе и больше не распознаётся заново
+STREAM_COMMIT = float(os.getenv("STT_STREAM_COMMIT", 12.0))
+# Сколько готовый текст ждёт /process_audio/, прежде чем считаться устаревшим
+STREAM_RESULT_TTL = float(os.getenv("STT_STREAM_RESULT_TTL", 120))
+# Сколько байт потока ffmpeg читает для определения формата. Заголовок webm/ogg занимает
+# несколько сотен байт; по умолчанию ffmpeg готов ждать до 5 МБ и 5 с потока, прежде чем
+# начать декодирование, — для записи, которая приходит кусками в темпе речи, это лишнее
+STREAM_PROBESIZE = int(os.getenv("STT_STREAM_PROBESIZE", 4096))
+
+
+class StreamingTranscriber:
+    """
+    Инкрементальное распознавание webm/opus-потока из MediaRecorder.
+
+    Куски записи по мере поступления подаются в один долгоживущий ffmpeg,
+    который декодирует их в PCM 16 кГц. Распознаётся скользящее окно:
+    всё, что старше STREAM_COMMIT секунд, фиксируется по паузе и больше
+    не перераспознаётся, поэтому каждый проход стоит не больше одного окна.
+    К моменту отпускания кнопки остаётся распознать только последние секунды.
+    """
+
+    def __init__(self, language="ru"):
+        self.language = language
+        self.pcm = bytearray()  # декодированный поток, int16
+        self.committed_samples = 0  # граница зафиксированной части
+        self.committed_text = []
+        self.partial = ""  # текст незафиксированного окна
+        self.transcribed_samples = 0  # сколько отсчётов покрыл последний проход
+        self.passes = 0
+        self.skipped = 0  # промежуточные проходы, пропущенные из-за занятых слотов
+        self._decoder = None
+        self._reader = None
+        self._lock = asyncio.Lock()  # проходы одного потока — строго по очереди
+
+    async def start(self):
+        self._decoder = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-probesize", str(STREAM_PROBESIZE), "-analyzeduration", "0", "-fflags", "nobuffer",
+            "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self._reader = asyncio.create_task(self._read_pcm())
+
+    async def _read_pcm(self):
+        while True:
+            data = await self._decoder.stdout.read(65536)
+            if not data:
+                break
+            self.pcm.extend(data)
+
+    async def feed(self, chunk):
+        """Передаёт очередной кусок записи декодеру."""
+        self._decoder.stdin.write(chunk)
+        await self._decoder.stdin.drain()
+
+    @property
+    def audio_seconds(self):
+        return len(self.pcm) // 2 / SAMPLE_RATE
+
+    @property
+    def transcript(self):
+        return " ".join(text for text in [*self.committed_text, self.partial] if text).strip()
+
+    def _window(self):
+        """Копия незафиксированной части потока в float32 (буфер продолжает расти)."""
+        data = bytes(self.pcm[self.committed_samples * 2:len(self.pcm) // 2 * 2])
+        return np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+    async def maybe_transcribe(self):
+        """
+        Запускает проход, если накопилось достаточно нового аудио и другой проход не идёт.
+        Промежуточный текст необязателен: проход занимает слот хода и пропускается,
+        если все слоты заняты ходами интервью.
+        """
+        if self._lock.locked():
+            return None
+        if len(self.pcm) // 2 - self.transcribed_samples < STREAM_STEP * SAMPLE_RATE:
+            return None
+        try:
+            async with turn_slot(wait=False):
+                return await self._transcribe_pass()
+        except TurnsBusyError:
+            self.skipped += 1
+            return None
+
+    async def _transcribe_pass(self):
+        async with self._lock:
+            window = self._window()
+            covered = self.committed_samples + len(window)
+
+            # Длинное окно фиксируем по последней паузе: дальше распознаём только хвост
+            if len(window) > STREAM_COMMIT * SAMPLE_RATE:
+                segments = detect_speech(window)
+                if len(segments) >= 2:
+                    boundary = segments[-1][0]
+                    text = await run_cpu(transcribe_audio_data, window[:boundary], language=self.language)
+                    if text:
+                        self.committed_text.append(text)
+                    self.committed_samples += boundary
+                    window = window[boundary:]
+
+            self.partial = await run_cpu(transcribe_audio_data, window, language=self.language) if len(window) else ""
+            self.transcribed_samples = covered
+            self.passes += 1
+            return self.transcript
+
+    async def finish(self):
+        """Дожидается конца декодирования и распознаёт остаток после последнего прохода."""
+        self._decoder.stdin.close()
+        await self._reader
+        await self._decoder.wait()
+        if len(self.pcm) // 2 > self.transcribed_samples:
+            await self._transcribe_pass()
+        return self.transcript
+
+    def abort(self):
+        """Останавливает декодер, если он ещё работает (обрыв соединения, ошибка)."""
+        if self._decoder and self._decoder.returncode is None:
+            self._decoder.kill()
+        if self._reader:
+            self._reader.cancel()
+
+
+# Готовые тексты, ожидающие /process_audio/: { session_id: (текст, время) }
+_final_transcripts = {}
+
+
+def store_final_transcript(session_id, text):
+    _final_transcripts[session_id] = (text, time.monotonic())
+
+
+def take_final_transcript(session_id, max_age=None):
+    """Забирает готовый текст сессии (один раз); устаревший или отсутствующий — None."""
+    max_age = STREAM_RESULT_TTL if max_age is None else max_age
+    entry = _final_transcripts.pop(session_id, None)
+    if entry is None or time.monotonic() - entry[1] > max_age:
+        return None
+    return entry[0]
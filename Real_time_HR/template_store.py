@@ -0,0 +1,229 @@
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import threading
+
+import httpx
+from dotenv import load_dotenv
+
+from turn_runtime import run_io
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+# --- Шаблоны аватара HR: загрузка без блокировки и хранение по содержимому ---
+# Откуда скачивается шаблон по относительной ссылке (сервис платформы)
+TEMPLATE_SOURCE_URL = os.getenv("TEMPLATE_SOURCE_URL", "http://127.0.0.1:8000")
+# Если медиа платформы смонтированы в этот сервис, шаблон читается с диска без HTTP
+TEMPLATE_MEDIA_ROOT = os.getenv("TEMPLATE_MEDIA_ROOT")
+TEMPLATE_MEDIA_URL = os.getenv("TEMPLATE_MEDIA_URL", "/media/")
+# Шаблоны хранятся один раз: <sha256 содержимого>.webm; файлы сессий — жёсткие ссылки на них
+TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", os.path.join("GREETINGS_TEMP", "templates"))
+TEMPLATE_CHUNK = int(os.getenv("TEMPLATE_CHUNK", 1024 * 1024))
+TEMPLATE_DOWNLOAD_TIMEOUT = float(os.getenv("TEMPLATE_DOWNLOAD_TIMEOUT", 120))
+# Недокачанные файлы *.part старше этого возраста остались после падения процесса
+TEMPLATE_PART_MAX_AGE = float(os.getenv("TEMPLATE_PART_MAX_AGE", 3600))
+
+# Уже сохранённые шаблоны: { ссылка: (путь к файлу по хэшу, валидатор источника) }.
+# Ссылка переиспользуется, только пока валидатор (ETag/Last-Modified/размер) не изменился:
+# HR мог загрузить по той же ссылке другое видео
+_by_url = {}
+# _by_url читает цикл событий, а чистит уборка сессий из своего потока
+_by_url_lock = threading.Lock()
+# Идущие загрузки: одновременные интервью по одной вакансии ждут одну загрузку
+_downloads = {}
+
+
+def media_path(video_url, media_root=None):
+    """Путь к шаблону в смонтированных медиа платформы или None, если его там нет."""
+    media_root = media_root or TEMPLATE_MEDIA_ROOT
+    path = video_url.split("?", 1)[0].lstrip("/")
+    prefix = TEMPLATE_MEDIA_URL.strip("/") + "/"
+    if not media_root or not path.startswith(prefix):
+        return None
+    root = os.path.abspath(media_root)
+    candidate = os.path.abspath(os.path.join(root, path[len(prefix):]))
+    if not candidate.startswith(root + os.sep) or not os.path.isfile(candidate):
+        return None
+    return candidate
+
+
+def source_url(video_url):
+    """Абсолютная ссылка на шаблон в сервисе платформы."""
+    return video_url if "://" in video_url else f"{TEMPLATE_SOURCE_URL.rstrip('/')}/{video_url.lstrip('/')}"
+
+
+def http_validator(headers):
+    """ETag, Last-Modified и размер ответа; None, если сервер не даёт ни ETag, ни Last-Modified."""
+    validator = tuple(headers.get(name) for name in ("etag", "last-modified", "content-length"))
+    return validator if any(validator[:2]) else None
+
+
+def local_validator(source):
+    """Время изменения и размер файла в смонтированных медиа."""
+    stat = os.stat(source)
+    return stat.st_mtime_ns, stat.st_size
+
+
+async def current_validator(video_url):
+    """Валидатор шаблона у источника сейчас (HEAD-запрос или stat); None — проверить нельзя."""
+    source = media_path(video_url)
+    if source is not None:
+        return await run_io(local_validator, source)
+    try:
+        async with httpx.AsyncClient(timeout=TEMPLATE_DOWNLOAD_TIMEOUT) as client:
+            response = await client.head(source_url(video_url))
+            response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    return http_validator(response.headers)
+
+
+def _store_blob(temp_path, digest):
+    """Переносит скачанный файл в хранилище по хэшу; такой же шаблон уже мог быть сохранён."""
+    blob = os.path.join(TEMPLATE_DIR, f"{digest}.webm")
+    if os.path.exists(blob):
+        os.remove(temp_path)
+        os.utime(blob)  # свежий шаблон не удаляется уборкой, пока на него не сослалась сессия
+    else:
+        os.replace(temp_path, blob)
+    return blob
+
+
+def _import_local(source):
+    """
+    Копирует шаблон из смонтированных медиа в хранилище, считая хэш по пути.
+    Возвращает (путь к файлу по хэшу, валидатор источника).
+    """
+    os.makedirs(TEMPLATE_DIR, exist_ok=True)
+    validator = local_validator(source)
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(suffix=".part", dir=TEMPLATE_DIR)
+    with open(source, "rb") as src, os.fdopen(fd, "wb") as dst:
+        for chunk in iter(lambda: src.read(TEMPLATE_CHUNK), b""):
+            digest.update(chunk)
+            dst.write(chunk)
+    return _store_blob(temp_path, digest.hexdigest()), validator
+
+
+async def _download(video_url):
+    """
+    Потоковая загрузка шаблона крупными кусками с подсчётом хэша на лету.
+    Возвращает (путь к файлу по хэшу, валидатор ответа).
+    """
+    os.makedirs(TEMPLATE_DIR, exist_ok=True)
+    url = source_url(video_url)
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(suffix=".part", dir=TEMPLATE_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async with httpx.AsyncClient(timeout=TEMPLATE_DOWNLOAD_TIMEOUT) as client:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    validator = http_validator(response.headers)
+                    async for chunk in response.aiter_bytes(TEMPLATE_CHUNK):
+                        digest.update(chunk)
+                        await run_io(f.write, chunk)
+        return await run_io(_store_blob, temp_path, digest.hexdigest()), validator
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+async def _fetch_blob(video_url):
+    source = media_path(video_url)
+    if source is not None:
+        return await run_io(_import_local, source)
+    return await _download(video_url)
+
+
+async def get_template_blob(video_url):
+    """Путь к шаблону в хранилище по хэшу; ссылка не скачивается заново, пока шаблон у источника не изменился."""
+    with _by_url_lock:
+        cached = _by_url.get(video_url)
+    if cached is not None:
+        blob, validator = cached
+        if validator is not None and os.path.exists(blob) and await current_validator(video_url) == validator:
+            return blob
+
+    task = _downloads.get(video_url)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_blob(video_url))
+        _downloads[video_url] = task
+    try:
+        blob, validator = await asyncio.shield(task)
+    finally:
+        if task.done():
+            _downloads.pop(video_url, None)
+    with _by_url_lock:
+        _by_url[video_url] = (blob, validator)
+    return blob
+
+
+def _link(blob, destination):
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(blob, destination)
+    except OSError:
+        # Другая файловая система или нет поддержки жёстких ссылок — обычная копия
+        shutil.copyfile(blob, destination)
+
+
+async def fetch_template(video_url, destination):
+    """Сохраняет шаблон сессии в destination (жёсткой ссылкой на общий файл) и возвращает путь."""
+    blob = await get_template_blob(video_url)
+    try:
+        await run_io(_link, blob, destination)
+    except FileNotFoundError:
+        # Шаблон удалили уборкой между поиском и ссылкой — загружаем заново
+        with _by_url_lock:
+            _by_url.pop(video_url, None)
+        await run_io(_link, await get_template_blob(video_url), destination)
+    return destination
+
+
+def purge_unused_templates(grace=0, directory=None):
+    """
+    Удаляет шаблоны, на которые не ссылается ни одна сессия (у файла не осталось
+    других жёстких ссылок), и недокачанные *.part, брошенные упавшим процессом.
+    Возвращает (число файлов, освобождённые байты).
+    """
+    directory = directory or TEMPLATE_DIR
+    if not os.path.isdir(directory):
+        return 0, 0
+    removed = freed = 0
+    now = time.time()
+    for entry in os.scandir(directory):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        if entry.name.endswith(".part"):
+            # Идущая загрузка дописывает файл и обновляет его время изменения
+            if now - stat.st_mtime < max(grace, TEMPLATE_PART_MAX_AGE):
+                continue
+        elif not entry.name.endswith(".webm") or stat.st_nlink > 1 or now - stat.st_mtime < grace:
+            continue
+        try:
+            os.remove(entry.path)
+        except OSError:
+            continue
+        removed += 1
+        freed += stat.st_size
+    with _by_url_lock:
+        for url, (blob, _) in list(_by_url.items()):
+            if not os.path.exists(blob):
+                _by_url.pop(url, None)
+    return removed, freed
+
+
+def template_bytes(directory=None):
+    """Объём общих шаблонов на диске."""
+    directory = directory or TEMPLATE_DIR
+    if not os.path.isdir(directory):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".webm"))
@@ -1,41 +1,89 @@
 import os
+import threading
 from dotenv import load_dotenv
 from speechkit import Session, SpeechSynthesis
-import tempfile
+from yandex_iam import get_cached_iam_token, get_iam_cache
+from tts_cache import cached_synthesis
 
 # Загружаем переменные из .env
 load_dotenv()
 
+TTS_FORMAT = "oggopus"
+TTS_SAMPLE_RATE = "48000"
+# Коды отказа SpeechKit из-за токена (RequestError SDK хранит их в error_code)
+_UNAUTHORIZED_CODES = {"UNAUTHORIZED", "UNAUTHENTICATED", "401"}
 
-def text_to_audio(text: str, voice: str):
-    """Функция синтеза речи с выбором голоса."""
-    oauth_token = os.getenv("OAUTH_TOKEN")
-    catalog_id = os.getenv("CATALOG_ID")
 
-    if not oauth_token or not catalog_id:
-        raise ValueError("Проверьте наличие OAUTH_TOKEN и CATALOG_ID в .env файле.")
+def is_unauthorized(error):
+    """Ошибка SDK означает, что IAM-токен отклонён (отозван раньше срока)."""
+    code = str(getattr(error, "error_code", "") or "").upper()
+    return code in _UNAUTHORIZED_CODES or "401" in str(error)
 
-    session = Session.from_yandex_passport_oauth_token(oauth_token, catalog_id)
-    synthesizeAudio = SpeechSynthesis(session)
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as temp_audio:
-        temp_audio_path = temp_audio.name
+class Synthesizer:
+    """
+    Долгоживущий синтезатор SpeechKit, один на процесс.
 
-    synthesizeAudio.synthesize(
-        temp_audio_path,
-        text=text.strip(),
-        voice=voice,
-        format="oggopus",
-        sampleRateHertz="48000"
-    )
+    Сессия SDK строится из IAM-токена общего кэша (yandex_iam) и пересоздаётся
+    только после обновления токена, а не на каждую фразу. Аудио возвращается
+    из памяти (synthesize_stream), без записи во временный файл.
+    """
 
-    with open(temp_audio_path, "rb") as f:
-        audio_bytes = f.read()
+    def __init__(self, catalog_id=None):
+        self.catalog_id = catalog_id or os.getenv("CATALOG_ID")
+        if not os.getenv("OAUTH_TOKEN") or not self.catalog_id:
+            raise ValueError("Проверьте наличие OAUTH_TOKEN и CATALOG_ID в .env файле.")
+
+        self._lock = threading.Lock()
+        self._token = None
+        self._synthesis = None
+        self.sessions_created = 0
+
+    def _get_synthesis(self):
+        token = get_cached_iam_token()
+        with self._lock:
+            if token != self._token:
+                self._synthesis = SpeechSynthesis(Session(Session.IAM_TOKEN, token, self.catalog_id))
+                self._token = token
+                self.sessions_created += 1
+            return self._synthesis
+
+    def synthesize(self, text, voice):
+        """Синтезирует фразу и возвращает байты ogg/opus."""
+        for attempt in range(2):
+            try:
+                return self._get_synthesis().synthesize_stream(
+                    text=text.strip(),
+                    voice=voice,
+                    format=TTS_FORMAT,
+                    sampleRateHertz=TTS_SAMPLE_RATE
+                )
+            except Exception as e:
+                if attempt > 0 or not is_unauthorized(e):
+                    raise
+                # Токен отозван раньше срока — запрашиваем новый, пересоздаём сессию и повторяем один раз
+                get_iam_cache().invalidate()
+                with self._lock:
+                    self._token = None
+
+
+_synthesizer = None
+_synthesizer_lock = threading.Lock()
+
+
+def get_synthesizer():
+    """Общий для процесса синтезатор (создаётся при первом обращении)."""
+    global _synthesizer
+    if _synthesizer is None:
+        with _synthesizer_lock:
+            if _synthesizer is None:
+                _synthesizer = Synthesizer()
+    return _synthesizer
 
-    # Удаляем временный файл после чтения
-    os.remove(temp_audio_path)
 
-    return audio_bytes
+def text_to_audio(text: str, voice: str):
+    """Функция синтеза речи с выбором голоса; повторяющиеся фразы берутся из кэша."""
+    return cached_synthesis(text, voice, lambda t, v: get_synthesizer().synthesize(t, v), TTS_FORMAT, TTS_SAMPLE_RATE)
 
 
 def test_text_to_audio_from_file(input_file_path: str, output_audio_path: str, voice: str = "oksana"):
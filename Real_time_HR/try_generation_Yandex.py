@@ -1,6 +1,11 @@
 import os
+import json
+import asyncio
 from dotenv import load_dotenv
 import requests
+import httpx
+from llm_client import get_llm_client
+from yandex_iam import fetch_iam_token, get_cached_iam_token, get_iam_cache
 
 # Загрузка переменных окружения из .env файла
 load_dotenv()
@@ -17,30 +22,16 @@ if not OAUTH_TOKEN or not CATALOG_ID:
 
 # Функция для получения IAM-токена из OAuth-токена
 def get_iam_token(oauth_token):
-    iam_url = "https://iam.api.cloud.yandex.net/iam/v1/tokens"
-    headers = {
-        "Content-Type": "application/json"
-    }
-    data = {
-        "yandexPassportOauthToken": oauth_token
-    }
-    response = requests.post(iam_url, headers=headers, json=data)
-
-    if response.status_code == 200:
-        return response.json()["iamToken"]
-    else:
-        print(f"Ошибка при получении IAM-токена: {response.status_code}")
-        print(response.text)
+    try:
+        iam_token, _ = fetch_iam_token(oauth_token)
+        return iam_token
+    except Exception as e:
+        print(f"Ошибка при получении IAM-токена: {e}")
         return None
 
 
-# Функция для отправки запроса к YandexGPT
-def generate_text(prompt):
-    # Получаем IAM-токен
-    iam_token = get_iam_token(OAUTH_TOKEN)
-    if not iam_token:
-        raise ValueError("Не удалось получить IAM-токен.")
-
+def build_completion_request(prompt, iam_token, stream=False):
+    """Формирует заголовки и тело запроса к YandexGPT."""
     headers = {
         "Authorization": f"Bearer {iam_token}",
         "Content-Type": "application/json"
@@ -53,7 +44,7 @@ def generate_text(prompt):
         "completionOptions": {
             "maxTokens": 1000,  # Максимальное количество токенов в ответе
             "temperature": 0.7,  # Температура для управления случайностью
-            "stream": False  # Отключаем потоковую передачу
+            "stream": stream  # Потоковая передача (по умолчанию отключена)
         },
         "messages": [
             {
@@ -62,16 +53,82 @@ def generate_text(prompt):
             }
         ]
     }
+    return headers, data
+
+
+def parse_completion_response(status_code, payload, text):
+    """Извлекает текст ответа модели; при ошибке печатает её и возвращает None."""
+    if status_code == 200:
+        return payload['result']['alternatives'][0]['message']['text']  # Извлекаем текст ответа
+
+    if status_code == 401:
+        # Токен отозван раньше срока — следующий вызов запросит новый
+        get_iam_cache().invalidate()
+    print(f"Ошибка: {status_code}")
+    print(text)
+    return None
 
+
+# Функция для отправки запроса к YandexGPT
+def generate_text(prompt):
+    # Берём IAM-токен из общего кэша процесса: в IAM идём только при истечении срока
+    try:
+        iam_token = get_cached_iam_token()
+    except Exception as e:
+        raise ValueError(f"Не удалось получить IAM-токен: {e}")
+
+    headers, data = build_completion_request(prompt, iam_token)
     response = requests.post(API_URL, headers=headers, json=data)
+    payload = response.json() if response.status_code == 200 else None
+    return parse_completion_response(response.status_code, payload, response.text)
 
-    if response.status_code == 200:
-        result = response.json()
-        return result['result']['alternatives'][0]['message']['text']  # Извлекаем текст ответа
-    else:
-        print(f"Ошибка: {response.status_code}")
-        print(response.text)
-        return None
+
+# Асинхронная версия generate_text для FastAPI-эндпоинтов: не блокирует цикл событий
+async def agenerate_text(prompt):
+    try:
+        # В IAM идём только при истечении срока, поэтому поток занимается редко
+        iam_token = await asyncio.to_thread(get_cached_iam_token)
+    except Exception as e:
+        raise ValueError(f"Не удалось получить IAM-токен: {e}")
+
+    headers, data = build_completion_request(prompt, iam_token)
+    response = await get_llm_client().post_json("yandexgpt", API_URL, data, headers=headers)
+    payload = response.json() if response.status_code == 200 else None
+    return parse_completion_response(response.status_code, payload, response.text)
+
+
+def parse_stream_line(line):
+    """
+    Разбирает строку потокового ответа YandexGPT.
+    Каждая строка содержит весь накопленный на этот момент текст, а не только добавку.
+    Возвращает (накопленный текст, признак финального фрагмента).
+    """
+    alternative = json.loads(line)['result']['alternatives'][0]
+    return alternative['message']['text'], alternative.get('status') == "ALTERNATIVE_STATUS_FINAL"
+
+
+# Потоковая генерация: отдаёт новые фрагменты текста по мере ответа модели
+async def astream_text(prompt):
+    try:
+        iam_token = await asyncio.to_thread(get_cached_iam_token)
+    except Exception as e:
+        raise ValueError(f"Не удалось получить IAM-токен: {e}")
+
+    headers, data = build_completion_request(prompt, iam_token, stream=True)
+    received = ""
+    try:
+        async for line in get_llm_client().stream_lines("yandexgpt", API_URL, data, headers=headers):
+            text, final = parse_stream_line(line)
+            if len(text) > len(received):
+                yield text[len(received):]
+                received = text
+            if final:
+                break
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 401:
+            # Токен отозван раньше срока — следующий вызов запросит новый
+            get_iam_cache().invalidate()
+        raise ValueError(f"Ошибка потоковой генерации: {e.response.status_code} {e.response.text}")
 
 
 # Пример использования
@@ -0,0 +1,120 @@
+import os
+import asyncio
+import functools
+import subprocess
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+# --- Модель конкурентности одного хода интервью ---
+# CPU-этапы (Whisper, декодирование аудио) — в ограниченном пуле STT_WORKERS;
+# блокирующий ввод-вывод (SpeechKit, запись файлов) — в пуле IO_WORKERS;
+# ffmpeg — асинхронные подпроцессы; LLM — асинхронный HTTP-клиент (llm_client).
+MAX_CONCURRENT_TURNS = int(os.getenv("MAX_CONCURRENT_TURNS", 4))
+# Сколько ход может ждать свободного слота, прежде чем сервис ответит 503
+TURN_QUEUE_TIMEOUT = float(os.getenv("TURN_QUEUE_TIMEOUT", 60))
+STT_WORKERS = int(os.getenv("STT_WORKERS", 1))
+# thread — модель одна на процесс; process — у каждого процесса своя копия модели
+STT_POOL = os.getenv("STT_POOL", "thread")
+IO_WORKERS = int(os.getenv("IO_WORKERS", 16))
+
+
+class TurnsBusyError(Exception):
+    """Все слоты для ходов интервью заняты дольше TURN_QUEUE_TIMEOUT."""
+
+
+def _make_cpu_executor():
+    if STT_POOL == "process":
+        return ProcessPoolExecutor(max_workers=STT_WORKERS)
+    return ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+
+
+cpu_executor = _make_cpu_executor()
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+
+
+def shutdown_executors():
+    """
+    Останавливает пулы при остановке сервиса: дожидается начатых задач, очередь отменяет.
+    Пулы заменяются новыми, поэтому модуль остаётся рабочим (например, при повторном запуске приложения).
+    """
+    global cpu_executor, io_executor
+    executors = (cpu_executor, io_executor)
+    cpu_executor = _make_cpu_executor()
+    io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+    for executor in executors:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def run_cpu(func, *args, **kwargs):
+    """Выполняет CPU-тяжёлую функцию в ограниченном пуле, не блокируя цикл событий."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_io(func, *args, **kwargs):
+    """Выполняет блокирующий ввод-вывод (сетевые SDK, диск) в пуле потоков."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_subprocess(args):
+    """Асинхронно запускает внешнюю программу без shell; при ошибке — CalledProcessError."""
+    process = await asyncio.create_subprocess_exec(
+        *args,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, args, output=stdout, stderr=stderr)
+    return stdout
+
+
+async def run_ffmpeg(*args):
+    """Запускает ffmpeg с переданными аргументами."""
+    return await run_subprocess(["ffmpeg", "-hide_banner", "-loglevel", "error", *args])
+
+
+# Семафор asyncio привязан к циклу событий, поэтому храним по семафору на цикл
+_turn_semaphores = weakref.WeakKeyDictionary()
+active_turns = 0
+
+
+def _turn_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _turn_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_TURNS)
+        _turn_semaphores[loop] = semaphore
+    return semaphore
+
+
+@asynccontextmanager
+async def turn_slot(timeout=None, wait=True):
+    """
+    Ограничивает число одновременно обрабатываемых ходов интервью.
+    wait=False — слот берётся только если он свободен сразу (для необязательной работы).
+    """
+    global active_turns
+    semaphore = _turn_semaphore()
+    if not wait:
+        if semaphore.locked():
+            raise TurnsBusyError("Все слоты ходов заняты")
+        await semaphore.acquire()
+    else:
+        try:
+            await asyncio.wait_for(semaphore.acquire(), TURN_QUEUE_TIMEOUT if timeout is None else timeout)
+        except asyncio.TimeoutError:
+            raise TurnsBusyError("Сервер перегружен, повторите попытку позже")
+    active_turns += 1
+    try:
+        yield
+    finally:
+        active_turns -= 1
+        semaphore.release()
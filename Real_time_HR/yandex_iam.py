@@ -0,0 +1,188 @@
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import requests
+from dotenv import load_dotenv
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+IAM_URL = os.getenv("YANDEX_IAM_URL", "https://iam.api.cloud.yandex.net/iam/v1/tokens")
+
+# IAM-токен живёт до 12 часов, Yandex Cloud рекомендует обновлять его не реже раза в час
+IAM_REFRESH_INTERVAL = float(os.getenv("IAM_REFRESH_INTERVAL", 3600))
+# За сколько секунд до истечения токен считается устаревшим и обновляется синхронно
+IAM_EXPIRY_MARGIN = float(os.getenv("IAM_EXPIRY_MARGIN", 300))
+# Пауза перед повторной попыткой фонового обновления после ошибки
+IAM_RETRY_DELAY = 30.0
+# Срок жизни токена, если ответ IAM не содержит expiresAt
+IAM_DEFAULT_TTL = 12 * 3600
+
+
+def parse_expires_at(value):
+    """Переводит expiresAt из ответа IAM (RFC 3339, до наносекунд) в unix-время."""
+    if not value:
+        return None
+    # Python понимает не больше 6 знаков дробной части секунды
+    value = re.sub(r"(\.\d{6})\d+", r"\1", value.strip())
+    value = value.replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def fetch_iam_token(oauth_token, iam_url=None, timeout=10):
+    """
+    Обменивает OAuth-токен на IAM-токен.
+
+    :return: кортеж (iam_token, expires_at) — expires_at в unix-времени
+    """
+    response = requests.post(
+        iam_url or IAM_URL,
+        headers={"Content-Type": "application/json"},
+        json={"yandexPassportOauthToken": oauth_token},
+        timeout=timeout,
+    )
+    if response.status_code != 200:
+        print(f"Ошибка при получении IAM-токена: {response.status_code}")
+        print(response.text)
+        response.raise_for_status()
+        raise ValueError(f"IAM вернул статус {response.status_code}")
+
+    payload = response.json()
+    expires_at = parse_expires_at(payload.get("expiresAt")) or time.time() + IAM_DEFAULT_TTL
+    return payload["iamToken"], expires_at
+
+
+class IamTokenCache:
+    """
+    Процессный кэш IAM-токена.
+
+    Токен запрашивается один раз и переиспользуется до истечения срока.
+    Перед истечением (или через IAM_REFRESH_INTERVAL) он обновляется в фоновом
+    потоке, поэтому вызывающий код не ждёт похода в IAM.
+    """
+
+    def __init__(self, oauth_token, iam_url=None, refresh_interval=IAM_REFRESH_INTERVAL,
+                 expiry_margin=IAM_EXPIRY_MARGIN, retry_delay=IAM_RETRY_DELAY):
+        if not oauth_token:
+            raise ValueError("Не задан OAuth-токен для получения IAM-токена.")
+        self.oauth_token = oauth_token
+        self.iam_url = iam_url
+        self.refresh_interval = refresh_interval
+        self.expiry_margin = expiry_margin
+        self.retry_delay = retry_delay
+
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()  # защищает токен и счётчики
+        self._fetch_lock = threading.Lock()  # не даёт нескольким потокам идти в IAM одновременно
+        self._timer = None
+        self._closed = False
+
+        # Метрики
+        self.fetches = 0  # реальные запросы к IAM
+        self.fetches_avoided = 0  # запросы, обслуженные из кэша
+        self.background_refreshes = 0
+        self.refresh_errors = 0
+
+    def _is_fresh(self, now):
+        return self._token is not None and now < self._expires_at - self.expiry_margin
+
+    def get_token(self):
+        """Возвращает действующий IAM-токен, при необходимости запрашивая новый."""
+        with self._lock:
+            if self._is_fresh(time.time()):
+                self.fetches_avoided += 1
+                return self._token
+
+        with self._fetch_lock:
+            # Пока ждали блокировку, токен мог обновить другой поток
+            with self._lock:
+                if self._is_fresh(time.time()):
+                    self.fetches_avoided += 1
+                    return self._token
+            return self._fetch()
+
+    def _fetch(self, background=False):
+        token, expires_at = fetch_iam_token(self.oauth_token, self.iam_url)
+        with self._lock:
+            self._token = token
+            self._expires_at = expires_at
+            self.fetches += 1
+            if background:
+                self.background_refreshes += 1
+        self._schedule_refresh(self._refresh_delay(expires_at))
+        return token
+
+    def _refresh_delay(self, expires_at):
+        until_expiry = expires_at - self.expiry_margin - time.time()
+        return max(0.0, min(self.refresh_interval, until_expiry))
+
+    def _schedule_refresh(self, delay):
+        with self._lock:
+            if self._closed:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(delay, self._background_refresh)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _background_refresh(self):
+        try:
+            with self._fetch_lock:
+                self._fetch(background=True)
+        except Exception as e:
+            with self._lock:
+                self.refresh_errors += 1
+            print(f"[IAM] Ошибка фонового обновления токена: {e}")
+            # Старый токен ещё действует — пробуем снова чуть позже
+            self._schedule_refresh(self.retry_delay)
+
+    def invalidate(self):
+        """Сбрасывает токен (например, после ответа 401 от API)."""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def close(self):
+        """Останавливает фоновое обновление."""
+        with self._lock:
+            self._closed = True
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "fetches": self.fetches,
+                "fetches_avoided": self.fetches_avoided,
+                "background_refreshes": self.background_refreshes,
+                "refresh_errors": self.refresh_errors,
+                "expires_in": max(0.0, self._expires_at - time.time()) if self._token else 0.0,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_iam_cache():
+    """Общий для всего процесса кэш IAM-токена (OAuth-токен берётся из OAUTH_TOKEN)."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = IamTokenCache(os.getenv("OAUTH_TOKEN"))
+    return _default_cache
+
+
+def get_cached_iam_token():
+    """Возвращает IAM-токен из общего кэша."""
+    return get_iam_cache().get_token()
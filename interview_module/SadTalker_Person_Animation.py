@@ -29,7 +29,11 @@ PREPROCESS = 'full'  # Метод предварительной обработ
 STILL_MODE = True  # Режим неподвижного тела
 CHECKPOINT_DIR = 'SadTalker/checkpoints'  # Путь к контрольным точкам
 RESULT_DIR = TEMP_VIDEO_DIR  # Путь к результатам
-VENV_PATH = 'SadTalker/venv/Scripts/activate.bat'  # Путь к активации виртуальной среды (для Windows)
+# Python виртуальной среды SadTalker (вызывается напрямую, без activate.bat и shell)
+SADTALKER_PYTHON = os.getenv(
+    "SADTALKER_PYTHON",
+    os.path.join("SadTalker", "venv", "Scripts", "python.exe") if os.name == "nt" else os.path.join("SadTalker", "venv", "bin", "python"),
+)
 
 # Убедимся, что папка для видео существует
 os.makedirs(TEMP_VIDEO_DIR, exist_ok=True)
@@ -37,23 +41,25 @@ os.makedirs(TEMP_VIDEO_DIR, exist_ok=True)
 
 # Функция для обработки аудио через CLI интерфейс SadTalker
 def process_audio_with_sadtalker(audio_path, image_path, output_video_path):
-    # Формируем команду для вызова inference.py с активацией виртуальной среды
-    command = f'"{VENV_PATH}" && python SadTalker/inference.py ' \
-              f'--driven_audio {audio_path} ' \
-              f'--source_image {image_path} ' \
-              f'--checkpoint_dir {CHECKPOINT_DIR} ' \
-              f'--result_dir {RESULT_DIR} ' \
-              f'--pose_style {POSE_STYLE} ' \
-              f'--batch_size {BATCH_SIZE} ' \
-              f'--size {SIZE} ' \
-              f'--expression_scale {EXPRESSION_SCALE} ' \
-              f'--preprocess {PREPROCESS} ' \
-              f'--still' if STILL_MODE else ''
-
+    # Формируем команду для вызова inference.py интерпретатором виртуальной среды
+    command = [
+        SADTALKER_PYTHON, "SadTalker/inference.py",
+        "--driven_audio", audio_path,
+        "--source_image", image_path,
+        "--checkpoint_dir", CHECKPOINT_DIR,
+        "--result_dir", RESULT_DIR,
+        "--pose_style", str(POSE_STYLE),
+        "--batch_size", str(BATCH_SIZE),
+        "--size", str(SIZE),
+        "--expression_scale", str(EXPRESSION_SCALE),
+        "--preprocess", PREPROCESS,
+    ]
+    if STILL_MODE:
+        command.append("--still")
 
     # Запуск процесса с помощью subprocess
     try:
-        subprocess.run(command, check=True, shell=True)
+        subprocess.run(command, check=True)
     except subprocess.CalledProcessError as e:
         print(f"Ошибка при обработке аудио: {audio_path}")
         print(e)
@@ -1,35 +1,73 @@
+import threading
 import requests
 from decouple import config
+from yandex_iam import get_cached_iam_token, get_iam_cache
+from tts_cache import cached_synthesis
+
+TTS_URL = config("YANDEX_TTS_URL", default="https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize")
+TTS_FORMAT = "oggopus"
+TTS_SAMPLE_RATE = "48000"
+
+
+class Synthesizer:
+    """
+    Долгоживущий синтезатор Yandex SpeechKit (REST API), один на процесс.
+
+    IAM-токен берётся из общего кэша (yandex_iam) вместо обмена OAuth-токена
+    на каждую фразу, а запросы идут через requests.Session: TCP+TLS-соединение
+    с SpeechKit устанавливается один раз и переиспользуется.
+    """
+
+    def __init__(self, folder_id=None, url=None, timeout=30):
+        self.folder_id = folder_id or config("CATALOG_ID")
+        self.url = url or TTS_URL
+        self.timeout = timeout
+        self._http = requests.Session()
+
+    def synthesize(self, text, voice="alyss"):
+        """Синтезирует фразу и возвращает байты ogg/opus."""
+        for attempt in range(2):
+            response = self._http.post(
+                self.url,
+                headers={"Authorization": f"Bearer {get_cached_iam_token()}"},
+                data={
+                    "text": text.strip(),
+                    "lang": "ru-RU",
+                    "voice": voice,
+                    "folderId": self.folder_id,
+                    "format": TTS_FORMAT,
+                    "sampleRateHertz": TTS_SAMPLE_RATE
+                },
+                timeout=self.timeout,
+            )
+            if response.status_code == 401 and attempt == 0:
+                # Токен отозван раньше срока — запрашиваем новый и повторяем один раз
+                get_iam_cache().invalidate()
+                continue
+            response.raise_for_status()
+            return response.content  # байты oggopus
+
+    def close(self):
+        self._http.close()
+
+
+_synthesizer = None
+_synthesizer_lock = threading.Lock()
+
+
+def get_synthesizer():
+    """Общий для процесса синтезатор (создаётся при первом обращении)."""
+    global _synthesizer
+    if _synthesizer is None:
+        with _synthesizer_lock:
+            if _synthesizer is None:
+                _synthesizer = Synthesizer()
+    return _synthesizer
+
 
 def text_to_audio(text: str, voice: str = "alyss") -> bytes:
     """
     Синтез речи через Yandex SpeechKit REST API.
-    Возвращает аудио в формате ogg/opus (байты).
+    Возвращает аудио в формате ogg/opus (байты); повторяющиеся фразы берутся из кэша.
     """
-    oauth_token = config("OAUTH_TOKEN")
-    folder_id = config("CATALOG_ID")
-
-    # 1. Получаем IAM-токен
-    iam_resp = requests.post(
-        "https://iam.api.cloud.yandex.net/iam/v1/tokens",
-        json={"yandexPassportOauthToken": oauth_token}
-    )
-    iam_resp.raise_for_status()
-    iam_token = iam_resp.json()["iamToken"]
-
-    # 2. Запрос синтеза речи
-    tts_resp = requests.post(
-        "https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize",
-        headers={"Authorization": f"Bearer {iam_token}"},
-        data={
-            "text": text.strip(),
-            "lang": "ru-RU",
-            "voice": voice,
-            "folderId": folder_id,
-            "format": "oggopus",
-            "sampleRateHertz": "48000"
-        }
-    )
-    tts_resp.raise_for_status()
-
-    return tts_resp.content  # байты oggopus
\ No newline at end of file
+    return cached_synthesis(text, voice, lambda t, v: get_synthesizer().synthesize(t, v), TTS_FORMAT, TTS_SAMPLE_RATE)
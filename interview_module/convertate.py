@@ -1,6 +1,6 @@
 import os
 import glob
-import subprocess
+from media_assembly import convert_to_webm
 
 # Указываем путь к FFmpeg
 FFMPEG_PATH = r"E:\ffmpeg-7.1-full_build\bin"
@@ -13,15 +13,8 @@ FINAL_VIDEO_DIR = "TEMP_FINAL_VIDEO"
 # Убедимся, что папка для итоговых видео существует
 os.makedirs(FINAL_VIDEO_DIR, exist_ok=True)
 
-# Функция конвертации MP4 → WebM
-def convert_mp4_to_webm(input_path, output_path):
-    command = f'ffmpeg -i "{input_path}" -c:v libvpx-vp9 -b:v 1M -c:a libopus "{output_path}" -y'
-    try:
-        subprocess.run(command, check=True, shell=True)
-        print(f"✅ Конвертировано: {output_path}")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Ошибка при конвертации {input_path}")
-        print(e)
+# Функция конвертации MP4 → WebM (общая сборка медиа, без shell)
+convert_mp4_to_webm = convert_to_webm
 
 
 # Получаем список всех MP4-файлов
@@ -62,8 +62,8 @@ questions_json = generate_interview_questions(position, skills)
 print(json.dumps(questions_json, indent=2, ensure_ascii=False))  # Выводим в красивом формате
 '''
 
-import requests
 import json
+from llm_client import get_llm_client
 
 # URL API Ollama
 URL = "http://localhost:11434/api/generate"
@@ -73,7 +73,7 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
-def generate_interview_questions(position: str, skills: str, num_questions: int):
+async def generate_interview_questions(position: str, skills: str, num_questions: int):
     """
     Отправляет запрос к Ollama для генерации вопросов собеседования.
 
@@ -101,8 +101,8 @@ def generate_interview_questions(position: str, skills: str, num_questions: int)
         "stream": False  # Отключаем потоковый вывод
     }
 
-    # Отправка POST-запроса
-    response = requests.post(URL, headers=HEADERS, json=data)
+    # Отправка POST-запроса через общий пул соединений (не блокирует цикл событий)
+    response = await get_llm_client().post_json("ollama", URL, data, headers=HEADERS)
 
     # Проверка статуса ответа
     if response.status_code == 200:
@@ -1,5 +1,5 @@
 import json
-import requests
+from llm_client import get_llm_client
 
 # URL API Ollama
 URL = "http://localhost:11434/api/generate"
@@ -9,7 +9,7 @@ HEADERS = {
     "Content-Type": "application/json",
 }
 
-def analyze_interview(position: str, skills: str, interview_data: dict, retry_attempts: int = 2):
+async def analyze_interview(position: str, skills: str, interview_data: dict, retry_attempts: int = 2):
     """
     Анализирует ответы соискателя и возвращает оценки по каждому навыку.
     Также рассчитывает средний балл за все навыки.
@@ -49,8 +49,8 @@ def analyze_interview(position: str, skills: str, interview_data: dict, retry_at
                 "stream": False  # Отключаем потоковый вывод
             }
 
-            # Отправка POST-запроса
-            response = requests.post(URL, headers=HEADERS, json=data)
+            # Отправка POST-запроса через общий пул соединений (не блокирует цикл событий)
+            response = await get_llm_client().post_json("ollama", URL, data, headers=HEADERS)
 
             # Проверка статуса ответа
             if response.status_code == 200:
@@ -0,0 +1,24 @@
+import subprocess
+
+# --- Конвертация роликов SadTalker: ffmpeg вызывается без shell ---
+# Сборка видео ответов и длительность аудио — в Real_time_HR/media_assembly.py
+
+
+def ffmpeg_args(*args, quiet=True):
+    """Аргументы вызова ffmpeg списком — запускается без shell."""
+    return ["ffmpeg", "-hide_banner", *(["-loglevel", "error"] if quiet else []), *args]
+
+
+def convert_to_webm(input_path, output_path):
+    """Конвертация видео (MP4 от SadTalker) в WebM: VP9 + Opus."""
+    try:
+        subprocess.run(
+            ffmpeg_args("-i", input_path, "-c:v", "libvpx-vp9", "-b:v", "1M", "-c:a", "libopus", output_path, "-y"),
+            capture_output=True, check=True,
+        )
+        print(f"✅ Конвертировано: {output_path}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Ошибка при конвертации {input_path}")
+        print(e.stderr.decode("utf-8", "replace"))
+        return False
@@ -1,44 +1,485 @@
 import os
-import whisper
-import librosa
+import threading
+import subprocess
+from dataclasses import dataclass
+import numpy as np
 
 # Убедитесь, что путь к FFmpeg указан
 os.environ["PATH"] += os.pathsep + r"E:\ffmpeg-7.1-full_build\bin"
 
-# Загрузка модели Whisper (large-v3) с использованием GPU
-# model = whisper.load_model("large-v3", device="cuda")
-import torch
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model = whisper.load_model("large-v3", device=device)
+# --- Настройки модели Whisper (задаются через переменные окружения сервиса) ---
+# Офлайн-анализ интервью: по умолчанию самая точная модель large-v3
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "large-v3")
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "auto")  # auto | cpu | cuda
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "auto")  # auto | float16 | float32 | int8
+# Реализация распознавания: openai-whisper (PyTorch) или faster-whisper (CTranslate2, int8 на CPU)
+STT_BACKEND = os.getenv("STT_BACKEND", "openai-whisper")
+# Число потоков CTranslate2 на CPU (0 — по числу ядер)
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", 0))
+# Профиль распознавания по умолчанию: fast для ходов интервью, detailed для офлайн-анализа
+STT_PROFILE = os.getenv("STT_PROFILE", "fast")
+
+@dataclass(frozen=True)
+class TranscriptionOptions:
+    """Параметры декодирования, общие для всех реализаций распознавания."""
+    word_timestamps: bool = False  # Временные метки слов (дополнительный проход DTW)
+    beam_size: int = None  # None — жадное декодирование
+    temperature: tuple = (0.0,)  # Несколько значений — повтор с ростом температуры при сбое
+    verbose: bool = None  # None — без вывода сегментов в консоль
+
+
+PROFILES = {
+    # Ходы интервью: только текст, жадное декодирование без повторов, без печати
+    "fast": TranscriptionOptions(),
+    # Офлайн-анализ: метки слов, beam search и повтор с ростом температуры
+    "detailed": TranscriptionOptions(
+        word_timestamps=True,
+        beam_size=5,
+        temperature=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        verbose=True,
+    ),
+}
+
+
+def resolve_options(options=None):
+    """Принимает TranscriptionOptions, имя профиля или None (профиль STT_PROFILE)."""
+    if isinstance(options, TranscriptionOptions):
+        return options
+    profile = options or STT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"Неизвестный профиль распознавания: {profile}. Доступны: {', '.join(PROFILES)}")
+    return PROFILES[profile]
+
+
+# Реестр загруженных моделей: модель грузится при первом обращении, а не при импорте модуля
+_models = {}
+_models_lock = threading.Lock()
+
+
+def resolve_device(device=None, backend=None):
+    """Определяет устройство для модели: явно заданное или cuda, если доступна."""
+    device = device or WHISPER_DEVICE
+    if device == "auto":
+        if (backend or STT_BACKEND) == "faster-whisper":
+            # faster-whisper не зависит от PyTorch: спрашиваем CTranslate2
+            import ctranslate2
+            device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        else:
+            import torch
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def resolve_compute_type(device, compute_type=None, backend=None):
+    """
+    Тип вычислений, если он не задан явно: FP16 на GPU;
+    на CPU — FP32 для openai-whisper (FP16 не поддерживается) и int8 для faster-whisper.
+    """
+    compute_type = compute_type or WHISPER_COMPUTE_TYPE
+    if compute_type == "auto":
+        if device == "cuda":
+            compute_type = "float16"
+        elif (backend or STT_BACKEND) == "faster-whisper":
+            compute_type = "int8"
+        else:
+            compute_type = "float32"
+    return compute_type
+
+
+def get_model(name=None, device=None):
+    """Возвращает модель openai-whisper из реестра, загружая её один раз (потокобезопасно)."""
+    name = name or WHISPER_MODEL
+    device = resolve_device(device, "openai-whisper")
+    key = (name, device)
+
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                import whisper
+                print(f"[STT] Загрузка модели Whisper {name} ({device})...")
+                model = whisper.load_model(name, device=device)
+                _models[key] = model
+    return model
+
+
+class OpenAIWhisperBackend:
+    """Исходная реализация на openai-whisper (PyTorch)."""
+
+    name = "openai-whisper"
+
+    def __init__(self, model_name=None, device=None, compute_type=None):
+        self.model_name = model_name or WHISPER_MODEL
+        self.device = resolve_device(device, self.name)
+        self.compute_type = resolve_compute_type(self.device, compute_type, self.name)
+        self.model = get_model(self.model_name, self.device)
+
+    def transcribe(self, audio, language="ru", options=None):
+        options = resolve_options(options)
+        result = self.model.transcribe(
+            audio,
+            language=language,
+            verbose=options.verbose,
+            fp16=self.compute_type == "float16",  # FP16 только на GPU
+            word_timestamps=options.word_timestamps,
+            beam_size=options.beam_size,
+            temperature=options.temperature,
+        )
+
+        full_text = ""
+        for segment in result['segments']:
+            full_text += segment['text'] + " "
+        return full_text.strip()
+
+    def transcribe_batch(self, chunks, language="ru", options=None):
+        """Декодирует пачку кусков (каждый не длиннее 30 с) одним проходом модели."""
+        import torch
+        import whisper
+
+        options = resolve_options(options)
+        # Каждый кусок дополняется до окна 30 с, мел-спектрограммы складываются в один батч
+        mel = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(chunk), n_mels=self.model.dims.n_mels)
+            for chunk in chunks
+        ]).to(self.model.device)
+        decoding = whisper.DecodingOptions(
+            language=language,
+            beam_size=options.beam_size,
+            temperature=options.temperature[0],
+            without_timestamps=True,
+            fp16=self.compute_type == "float16",
+        )
+        return [result.text.strip() for result in whisper.decode(self.model, mel, decoding)]
+
+
+class FasterWhisperBackend:
+    """
+    Реализация на faster-whisper (CTranslate2).
+
+    Те же веса Whisper, квантованные в int8: на CPU распознавание
+    в несколько раз быстрее и требует заметно меньше памяти.
+    """
+
+    name = "faster-whisper"
+
+    def __init__(self, model_name=None, device=None, compute_type=None):
+        from faster_whisper import WhisperModel
+
+        self.model_name = model_name or WHISPER_MODEL
+        self.device = resolve_device(device, self.name)
+        self.compute_type = resolve_compute_type(self.device, compute_type, self.name)
+        print(f"[STT] Загрузка модели faster-whisper {self.model_name} ({self.device}, {self.compute_type})...")
+        self.model = WhisperModel(
+            self.model_name,
+            device=self.device,
+            compute_type=self.compute_type,
+            cpu_threads=WHISPER_CPU_THREADS,
+        )
+
+    def transcribe(self, audio, language="ru", options=None):
+        options = resolve_options(options)
+        # Сегменты — ленивый генератор: распознавание идёт по мере чтения
+        segments, _ = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=options.beam_size or 1,
+            word_timestamps=options.word_timestamps,
+            temperature=list(options.temperature),
+        )
+
+        texts = []
+        for segment in segments:
+            if options.verbose:
+                print(f"[{segment.start:.2f} --> {segment.end:.2f}] {segment.text.strip()}")
+            texts.append(segment.text.strip())
+        return " ".join(texts).strip()
+
+    def transcribe_batch(self, chunks, language="ru", options=None):
+        """Декодирует пачку кусков (каждый не длиннее 30 с) одним вызовом CTranslate2."""
+        from faster_whisper.tokenizer import Tokenizer
+
+        options = resolve_options(options)
+        extractor = self.model.feature_extractor
+        features = np.stack([
+            extractor(np.pad(chunk, (0, max(0, extractor.n_samples - len(chunk)))))[:, :extractor.nb_max_frames]
+            for chunk in chunks
+        ])
+        encoded = self.model.encode(features)
+
+        tokenizer = Tokenizer(
+            self.model.hf_tokenizer,
+            self.model.model.is_multilingual,
+            task="transcribe",
+            language=language,
+        )
+        prompt = self.model.get_prompt(tokenizer, [], without_timestamps=True)
+        results = self.model.model.generate(
+            encoded,
+            [prompt] * len(chunks),
+            beam_size=options.beam_size or 1,
+            max_length=self.model.max_length,
+            suppress_blank=True,
+        )
+        return [tokenizer.decode(result.sequences_ids[0]).strip() for result in results]
+
+
+# Доступные реализации распознавания (значения STT_BACKEND)
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(backend=None, model_name=None, device=None):
+    """Возвращает реализацию распознавания из реестра, создавая её один раз (потокобезопасно)."""
+    backend = backend or STT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный STT_BACKEND: {backend}. Доступны: {', '.join(BACKENDS)}")
+    key = (backend, model_name or WHISPER_MODEL, resolve_device(device, backend))
+
+    stt = _backends.get(key)
+    if stt is None:
+        with _backends_lock:
+            stt = _backends.get(key)
+            if stt is None:
+                stt = BACKENDS[backend](model_name=key[1], device=key[2])
+                _backends[key] = stt
+    return stt
 
 
 # Функция для загрузки аудиофайла
 def load_audio(file_path):
+    import librosa
     speech, rate = librosa.load(file_path, sr=16000)
     return speech, rate
 
 
+# Частота дискретизации, с которой работает Whisper
+SAMPLE_RATE = 16000
+
+
+# Функция для декодирования загруженного аудио (webm/opus, ogg, wav...) прямо в память
+def decode_audio_bytes(data, sr=SAMPLE_RATE):
+    """Декодирует байты аудиофайла одним ffmpeg через pipe в моно float32 с частотой sr."""
+    command = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-ar", str(sr),
+        "pipe:1",
+    ]
+    try:
+        result = subprocess.run(command, input=bytes(data), capture_output=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Не удалось декодировать аудио: {e.stderr.decode(errors='ignore')}") from e
+
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+# --- Отсечение тишины (энергетический VAD) перед распознаванием ---
+STT_VAD = os.getenv("STT_VAD", "1") == "1"
+VAD_FRAME_SECONDS = 0.03  # Длина кадра анализа энергии
+VAD_FLOOR_DB = float(os.getenv("STT_VAD_FLOOR_DB", -45))  # Тише этого уровня — всегда тишина (dBFS)
+VAD_MARGIN_DB = 10.0  # Речь громче оценённого уровня фона минимум на столько
+VAD_MIN_SPEECH = 0.25  # Более короткие всплески (щелчки, стук) отбрасываются
+VAD_MIN_SILENCE = 0.5  # Более короткие паузы считаются частью фразы
+VAD_PAD = 0.2  # Запас вокруг речи, чтобы не срезать начало и конец слов
+VAD_MAX_CHUNK = float(os.getenv("STT_VAD_MAX_CHUNK", 28))  # Куски не длиннее окна Whisper (30 с)
+VAD_GAP = 0.3  # Тишина между склеенными фрагментами речи внутри куска
+
+# Сколько секунд аудио пришло на распознавание и сколько из них отсечено как тишина
+vad_stats = {"audio_seconds": 0.0, "skipped_seconds": 0.0}
+_vad_stats_lock = threading.Lock()
+
+
+def frame_energy_db(audio, sr=SAMPLE_RATE):
+    """Уровень (dBFS) каждого кадра длиной VAD_FRAME_SECONDS."""
+    frame = int(sr * VAD_FRAME_SECONDS)
+    count = len(audio) // frame
+    if count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = audio[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detect_speech(audio, sr=SAMPLE_RATE):
+    """
+    Находит фрагменты речи по энергии кадров.
+
+    Порог адаптивный: выше уровня фона (10-й перцентиль) на VAD_MARGIN_DB,
+    но не выше пика минус 25 дБ, чтобы сплошная речь не считалась фоном.
+    Возвращает список (начало, конец) в отсчётах.
+    """
+    energy = frame_energy_db(audio, sr)
+    if energy.size == 0:
+        return []
+
+    noise = np.percentile(energy, 10)
+    threshold = max(VAD_FLOOR_DB, min(noise + VAD_MARGIN_DB, energy.max() - 25))
+    voiced = energy > threshold
+
+    # Границы непрерывных участков речи в кадрах
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    frame = int(sr * VAD_FRAME_SECONDS)
+    min_silence = int(VAD_MIN_SILENCE / VAD_FRAME_SECONDS)
+    min_speech = int(VAD_MIN_SPEECH / VAD_FRAME_SECONDS)
+    pad = int(VAD_PAD * sr)
+
+    segments = []
+    for start, end in zip(starts, ends):
+        # Склеиваем фрагменты, разделённые короткой паузой
+        if segments and start - segments[-1][1] < min_silence:
+            segments[-1][1] = end
+        else:
+            segments.append([start, end])
+
+    return [
+        (max(0, start * frame - pad), min(len(audio), end * frame + pad))
+        for start, end in segments
+        if end - start >= min_speech
+    ]
+
+
+def split_speech(audio, sr=SAMPLE_RATE):
+    """
+    Вырезает речь из записи и собирает её в куски не длиннее VAD_MAX_CHUNK.
+
+    Соседние фрагменты склеиваются через короткую паузу VAD_GAP, поэтому
+    обычный ответ кандидата превращается в одно окно Whisper без тишины,
+    а длинный — в несколько кусков, разрезанных по паузам.
+    Возвращает (список кусков, секунд отсечено).
+    """
+    max_chunk = int(VAD_MAX_CHUNK * sr)
+    gap = np.zeros(int(VAD_GAP * sr), dtype=np.float32)
+
+    chunks, current, current_len, speech = [], [], 0, 0
+    for start, end in detect_speech(audio, sr):
+        # Фрагмент длиннее окна режется на равные части
+        for piece_start in range(start, end, max_chunk):
+            piece = audio[piece_start:min(end, piece_start + max_chunk)]
+            speech += len(piece)
+            if current and current_len + len(gap) + len(piece) > max_chunk:
+                chunks.append(np.concatenate(current))
+                current, current_len = [], 0
+            if current:
+                current.append(gap)
+                current_len += len(gap)
+            current.append(piece)
+            current_len += len(piece)
+    if current:
+        chunks.append(np.concatenate(current))
+
+    return chunks, (len(audio) - speech) / sr
+
+
+def _record_vad(total_seconds, skipped_seconds):
+    with _vad_stats_lock:
+        vad_stats["audio_seconds"] += total_seconds
+        vad_stats["skipped_seconds"] += skipped_seconds
+
+
 # Функция для транскрипции с временными метками
-def transcribe_audio(audio_file, language="ru"):
-    """Функция для транскрипции аудио с временными метками."""
+def transcribe_audio(audio_file, language="ru", backend=None, options=None):
+    """
+    Функция для транскрипции аудио выбранной реализацией (STT_BACKEND по умолчанию).
+    options — TranscriptionOptions или имя профиля ("fast", "detailed").
+    """
 
     print("Обработка началась...")
 
-    # Запуск транскрипции с временными метками
-    result = model.transcribe(
-        audio_file,
-        language=language,
-        verbose=True,  # Показывать прогресс обработки
-        fp16=True,  # Использовать GPU
-        word_timestamps=True  # Включить временные метки для слов
-    )
-
-    print("\nИзвлечённый текст с временными метками:")
-    full_text = ""
-    for segment in result['segments']:
-        full_text += segment['text'] + " "
-
-    return full_text.strip()
+    stt = get_backend(backend)
+    return stt.transcribe(audio_file, language=language, options=options)
+
+
+def _as_audio_array(audio):
+    """Приводит байты аудиофайла или массив к одноканальному float32 с частотой 16 кГц."""
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return decode_audio_bytes(audio)
+    if isinstance(audio, np.ndarray):
+        if audio.ndim != 1:
+            raise ValueError("Ожидается одноканальный массив аудио (ndim == 1).")
+        return audio.astype(np.float32, copy=False)
+    raise TypeError(f"Неподдерживаемый тип аудио: {type(audio).__name__}")
+
+
+# Функция для транскрипции аудио из памяти, без записи на диск
+def transcribe_audio_data(audio, language="ru", backend=None, options=None, vad=None):
+    """
+    Принимает сырые байты аудиофайла (например, webm/opus из браузера)
+    или массив NumPy float32 с частотой 16 кГц и возвращает текст.
+    vad — отсекать ли тишину перед распознаванием (по умолчанию STT_VAD).
+    """
+    audio = _as_audio_array(audio)
+
+    if not (STT_VAD if vad is None else vad):
+        return transcribe_audio(audio, language=language, backend=backend, options=options)
+
+    total_seconds = len(audio) / SAMPLE_RATE
+    chunks, skipped_seconds = split_speech(audio)
+    _record_vad(total_seconds, skipped_seconds)
+    print(f"[VAD] Отсечено {skipped_seconds:.1f} из {total_seconds:.1f} с тишины, кусков речи: {len(chunks)}")
+
+    # Куски распознаются по очереди; если речи нет, модель не вызывается
+    texts = [transcribe_audio(chunk, language=language, backend=backend, options=options) for chunk in chunks]
+    return " ".join(text for text in texts if text).strip()
+
+
+# Размер пачки для пакетной транскрипции (офлайн-обработка интервью)
+STT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", 8))
+
+
+# Функция для пакетной транскрипции многих записей за один проход модели
+def transcribe_batch(clips, language="ru", backend=None, options=None, batch_size=None, vad=None):
+    """
+    Транскрибирует список записей (байты, массивы 16 кГц или пути к файлам).
+
+    Каждая запись режется на куски не длиннее окна Whisper (с VAD — по паузам),
+    куски всех записей сортируются по длине и декодируются пачками по batch_size,
+    так что модель работает с полной загрузкой, а не с пакетом из одного файла.
+    Возвращает тексты в порядке записей.
+    """
+    batch_size = batch_size or STT_BATCH_SIZE
+    use_vad = STT_VAD if vad is None else vad
+    window = int(VAD_MAX_CHUNK * SAMPLE_RATE)
+
+    chunks = []  # (номер записи, номер куска, аудио)
+    for clip_index, clip in enumerate(clips):
+        if isinstance(clip, (str, os.PathLike)):
+            with open(clip, "rb") as f:
+                clip = f.read()
+        audio = _as_audio_array(clip)
+
+        if use_vad:
+            pieces, skipped_seconds = split_speech(audio)
+            _record_vad(len(audio) / SAMPLE_RATE, skipped_seconds)
+        else:
+            pieces = [audio[start:start + window] for start in range(0, len(audio), window)]
+        chunks.extend((clip_index, chunk_index, piece) for chunk_index, piece in enumerate(pieces))
+
+    # Бакетирование по длине: в одну пачку попадают куски близкой длины,
+    # и декодер не ждёт самый длинный ответ в пачке из коротких
+    chunks.sort(key=lambda item: len(item[2]), reverse=True)
+
+    stt = get_backend(backend)
+    texts = [dict() for _ in clips]
+    for start in range(0, len(chunks), batch_size):
+        batch = chunks[start:start + batch_size]
+        decoded = stt.transcribe_batch([audio for _, _, audio in batch], language=language, options=options)
+        for (clip_index, chunk_index, _), text in zip(batch, decoded):
+            texts[clip_index][chunk_index] = text
+
+    print(f"[STT] Пакет: записей {len(clips)}, кусков {len(chunks)}, "
+          f"пачек {-(-len(chunks) // batch_size)} по {batch_size}")
+    return [
+        " ".join(parts[index] for index in sorted(parts) if parts[index]).strip()
+        for parts in texts
+    ]
 
 '''
 # Функция, принимающая .wav файл и возвращающая текст
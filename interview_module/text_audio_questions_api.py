@@ -1,19 +1,28 @@
 import os
 import json
+import asyncio
 import shutil
 import subprocess
 from fastapi import FastAPI, Form, File, UploadFile
+from contextlib import asynccontextmanager
 from fastapi.responses import JSONResponse, FileResponse
-from typing import Dict, List
+from typing import Callable, Dict, List
 from generation_first import generate_interview_questions
-from Yandex_TTS import text_to_audio
-from openai_whisper_STT import transcribe_audio
+from llm_client import close_llm_client
+from Yandex_TTS1 import text_to_audio
+from tts_cache import get_tts_cache
+from openai_whisper_STT import transcribe_audio_data, transcribe_batch
 from fastapi.middleware.cors import CORSMiddleware
 from enum import Enum
 from pydantic import BaseModel, validator
 from pathlib import Path
 import base64
 import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from decouple import config
 
 TEMP_AUDIO_DIR = "TEMP_AUDIO"
 TEMP_VIDEO_DIR = "TEMP_VIDEO"
@@ -21,6 +30,14 @@ TEMP_FINAL_VIDEO_DIR = "TEMP_FINAL_VIDEO"
 TEMP_IMAGE_DIR = 'TEMP_IMAGE'
 SPEAKERS_PHOTOS_DEFAULT = 'speakers_photos_default'
 
+# Озвучка вопросов: одновременных запросов к SpeechKit и повторов при сбое
+TTS_PARALLEL = config("TTS_PARALLEL", default=4, cast=int)
+TTS_RETRIES = config("TTS_RETRIES", default=2, cast=int)
+TTS_RETRY_DELAY = config("TTS_RETRY_DELAY", default=0.5, cast=float)
+
+# Ход генерации интервью для опроса клиентом: { progress_id: {"stage", "done", "total"} }
+generation_progress = {}
+
 # Очистка временных директорий
 def clear_temp_dirs():
     # Очистка всех временных папок
@@ -32,7 +49,16 @@ def clear_temp_dirs():
 
 clear_temp_dirs()  # Очистить директории сразу при старте
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Закрываем пул keep-alive соединений к Ollama
+    await close_llm_client()
+
+
+app = FastAPI(lifespan=lifespan)
+
 from fastapi.staticfiles import StaticFiles
 app.mount("/static/videos", StaticFiles(directory=TEMP_FINAL_VIDEO_DIR), name="videos")
 
@@ -70,9 +96,32 @@ async def interview_pipeline(
     skills: str = Form(..., description="Навыки, которыми должен обладать соискатель, через запятую"),
     gender: Gender = Form(..., description="Пол HR-агента"),
     image: Optional[str] = Form("", description="Полный путь к фотографии HR-агента (формат .png, .jpg или .webp)"),
-    priority_questions: str = Form("", description="Список приоритетных вопросов в формате JSON")
+    priority_questions: str = Form("", description="Список приоритетных вопросов в формате JSON"),
+    progress_id: Optional[str] = Form(None, description="Идентификатор для опроса хода генерации (/generate_interview_progress/)")
 ):
     """API-пайплайн: генерация вопросов, их редактирование и озвучка."""
+    try:
+        return await run_interview_pipeline(position, skills, gender, image, priority_questions, progress_id)
+    finally:
+        generation_progress.pop(progress_id, None)
+
+
+@app.get("/generate_interview_progress/{progress_id}")
+async def interview_progress(progress_id: str):
+    """Ход генерации интервью: этап (questions, audio, video) и сколько вопросов уже озвучено."""
+    progress = generation_progress.get(progress_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Генерация не найдена или уже завершена")
+    return progress
+
+
+async def run_interview_pipeline(position, skills, gender, image, priority_questions, progress_id=None):
+    """Шаги пайплайна; этапы и число озвученных вопросов пишутся в generation_progress[progress_id]."""
+    def set_progress(stage, done=0, total=0):
+        if progress_id:
+            generation_progress[progress_id] = {"stage": stage, "done": done, "total": total}
+
+    set_progress("questions")
 
     # Обработка приоритетных вопросов
     if priority_questions:
@@ -190,7 +239,7 @@ async def interview_pipeline(
     remaining_questions = max(0, 15 - num_priority_questions)  # Оставшееся количество вопросов для генерации
 
     # Генерация вопросов
-    # generated_questions = generate_interview_questions(position, skills, remaining_questions)
+    # generated_questions = await generate_interview_questions(position, skills, remaining_questions)
     generated_questions = {
         "question": f"Здравствуйте! Я ваш виртуальный HR-ассистент. Сегодня поговорим о вашем опыте и навыках, чтобы лучше понять, как они соотносятся с требованиями на позицию {position.lower()}. Как могу к вам обращаться?"
         #"question": f"Здравствуйте!"
@@ -203,8 +252,14 @@ async def interview_pipeline(
         {str(i + len(generated_questions) + 1): q for i, q in enumerate(priority_questions_obj.questions)}
     )
 
-    # Шаг 2: Создание аудиофайлов с учетом пола говорящего
-    audio_files = generate_audio(all_questions, gender)
+    # Шаг 2: Создание аудиофайлов с учетом пола говорящего (вопросы озвучиваются параллельно)
+    def report_progress(done, total, num):
+        print(f"Озвучено вопросов: {done}/{total} (вопрос {num})")
+        set_progress("audio", done, total)
+
+    set_progress("audio", 0, len(all_questions))
+
+    audio_files = await asyncio.to_thread(generate_audio, all_questions, gender, report_progress)
 
     for item in os.listdir(TEMP_FINAL_VIDEO_DIR):
         item_path = os.path.join(TEMP_FINAL_VIDEO_DIR, item)
@@ -212,7 +267,9 @@ async def interview_pipeline(
             os.remove(item_path)
 
     # Шаг 3: Запуск скриптов для анимации и конвертации
-    generate_videos(image_path)  # Передаем путь к изображению
+    set_progress("video", len(audio_files), len(all_questions))
+    # Анимация идёт в потоке: сервис тем временем отвечает на опрос хода генерации
+    await asyncio.to_thread(generate_videos, image_path)  # Передаем путь к изображению
 
     default_output_dir = os.path.join(TEMP_FINAL_VIDEO_DIR)  # Это твоя папка типа static/videos/
 
@@ -245,22 +302,72 @@ async def interview_pipeline(
     return response
 
 
-def generate_audio(questions: dict, gender: Gender) -> Dict[str, str]:
-    audio_files = {}
-    voice = "zahar" if gender == Gender.male else "oksana"
-
-    for num, question in questions.items():
-        audio = text_to_audio(question, voice)
-        if not audio:
-            continue
+def is_transient(error: Exception) -> bool:
+    """Сбой, который может пройти при повторе: таймаут, обрыв соединения, 429 или 5xx от SpeechKit."""
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and (status == 429 or status >= 500)
 
-        audio_file_path = os.path.join(TEMP_AUDIO_DIR, f"question_{num}.wav")
-        with open(audio_file_path, 'wb') as f:
-            f.write(audio)
 
-        audio_files[num] = audio_file_path
+def synthesize_with_retry(question: str, voice: str, retries: int = None) -> bytes:
+    """
+    Синтез одного вопроса; временный сбой SpeechKit повторяем с нарастающей паузой.
+    Ошибки запроса (неверный текст или голос, нет доступа) не повторяются.
+    """
+    retries = TTS_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            return text_to_audio(question, voice)
+        except Exception as e:
+            if attempt == retries or not is_transient(e):
+                raise
+            delay = TTS_RETRY_DELAY * 2 ** attempt
+            print(f"Ошибка синтеза (попытка {attempt + 1}/{retries + 1}): {e}. Повтор через {delay:.1f} с")
+            time.sleep(delay)
+
+
+def generate_audio(
+    questions: dict,
+    gender: Gender,
+    on_progress: Optional[Callable[[int, int, str], None]] = None,
+    max_parallel: int = None,
+) -> Dict[str, str]:
+    """
+    Озвучивает все вопросы параллельно (не больше max_parallel запросов к SpeechKit сразу).
+    Результат упорядочен как questions; on_progress(готово, всего, номер) вызывается
+    после каждого озвученного вопроса.
+    """
+    voice = "zahar" if gender == Gender.male else "oksana"
+    total = len(questions)
+    done = 0
+    progress_lock = threading.Lock()
+
+    def synthesize_one(num, question):
+        nonlocal done
+        audio = synthesize_with_retry(question, voice)
+        audio_file_path = None
+        if audio:
+            audio_file_path = os.path.join(TEMP_AUDIO_DIR, f"question_{num}.wav")
+            with open(audio_file_path, 'wb') as f:
+                f.write(audio)
+        with progress_lock:
+            done += 1
+            if on_progress:
+                on_progress(done, total, num)
+        return audio_file_path
+
+    with ThreadPoolExecutor(max_workers=max_parallel or TTS_PARALLEL) as pool:
+        futures = {num: pool.submit(synthesize_one, num, question) for num, question in questions.items()}
+        try:
+            paths = {num: future.result() for num, future in futures.items()}
+        except Exception:
+            # Вопрос не озвучился и после повторов — остальные не запускаем
+            for future in futures.values():
+                future.cancel()
+            raise
 
-    return audio_files
+    return {num: path for num, path in paths.items() if path}
 
 
 def generate_videos(image_path: str):
@@ -275,20 +382,39 @@ def generate_videos(image_path: str):
 async def transcribe_wav(file: UploadFile = File(...)):
     """Роут для получения аудиофайла .wav и возврата текста."""
 
-    # Сохраняем загруженный файл во временную папку
-    audio_path = os.path.join(TEMP_AUDIO_DIR, file.filename)
-    with open(audio_path, "wb") as f:
-        f.write(await file.read())
-
-    # Получаем транскрипцию с помощью функции из openai-whisper_STT.py
-    text = transcribe_audio(audio_path)
+    # Декодируем загрузку прямо из памяти, без временного файла
+    audio_bytes = await file.read()
 
-    # Удаляем файл после обработки
-    os.remove(audio_path)
+    # Получаем транскрипцию с помощью функции из openai-whisper_STT.py (в потоке, чтобы не блокировать сервер)
+    text = await asyncio.to_thread(transcribe_audio_data, audio_bytes)
 
     # Возвращаем текст
     return {"transcribed_text": text}
 
+
+@app.post("/transcribe_batch/")
+async def transcribe_batch_route(files: List[UploadFile] = File(...)):
+    """
+    Роут для пакетной транскрипции (например, всех видеоответов интервью при повторной обработке).
+    Возвращает тексты в порядке загруженных файлов.
+    """
+    clips = [await file.read() for file in files]
+
+    # Все записи декодируются общими пачками за один вызов модели (в потоке, чтобы не блокировать сервер)
+    texts = await asyncio.to_thread(transcribe_batch, clips)
+
+    return {
+        "results": [
+            {"filename": file.filename, "transcribed_text": text}
+            for file, text in zip(files, texts)
+        ]
+    }
+
+@app.get("/tts_cache_stats/")
+async def tts_cache_stats():
+    """Попадания и промахи кэша синтезированных фраз."""
+    return get_tts_cache().stats()
+
 from interview_analyzing import analyze_interview
 
 # Роут для анализа интервью
@@ -318,7 +444,7 @@ async def analyze_interview_route(
             raise HTTPException(status_code=400, detail="JSON должен содержать поля 'questions' и 'answers'")
 
         # Вызываем функцию analyze_interview для анализа данных
-        result = analyze_interview(position, skills, interview_content, retry_attempts=2)
+        result = await analyze_interview(position, skills, interview_content, retry_attempts=2)
 
         # Возвращаем результат анализа
         return {"analysis_result": result}
@@ -0,0 +1,228 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from decouple import config
+
+# --- Кэш синтезированных фраз: повторяющиеся реплики аватара не идут в SpeechKit ---
+TTS_CACHE_ENABLED = config("TTS_CACHE_ENABLED", default=True, cast=bool)
+TTS_CACHE_DIR = config("TTS_CACHE_DIR", default="TTS_CACHE")
+TTS_CACHE_MAX_BYTES = config("TTS_CACHE_MAX_BYTES", default=512 * 1024 * 1024, cast=int)  # на диске
+TTS_CACHE_MEMORY_BYTES = config("TTS_CACHE_MEMORY_BYTES", default=64 * 1024 * 1024, cast=int)  # в памяти
+# Как часто индекс сверяется с каталогом, который пишут и другие процессы
+TTS_CACHE_RESCAN_SECONDS = config("TTS_CACHE_RESCAN_SECONDS", default=60, cast=float)
+
+
+def normalize_text(text):
+    """Нормализует фразу: одинаковый текст с разными пробелами даёт один ключ."""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def cache_key(text, voice, audio_format, sample_rate):
+    """Ключ кэша — хэш (нормализованный текст, голос, формат, частота)."""
+    raw = json.dumps([normalize_text(text), voice, audio_format, str(sample_rate)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TtsCache:
+    """
+    Двухуровневый кэш синтезированного аудио с вытеснением давно не использованных фраз (LRU).
+
+    Память — быстрый уровень для горячих фраз, диск переживает перезапуск сервиса.
+    Файлы адресуются хэшем содержимого запроса, поэтому совпадающие фразы
+    разных сессий и процессов разделяют одну запись. Каталог может быть общим
+    для нескольких процессов: чужой файл подхватывается при промахе индекса,
+    а при превышении лимита и раз в TTS_CACHE_RESCAN_SECONDS индекс сверяется
+    с диском, так что лимит действует на каталог целиком.
+    """
+
+    def __init__(self, directory=None, max_disk_bytes=None, max_memory_bytes=None):
+        self.directory = directory or TTS_CACHE_DIR
+        self.max_disk_bytes = TTS_CACHE_MAX_BYTES if max_disk_bytes is None else max_disk_bytes
+        self.max_memory_bytes = TTS_CACHE_MEMORY_BYTES if max_memory_bytes is None else max_memory_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # ключ -> байты
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # ключ -> размер файла, от давно использованных к свежим
+        self._disk_bytes = 0
+        self._in_flight = {}  # ключ -> Event: одну фразу синтезируем один раз
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._disk = self._scan_disk()
+        self._disk_bytes = sum(self._disk.values())
+        self._scanned_at = time.monotonic()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.audio")
+
+    @staticmethod
+    def _touch(path):
+        # Точное время вместо грубых часов файловой системы: по нему упорядочиваются фразы при сверке с диском
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _scan_disk(self):
+        """Файлы каталога: ключ -> размер, от давно использованных к свежим (по времени изменения)."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".audio"):
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except FileNotFoundError:
+                        continue  # файл вытеснил другой процесс
+                    entries.append((stat.st_mtime_ns, name[:-len(".audio")], stat.st_size))
+        return OrderedDict((key, size) for _, key, size in sorted(entries))
+
+    def _remember(self, key, data):
+        """Кладёт фразу в память, вытесняя давно не использованные."""
+        if len(data) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+
+        # Файла может не быть в индексе: его записал другой процесс с тем же каталогом
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            self._touch(self._path(key))
+        except FileNotFoundError:
+            with self._lock:
+                self._disk_bytes -= self._disk.pop(key, 0)
+            return None
+
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._remember(key, data)
+            self.disk_hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Запись через временный файл: другой процесс не прочитает недописанное аудио
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._touch(path)
+
+        with self._lock:
+            self._remember(key, data)
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            stale = time.monotonic() - self._scanned_at > TTS_CACHE_RESCAN_SECONDS
+            if self._disk_bytes <= self.max_disk_bytes and not stale:
+                return
+            self._scanned_at = time.monotonic()
+
+        # Индекс сверяется с диском: там и файлы других процессов, и уже удалённые ими
+        disk = self._scan_disk()
+        disk.pop(key, None)
+        disk[key] = len(data)
+        evicted = []
+        with self._lock:
+            self._disk = disk
+            self._disk_bytes = sum(disk.values())
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                self._memory_bytes -= len(self._memory.pop(old_key, b""))
+                evicted.append(old_key)
+            self.evictions += len(evicted)
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def get_or_synthesize(self, text, voice, synthesize, audio_format, sample_rate):
+        """Возвращает аудио из кэша или синтезирует его через synthesize(text, voice) и сохраняет."""
+        key = cache_key(text, voice, audio_format, sample_rate)
+        while True:
+            data = self.get(key)
+            if data is not None:
+                return data
+            with self._lock:
+                # Между промахом и блокировкой фразу мог сохранить другой поток — перечитываем её
+                if key in self._memory or key in self._disk:
+                    continue
+                event = self._in_flight.get(key)
+                if event is None:
+                    self._in_flight[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Эту же фразу уже синтезирует другой поток — ждём его результат
+            event.wait()
+
+        try:
+            data = synthesize(text, voice)
+            self.put(key, data)
+            return data
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_tts_cache():
+    """Общий для процесса кэш синтезированных фраз."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = TtsCache()
+    return _default_cache
+
+
+def cached_synthesis(text, voice, synthesize, audio_format, sample_rate):
+    """Синтез через общий кэш; при TTS_CACHE_ENABLED=0 — напрямую."""
+    if not TTS_CACHE_ENABLED:
+        return synthesize(text, voice)
+    return get_tts_cache().get_or_synthesize(text, voice, synthesize, audio_format, sample_rate)
@@ -1,17 +1,29 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException
+from contextlib import asynccontextmanager
 from fastapi.responses import JSONResponse
 import os
 import tempfile
 import json
 from fastapi.middleware.cors import CORSMiddleware
-from parsing_documents import read_docx_file, summarize_resume
+from parsing_documents import read_docx_file, asummarize_resume
+from llm_client import close_llm_client
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Закрываем пул keep-alive соединений к OpenRouter
+    await close_llm_client()
+
 
 app = FastAPI(
     title="Resume Parser API",
     description="API для загрузки резюме (.docx/.rtf) и получения структурированного JSON-анализа",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://127.0.0.1:8000", "http://localhost:8000"],  # Разрешаем только ваш фронтенд
@@ -41,7 +53,7 @@ async def parse_resume(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="Не удалось извлечь текст из файла")
 
         # Анализируем через вашу функцию
-        result = summarize_resume(resume_text)
+        result = await asummarize_resume(resume_text)
         if not result:
             raise HTTPException(status_code=500, detail="Не удалось проанализировать резюме")
 
@@ -0,0 +1,103 @@
+import os
+import asyncio
+import weakref
+from dataclasses import dataclass
+
+import httpx
+from dotenv import load_dotenv
+
+# Загрузка переменных окружения из .env файла
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """Ограничения для одного LLM-провайдера."""
+    max_concurrency: int  # одновременных запросов к провайдеру из процесса
+    timeout: float  # общий таймаут запроса, сек
+    connect_timeout: float = 10.0
+
+
+def _provider_from_env(name, max_concurrency, timeout):
+    prefix = name.upper()
+    return ProviderConfig(
+        max_concurrency=int(os.getenv(f"{prefix}_MAX_CONCURRENCY", max_concurrency)),
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT", timeout)),
+    )
+
+
+# Провайдеры, к которым ходят сервисы проекта
+PROVIDERS = {
+    "yandexgpt": _provider_from_env("yandexgpt", 8, 60),
+    "openrouter": _provider_from_env("openrouter", 4, 120),
+    "ollama": _provider_from_env("ollama", 2, 300),
+}
+
+# Параметры общего пула соединений
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 32))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 16))
+KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+
+
+class LLMClient:
+    """
+    Общий асинхронный HTTP-клиент для обращений к LLM.
+
+    Держит пул keep-alive соединений (TCP+TLS устанавливается один раз на хост)
+    и ограничивает число одновременных запросов к каждому провайдеру, чтобы
+    один медленный провайдер не занимал весь пул.
+    """
+
+    def __init__(self, providers=None):
+        self.providers = dict(providers or PROVIDERS)
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        self._semaphores = {
+            name: asyncio.Semaphore(provider_config.max_concurrency)
+            for name, provider_config in self.providers.items()
+        }
+
+    def _config(self, provider):
+        if provider not in self.providers:
+            raise ValueError(f"Неизвестный LLM-провайдер: {provider}")
+        return self.providers[provider]
+
+    def _timeout(self, provider):
+        provider_config = self._config(provider)
+        return httpx.Timeout(provider_config.timeout, connect=provider_config.connect_timeout)
+
+    async def post_json(self, provider, url, payload, headers=None):
+        """Отправляет JSON-запрос провайдеру и возвращает httpx.Response."""
+        timeout = self._timeout(provider)
+        async with self._semaphores[provider]:
+            return await self._client.post(url, json=payload, headers=headers, timeout=timeout)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+# Клиент и семафоры asyncio привязаны к циклу событий, поэтому храним по клиенту на цикл
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_llm_client():
+    """Возвращает общий LLM-клиент для текущего цикла событий."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = LLMClient()
+        _clients[loop] = client
+    return client
+
+
+async def close_llm_client():
+    """Закрывает пул соединений текущего цикла событий (при остановке сервиса)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
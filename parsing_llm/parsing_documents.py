@@ -1,9 +1,11 @@
 import requests
+import httpx
 import json
 import os
 from dotenv import load_dotenv
 import docx2txt
 from striprtf.striprtf import rtf_to_text
+from llm_client import get_llm_client
 
 load_dotenv()
 API_KEY = os.getenv('OPENROUTER_API_KEY')
@@ -38,8 +40,11 @@ def read_rtf_simple(file_path):
         return None
 
 
-def summarize_resume(resume_text):
-    """Отправка резюме на суммаризацию и получение структурированного JSON"""
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+def build_summary_request(resume_text):
+    """Формирует заголовки и тело запроса на суммаризацию резюме"""
     prompt = f"""
 Проанализируй предоставленное резюме и верни структурированные данные в формате JSON.
 ВСЕГДА возвращай ТОЛЬКО валидный JSON без каких-либо дополнительных комментариев.
@@ -58,49 +63,52 @@ def summarize_resume(resume_text):
 Резюме для анализа:
 {resume_text}
 """
+    headers = {
+        "Authorization": f"Bearer {API_KEY}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "model": "deepseek/deepseek-chat-v3.1:free",
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "response_format": {"type": "json_object"}
+    }
+    return headers, data
+
+
+def parse_summary_response(result):
+    """Извлекает JSON с анализом резюме из ответа модели"""
+    json_response = result['choices'][0]['message']['content']
+    print("\nИзвлечённая строка для парсинга:")
+    #print(repr(json_response))
+    print(f"Тип данных json_response: {type(json_response)}")
+
+    if isinstance(json_response, str):
+        # Очищаем строку от Markdown-обертки ```json ... ```
+        if json_response.startswith("```json"):
+            json_response = json_response[7:]  # Удаляем "```json"
+        if json_response.endswith("```"):
+            json_response = json_response[:-3]  # Удаляем "```"
+        # Также удаляем возможные пробелы в начале и конце
+        json_response = json_response.strip()
+
+        # Теперь парсим очищенную строку
+        return json.loads(json_response)
+    return json_response
 
-    try:
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {API_KEY}",
-                "Content-Type": "application/json"
-            },
-            data=json.dumps({
-                "model": "deepseek/deepseek-chat-v3.1:free",
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "response_format": {"type": "json_object"}
-            })
-        )
 
-        response.raise_for_status()
+def summarize_resume(resume_text):
+    """Отправка резюме на суммаризацию и получение структурированного JSON"""
+    headers, data = build_summary_request(resume_text)
 
-        result = response.json()
-        #print(result)
-        json_response = result['choices'][0]['message']['content']
-        print("\nИзвлечённая строка для парсинга:")
-        #print(repr(json_response))
-        print(f"Тип данных json_response: {type(json_response)}")
-
-        if isinstance(json_response, str):
-            # Очищаем строку от Markdown-обертки ```json ... ```
-            if json_response.startswith("```json"):
-                json_response = json_response[7:]  # Удаляем "```json"
-            if json_response.endswith("```"):
-                json_response = json_response[:-3]  # Удаляем "```"
-            # Также удаляем возможные пробелы в начале и конце
-            json_response = json_response.strip()
-
-            # Теперь парсим очищенную строку
-            parsed_json = json.loads(json_response)
-        else:
-            parsed_json = json_response
-        return parsed_json
+    try:
+        response = requests.post(url=OPENROUTER_URL, headers=headers, data=json.dumps(data))
+        response.raise_for_status()
+        return parse_summary_response(response.json())
 
     except requests.exceptions.RequestException as e:
         print(f"Ошибка при выполнении запроса: {e}")
@@ -113,6 +121,26 @@ def summarize_resume(resume_text):
         return None
 
 
+async def asummarize_resume(resume_text):
+    """Асинхронная версия summarize_resume через общий пул соединений"""
+    headers, data = build_summary_request(resume_text)
+
+    try:
+        response = await get_llm_client().post_json("openrouter", OPENROUTER_URL, data, headers=headers)
+        response.raise_for_status()
+        return parse_summary_response(response.json())
+
+    except httpx.HTTPError as e:
+        print(f"Ошибка при выполнении запроса: {e}")
+        return None
+    except KeyError as e:
+        print(f"Ошибка в структуре ответа: {e}")
+        return None
+    except json.JSONDecodeError as e:
+        print(f"Ошибка при разборе JSON: {e}")
+        return None
+
+
 # Тестовый локальный запуск
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+import os
+import re
+import sys
+import json
+import asyncio
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+from batch_scoring import parse_batch_scores, score_batches, scores_by_skill, score_agreement
+
+
+@pytest.mark.parametrize("text", [
+    '[{"id": 1, "score": 7}, {"id": 2, "score": 4}, {"id": 3, "score": 9}]',
+    '```json\n[{"id": 1, "score": 7}, {"id": 2, "score": 4}, {"id": 3, "score": 9}]\n```',
+    'Вот оценки:\n[{"id": 1, "score": "7"}, {"id": 2, "score": 4.0}, {"id": 3, "score": 9}]\nГотово.',
+    '{"scores": [7, 4, 9]}',
+    '{"1": 7, "2": {"score": 4}, "3": 9}',
+    '[{"id": 3, "score": 9}, {"id": 1, "score": 7}, {"id": 2, "score": 4}]',
+    '1: 7\n2) Оценка: 4\n#3 — 9/10',
+])
+def test_batch_scores_are_parsed(text):
+    assert parse_batch_scores(text, 3) == [7, 4, 9]
+
+
+def test_missing_and_out_of_range_scores():
+    assert parse_batch_scores('[{"id": 1, "score": 15}, {"id": 3, "score": 0}]', 3) == [10, None, 1]
+    assert parse_batch_scores("Не могу оценить ответы", 2) == [None, None]
+
+
+ITEMS = [
+    (skill, f"Вопрос {skill} {stage}", "ответ " + "подробно " * (stage + len(skill)))
+    for skill in ("Python", "SQL", "Docker", "Git")
+    for stage in range(3)
+]
+
+
+def answer_score(answer):
+    """Детерминированный «оценщик» для фейковой LLM: чем подробнее ответ, тем выше балл."""
+    return min(10, answer.count("подробно"))
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(0)
+        answers = re.findall(r"Ответ кандидата: (.*)", prompt)
+        if len(answers) == 1 and "Оценка: [1-10]" in prompt:
+            return f"Оценка: {answer_score(answers[0])}\nКомментарий: ок"
+        return "```json\n" + json.dumps([{"id": i, "score": answer_score(a)} for i, a in enumerate(answers, 1)]) + "\n```"
+
+
+def test_deferred_mode_cuts_llm_requests_and_agrees_with_turn_mode():
+    skills = ["Python", "SQL", "Docker", "Git"]
+
+    turn_llm = FakeLLM()
+    turn_scores = {skill: [] for skill in skills}
+
+    async def per_turn():
+        for skill, question, answer in ITEMS:
+            text = await turn_llm(f"Оцените ответ на вопрос \"{question}\"\nОтвет кандидата: {answer}\nОценка: [1-10]")
+            turn_scores[skill].append(int(re.search(r"Оценка: (\d+)", text).group(1)))
+
+    asyncio.run(per_turn())
+
+    batch_llm = FakeLLM()
+    scores = asyncio.run(score_batches(ITEMS, batch_llm, lambda text, count: text, batch_size=12))
+    deferred_scores = scores_by_skill(ITEMS, scores, skills)
+
+    assert turn_llm.calls == 12 and batch_llm.calls == 1
+    agreement = score_agreement(turn_scores, deferred_scores)
+    assert agreement["pairs"] == 12 and agreement["mean_abs_diff"] == 0 and agreement["within_one"] == 1
+
+
+def test_batches_are_split_and_kept_in_order():
+    llm = FakeLLM()
+    scores = asyncio.run(score_batches(ITEMS, llm, lambda text, count: text, batch_size=5))
+    assert llm.calls == 3
+    assert scores == [answer_score(answer) for _, _, answer in ITEMS]
+
+
+def test_score_agreement():
+    agreement = score_agreement({"Python": [7, 8, 6], "SQL": [5]}, {"Python": [7, 6, 6], "SQL": [4]})
+    assert agreement["pairs"] == 4
+    assert agreement["mean_abs_diff"] == 0.75
+    assert agreement["within_one"] == 0.75
+    assert agreement["total_diff"] == -3
+
+
+class FlakyLLM(FakeLLM):
+    """Фейковая LLM, у которой падает или молчит запрос по пачке с заданным вопросом."""
+
+    def __init__(self, broken_question, failure):
+        super().__init__()
+        self.broken_question = broken_question
+        self.failure = failure
+
+    async def __call__(self, prompt):
+        questions = re.findall(r"Вопрос: (.*)", prompt)
+        if len(questions) > 1 and self.broken_question in questions:
+            self.calls += 1
+            if self.failure == "error":
+                raise RuntimeError("Ошибка YandexGPT: 500")
+            return None
+        return await super().__call__(prompt)
+
+
+@pytest.mark.parametrize("failure", ["error", "empty"])
+def test_failed_batch_falls_back_to_single_answers(failure):
+    llm = FlakyLLM(ITEMS[6][1], failure)
+    scores = asyncio.run(score_batches(ITEMS, llm, lambda text, count: text, batch_size=5))
+    # Вторая пачка (ответы 5–9) не оценилась и переоценена по одному; остальные пачки не пострадали
+    assert scores == [answer_score(answer) for _, _, answer in ITEMS]
+    assert llm.calls == 3 + 5
+
+
+def test_unscored_answer_stays_none():
+    async def broken(prompt):
+        raise RuntimeError("сервис недоступен")
+
+    assert asyncio.run(score_batches(ITEMS[:3], broken, lambda text, count: text)) == [None, None, None]
+    assert parse_batch_scores(None, 2) == [None, None]
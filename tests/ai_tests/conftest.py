@@ -0,0 +1,150 @@
+import os
+import re
+import sys
+import json
+import time
+import types
+import asyncio
+import subprocess
+
+import pytest
+from starlette.responses import StreamingResponse
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+REAL_TIME_HR = os.path.join(REPO_ROOT, 'Real_time_HR')
+# Папки, модули которых называются одинаково (llm_client, tts_cache, media_assembly...)
+MODULE_DIRS = tuple(os.path.join(REPO_ROOT, name) for name in ('Real_time_HR', 'interview_module', 'parsing_llm'))
+
+
+def repo_modules():
+    """Загруженные модули из папок сервисов репозитория."""
+    return [
+        name for name, module in list(sys.modules.items())
+        if (getattr(module, "__file__", None) or "").startswith(MODULE_DIRS)
+    ]
+
+
+class UploadStub:
+    """Загрузка /process_audio/: run_turn только читает её байты."""
+
+    def __init__(self, data):
+        self.data = data
+
+    async def read(self):
+        return self.data
+
+
+class AvatarServices:
+    """
+    Заглушки Whisper, YandexGPT и SpeechKit для real_talking_avatar_api.
+
+    STT «распознаёт» текст, записанный в загрузке, LLM отвечает по виду промпта,
+    TTS возвращает настоящий ogg/opus (его склеивает ffmpeg и читает media_duration).
+    Задержки имитируют время внешних сервисов; все промпты сохраняются в prompts.
+    """
+
+    STT_SECONDS = 0.05
+    LLM_SECONDS = 0.05
+    TTS_SECONDS = 0.03
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.prompts = []
+        self.batch_replies = []  # ответы на промпты пачек по очереди (иначе — все по 7)
+        self.report_error = None  # исключение, которым падает генерация отчёта, или "empty" — пустой ответ
+
+    def transcribe_audio_data(self, audio_bytes):
+        time.sleep(self.STT_SECONDS)
+        return audio_bytes.decode("utf-8")
+
+    def text_to_audio(self, text, voice="oksana"):
+        time.sleep(self.TTS_SECONDS)
+        return self.audio
+
+    def reply(self, prompt):
+        if "как к человеку лучше обращаться" in prompt:
+            return "Анна"
+        if "Оценка: [1-10]" in prompt:
+            return "Оценка: 7\nКомментарий: по существу"
+        if "JSON-массив" in prompt:
+            if self.batch_replies:
+                return self.batch_replies.pop(0)
+            count = int(re.search(r"каждый из (\d+) ответов", prompt).group(1))
+            return json.dumps([{"id": number, "score": 7} for number in range(1, count + 1)])
+        if "HR-аналитик" in prompt:
+            if isinstance(self.report_error, Exception):
+                raise self.report_error
+            if self.report_error == "empty":
+                # Так agenerate_text отвечает на 429/5xx/401: None вместо исключения
+                return None
+            return "Отчёт по интервью"
+        return "Уточняющий вопрос?"
+
+    async def agenerate_text(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.LLM_SECONDS)
+        return self.reply(prompt)
+
+    async def astream_text(self, prompt):
+        self.prompts.append(prompt)
+        for fragment in ("Хорошо, спасибо за ответ. ", "Расскажите, ", "каким был результат?"):
+            await asyncio.sleep(self.LLM_SECONDS / 3)
+            yield fragment
+
+    def upload(self, text):
+        return UploadStub(text.encode("utf-8"))
+
+    async def receive(self, response):
+        """
+        Дочитывает ответ /process_audio/ как клиент: файл — запускает фоновую очистку хода,
+        поток (NDJSON) — возвращает его строки вместе со временем прихода каждой.
+        """
+        if not isinstance(response, StreamingResponse):
+            await response.background()
+            return []
+        start = time.perf_counter()
+        messages = []
+        async for line in response.body_iterator:
+            messages.append((json.loads(line), time.perf_counter() - start))
+        return messages
+
+
+@pytest.fixture(scope="session")
+def reply_ogg(tmp_path_factory):
+    """Озвученная фраза в формате SpeechKit (ogg/opus)."""
+    path = tmp_path_factory.mktemp("speech") / "reply.ogg"
+    subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                    "-i", "sine=frequency=300:duration=0.4", "-c:a", "libopus", str(path), "-y"], check=True)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def avatar_api(tmp_path, monkeypatch, reply_ogg):
+    """
+    real_talking_avatar_api с заглушками STT/LLM/TTS: ход проходит по настоящему
+    коду run_turn (пулы, ffmpeg, папки ходов, хранилище сессий, фоновые задачи).
+    Рабочие папки API создаются в tmp_path. Возвращает (модуль API, заглушки).
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(REAL_TIME_HR)
+    # Одноимённые модули других пакетов и состояние прошлых тестов не должны попасть в API
+    for name in repo_modules():
+        monkeypatch.delitem(sys.modules, name)
+
+    services = AvatarServices(reply_ogg)
+    stubs = {
+        "openai_whisper_STT": {"transcribe_audio_data": services.transcribe_audio_data,
+                               "SAMPLE_RATE": 16000, "detect_speech": lambda *args, **kwargs: []},
+        "try_TTS_Yandex": {"text_to_audio": services.text_to_audio},
+        "try_generation_Yandex": {"agenerate_text": services.agenerate_text, "astream_text": services.astream_text},
+    }
+    for name, attributes in stubs.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        monkeypatch.setitem(sys.modules, name, module)
+
+    import real_talking_avatar_api as api
+    yield api, services
+
+    for name in repo_modules():
+        sys.modules.pop(name, None)
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+import requests
+
+# Добавляем путь к interview_module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'interview_module')))
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Импортирует API во временной папке: при импорте он очищает и создаёт TEMP_* директории."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("TEMP_FINAL_VIDEO", exist_ok=True)
+    import text_audio_questions_api
+    text_audio_questions_api.clear_temp_dirs()
+    monkeypatch.setattr(text_audio_questions_api, "TTS_RETRY_DELAY", 0.01)
+    return text_audio_questions_api
+
+
+def service_error(status):
+    """Ошибка, которую поднимает raise_for_status() синтезатора при ответе SpeechKit со статусом status."""
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} от SpeechKit", response=response)
+
+
+class SlowSpeechKit:
+    """Синтез-заглушка с задержкой сети; считает одновременные запросы."""
+
+    def __init__(self, delay=0.1, failures=None):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, text, voice):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls.append(text)
+        try:
+            time.sleep(self.delay)
+            with self._lock:
+                if self.failures.get(text, 0) > 0:
+                    self.failures[text] -= 1
+                    raise service_error(503)
+            return f"{voice}:{text}".encode("utf-8")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+QUESTIONS = {str(i): f"Вопрос номер {i}?" for i in range(1, 16)}
+
+
+def test_questions_are_synthesized_in_parallel(api, monkeypatch):
+    speechkit = SlowSpeechKit(delay=0.1)
+    monkeypatch.setattr(api, "text_to_audio", speechkit)
+
+    start = time.perf_counter()
+    audio_files = api.generate_audio(QUESTIONS, api.Gender.female, max_parallel=5)
+    elapsed = time.perf_counter() - start
+
+    # 15 вопросов по 0.1 с последовательно — 1.5 с; пачками по 5 — около 0.3 с
+    assert elapsed < 0.8
+    assert speechkit.max_active == 5
+    assert list(audio_files) == list(QUESTIONS)
+    with open(audio_files["7"], "rb") as f:
+        assert f.read() == "oksana:Вопрос номер 7?".encode("utf-8")
+
+
+def test_failed_item_is_retried(api, monkeypatch):
+    speechkit = SlowSpeechKit(delay=0.01, failures={"Вопрос номер 3?": 2})
+    monkeypatch.setattr(api, "text_to_audio", speechkit)
+
+    audio_files = api.generate_audio(QUESTIONS, api.Gender.male)
+    assert len(audio_files) == 15
+    assert speechkit.calls.count("Вопрос номер 3?") == 3
+
+
+def test_exhausted_retries_are_raised(api, monkeypatch):
+    speechkit = SlowSpeechKit(delay=0.01, failures={"Вопрос номер 2?": 10})
+    monkeypatch.setattr(api, "text_to_audio", speechkit)
+
+    with pytest.raises(requests.HTTPError):
+        api.generate_audio(QUESTIONS, api.Gender.male)
+
+
+@pytest.mark.parametrize("error", [service_error(400), service_error(401), ValueError("пустой текст")])
+def test_request_errors_are_not_retried(api, monkeypatch, error):
+    calls = []
+
+    def broken_speechkit(text, voice):
+        calls.append(text)
+        raise error
+
+    monkeypatch.setattr(api, "text_to_audio", broken_speechkit)
+    with pytest.raises(type(error)):
+        api.synthesize_with_retry("Вопрос?", "oksana")
+    assert calls == ["Вопрос?"]
+
+
+@pytest.mark.parametrize("error", [service_error(429), requests.ConnectionError("обрыв"), requests.Timeout("таймаут")])
+def test_transient_errors_are_retried(api, monkeypatch, error):
+    calls = []
+
+    def flaky_speechkit(text, voice):
+        calls.append(text)
+        if len(calls) == 1:
+            raise error
+        return b"audio"
+
+    monkeypatch.setattr(api, "text_to_audio", flaky_speechkit)
+    assert api.synthesize_with_retry("Вопрос?", "oksana") == b"audio"
+    assert len(calls) == 2
+
+
+def test_progress_is_reported_for_every_question(api, monkeypatch):
+    monkeypatch.setattr(api, "text_to_audio", SlowSpeechKit(delay=0.01))
+    progress = []
+    api.generate_audio(QUESTIONS, api.Gender.female, on_progress=lambda done, total, num: progress.append((done, total, num)))
+
+    assert [done for done, _, _ in progress] == list(range(1, 16))
+    assert {total for _, total, _ in progress} == {15}
+    assert sorted(num for _, _, num in progress) == sorted(QUESTIONS)
+
+
+def test_progress_can_be_polled_during_generation(api, monkeypatch):
+    monkeypatch.setattr(api, "text_to_audio", SlowSpeechKit(delay=0.05))
+    monkeypatch.setattr(api, "generate_videos", lambda image_path: time.sleep(0.3))
+    monkeypatch.setattr(api, "SPEAKERS_PHOTOS_DEFAULT", "photos")
+    os.makedirs("photos", exist_ok=True)
+    open(os.path.join("photos", "speaker_woman.jpg"), "wb").close()
+    questions = '{"questions": ["Расскажите о себе?", "Почему мы?", "Ваши сильные стороны?"]}'
+
+    async def scenario():
+        pipeline = asyncio.ensure_future(api.interview_pipeline(
+            position="Python-разработчик", skills="Python", gender=api.Gender.female, image="",
+            priority_questions=questions, progress_id="job-1",
+        ))
+        seen = []
+        while not pipeline.done():
+            try:
+                seen.append(await api.interview_progress("job-1"))
+            except api.HTTPException:
+                pass
+            await asyncio.sleep(0.02)
+        await pipeline
+        return seen
+
+    seen = asyncio.run(scenario())
+    stages = [progress["stage"] for progress in seen]
+    assert "audio" in stages and stages[-1] == "video"
+    assert seen[-1] == {"stage": "video", "done": 4, "total": 4}
+    # Генерация закончилась — статус больше не хранится
+    assert api.generation_progress == {}
@@ -0,0 +1,185 @@
+import re
+import json
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+QUESTIONS = {"Python": "Что такое GIL?", "SQL": "Что такое индекс?"}
+# Ответы кандидата по порядку: представление, затем по три ответа на навык
+ANSWERS = ["Здравствуйте, меня зовут Анна", "Python 1", "Python 2", "Python 3", "SQL 1", "SQL 2", "SQL 3"]
+
+
+def start_session(api, session_id):
+    """Сессия сразу после приветствия: вопросов по навыкам ещё не было."""
+    session = api.InterviewSession(session_id, gender="ЖЕН", resume={"specialization": "Backend"})
+    session.start(dict(QUESTIONS))
+    api.sessions.save(session)
+
+
+async def answer(api, services, session_id, text):
+    response = await api.process_audio(services.upload(text), session_id, False, "audio")
+    messages = await services.receive(response)
+    assert not any("error" in message for message, _ in messages)
+
+
+async def run_interview(api, services, session_id, answers=ANSWERS):
+    start_session(api, session_id)
+    for text in answers:
+        await answer(api, services, session_id, text)
+    await api.session_tasks.wait(session_id)
+
+
+def evaluations(services):
+    """(навык, вопрос, ответ) из промптов оценки отдельных ответов."""
+    pairs = []
+    for prompt in services.prompts:
+        if "Оценка: [1-10]" in prompt:
+            question = re.search(r'Оцените ответ на вопрос "(.*?)" по шкале', prompt, re.S).group(1)
+            skill = re.search(r"Контекст навыка: (.*)", prompt).group(1)
+            answer_text = re.search(r"Ответ кандидата: (.*)", prompt).group(1)
+            pairs.append((skill, question, answer_text))
+    return pairs
+
+
+def test_answers_are_scored_under_the_skill_they_answered(avatar_api):
+    api, services = avatar_api
+    asyncio.run(run_interview(api, services, "s1"))
+
+    pairs = evaluations(services)
+    # Представление не оценивается, последний ответ (после него интервью закончено) — оценивается
+    assert [answer_text for _, _, answer_text in pairs] == ANSWERS[1:]
+    for skill, question, answer_text in pairs:
+        assert answer_text.startswith(skill), (skill, answer_text)
+    # Ответ на базовый вопрос оценивается вместе с этим вопросом, а не со следующим
+    assert pairs[0][1].lower() == f"анна, {QUESTIONS['Python'].lower()}"
+    assert pairs[3][1].lower() == f"анна, {QUESTIONS['SQL'].lower()}"
+
+    session = api.sessions.get("s1")
+    assert session.completed
+    assert session.skill_scores == {"Python": [7, 7, 7], "SQL": [7, 7, 7]}
+
+
+def test_deferred_log_keeps_the_same_pairing(avatar_api, monkeypatch):
+    api, services = avatar_api
+    monkeypatch.setattr(api, "SCORING_MODE", "deferred")
+
+    async def scenario():
+        start_session(api, "s2")
+        for text in ANSWERS[:-1]:
+            await answer(api, services, "s2", text)
+        return api.sessions.get("s2").qa_log
+
+    qa_log = asyncio.run(scenario())
+    assert [(skill, answer_text) for skill, _, answer_text in qa_log] == [
+        (text.split()[0], text) for text in ANSWERS[1:-1]
+    ]
+    assert qa_log[3][1].lower() == f"анна, {QUESTIONS['SQL'].lower()}"
+
+
+def results_request(etag=None):
+    headers = [(b"if-none-match", etag.encode())] if etag else []
+    return Request({"type": "http", "method": "GET", "path": "/get_results/", "headers": headers})
+
+
+@pytest.mark.parametrize("mode", ["turn", "deferred", "compare"])
+def test_report_is_built_once_and_served_with_etag(avatar_api, monkeypatch, mode):
+    api, services = avatar_api
+    monkeypatch.setattr(api, "SCORING_MODE", mode)
+
+    async def scenario():
+        start_session(api, "s3")
+        for text in ANSWERS:
+            await answer(api, services, "s3", text)
+        # Отчёт строится в фоне: пока он не готов — 202 с Retry-After
+        pending = await api.get_results("s3", results_request())
+        # Отчёт и отложенная оценка не ждут друг друга
+        await asyncio.wait_for(api.session_tasks.wait("s3"), timeout=5)
+        ready = await api.get_results("s3", results_request())
+        cached = await api.get_results("s3", results_request(ready.headers["etag"]))
+        return pending, ready, cached
+
+    pending, ready, cached = asyncio.run(scenario())
+    assert pending.status_code == 202 and pending.headers["retry-after"]
+    assert json.loads(pending.body)["status"] == "pending"
+
+    assert ready.status_code == 200 and ready.headers["etag"]
+    report = json.loads(ready.body)
+    assert report["summary"] == "Отчёт по интервью"
+    assert report["scores_by_skill"] == {"Python": [7, 7, 7], "SQL": [7, 7, 7]}
+    assert cached.status_code == 304 and cached.headers["etag"] == ready.headers["etag"]
+    # Отчёт запрошен у LLM один раз, пачка (если есть) — тоже
+    assert sum("HR-аналитик" in prompt for prompt in services.prompts) == 1
+    assert sum("JSON-массив" in prompt for prompt in services.prompts) == (0 if mode == "turn" else 1)
+    assert api.sessions.get("s3").qa_log == []
+
+
+@pytest.mark.parametrize("error", [RuntimeError("YandexGPT недоступен"), "empty"])
+def test_failed_report_is_rebuilt_on_next_request(avatar_api, error):
+    api, services = avatar_api
+    services.report_error = error
+
+    async def scenario():
+        await run_interview(api, services, "s4")
+        failed = api.sessions.get("s4")
+        assert failed.report is None and failed.report_started == 0
+        services.report_error = None
+        # Построение сорвалось — следующий запрос запускает его заново
+        retry = await api.get_results("s4", results_request())
+        await asyncio.wait_for(api.session_tasks.wait("s4"), timeout=5)
+        return retry, await api.get_results("s4", results_request())
+
+    retry, ready = asyncio.run(scenario())
+    assert retry.status_code == 202
+    assert ready.status_code == 200
+    assert json.loads(ready.body)["summary"] == "Отчёт по интервью"
+    assert sum("HR-аналитик" in prompt for prompt in services.prompts) == 2
+
+
+def test_unscored_answers_block_the_report_until_scored(avatar_api, monkeypatch):
+    api, services = avatar_api
+    monkeypatch.setattr(api, "SCORING_MODE", "deferred")
+    # Пачка оценила только ответы по Python, повторы по одному для SQL тоже сорвались
+    services.batch_replies = [json.dumps([{"id": number, "score": 5} for number in (1, 2, 3)]), "", "", ""]
+
+    async def scenario():
+        await run_interview(api, services, "s5")
+        failed = api.sessions.get("s5")
+        # Отчёт по неполным оценкам не публикуется, неоценённые ответы не теряются
+        assert failed.report is None and failed.report_started == 0
+        assert failed.skill_scores == {"Python": [5, 5, 5], "SQL": []}
+        assert [answer_text for _, _, answer_text in failed.qa_log] == ANSWERS[4:]
+        assert not any("HR-аналитик" in prompt for prompt in services.prompts)
+        await api.get_results("s5", results_request())
+        await asyncio.wait_for(api.session_tasks.wait("s5"), timeout=5)
+        return await api.get_results("s5", results_request())
+
+    ready = asyncio.run(scenario())
+    assert ready.status_code == 200
+    assert json.loads(ready.body)["scores_by_skill"] == {"Python": [5, 5, 5], "SQL": [7, 7, 7]}
+    assert api.sessions.get("s5").qa_log == []
+
+
+def test_shutdown_finishes_background_tasks_before_closing_pools(avatar_api, monkeypatch):
+    api, _ = avatar_api
+    order = []
+
+    async def close_llm_client():
+        order.append("llm")
+
+    async def evaluation():
+        await api.run_io(sum, [1, 2])  # фоновой задаче ещё нужны пулы
+        await asyncio.sleep(0.1)
+        order.append("evaluate")
+
+    monkeypatch.setattr(api, "close_llm_client", close_llm_client)
+    monkeypatch.setattr(api, "shutdown_executors", lambda: order.append("executors"))
+
+    async def scenario():
+        async with api.lifespan(api.app):
+            assert not api.lifecycle._task.done()
+            api.session_tasks.spawn("s6", evaluation(), kind="evaluate")
+        assert api.lifecycle._task is None
+
+    asyncio.run(scenario())
+    assert order == ["evaluate", "llm", "executors"]
@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+from llm_client import LLMClient, ProviderConfig
+
+
+class FakeLLMServer:
+    """Локальный HTTP/1.1 сервер с keep-alive: считает соединения и одновременные запросы."""
+
+    def __init__(self):
+        self.connections = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake.lock:
+                    fake.connections.add(self.client_address)
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                try:
+                    time.sleep(body.get("delay", 0))
+                finally:
+                    with fake.lock:
+                        fake.in_flight -= 1
+                payload = json.dumps({"echo": body.get("text")}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/completion"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def llm_server():
+    server = FakeLLMServer()
+    yield server
+    server.close()
+
+
+def make_client(**providers):
+    return LLMClient(providers=providers or {"fast": ProviderConfig(max_concurrency=4, timeout=5)})
+
+
+def test_sequential_requests_reuse_connection(llm_server):
+    async def scenario():
+        client = make_client()
+        try:
+            for i in range(5):
+                response = await client.post_json("fast", llm_server.url, {"text": f"q{i}"})
+                assert response.json() == {"echo": f"q{i}"}
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+    # Пять запросов прошли по одному keep-alive соединению
+    assert len(llm_server.connections) == 1
+
+
+def test_provider_concurrency_limit(llm_server):
+    async def scenario():
+        client = make_client(limited=ProviderConfig(max_concurrency=2, timeout=5))
+        try:
+            await asyncio.gather(*[
+                client.post_json("limited", llm_server.url, {"text": str(i), "delay": 0.2})
+                for i in range(6)
+            ])
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+    assert llm_server.max_in_flight == 2
+
+
+def test_slow_provider_does_not_block_other_provider(llm_server):
+    async def scenario():
+        client = make_client(
+            slow=ProviderConfig(max_concurrency=1, timeout=5),
+            fast=ProviderConfig(max_concurrency=4, timeout=5),
+        )
+        try:
+            slow_tasks = [
+                asyncio.create_task(client.post_json("slow", llm_server.url, {"text": "s", "delay": 0.5}))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            await client.post_json("fast", llm_server.url, {"text": "f"})
+            fast_latency = time.perf_counter() - start
+            await asyncio.gather(*slow_tasks)
+            return fast_latency
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(scenario()) < 0.4
+
+
+def test_provider_timeout(llm_server):
+    async def scenario():
+        client = make_client(tight=ProviderConfig(max_concurrency=1, timeout=0.2))
+        try:
+            await client.post_json("tight", llm_server.url, {"text": "t", "delay": 1})
+        finally:
+            await client.aclose()
+
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(scenario())
+
+
+def test_unknown_provider():
+    async def scenario():
+        client = make_client()
+        try:
+            await client.post_json("unknown", "http://127.0.0.1:1/", {})
+        finally:
+            await client.aclose()
+
+    with pytest.raises(ValueError):
+        asyncio.run(scenario())
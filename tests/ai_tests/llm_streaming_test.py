@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+os.environ.setdefault("OAUTH_TOKEN", "test-oauth-token")
+os.environ.setdefault("CATALOG_ID", "test-catalog")
+import try_generation_Yandex
+from try_generation_Yandex import astream_text, parse_stream_line
+from reply_streaming import SentenceSplitter, synthesize_sentences, stream_reply_audio
+from scratch_files import TurnScratch
+
+REPLY = [
+    "Расскажите, пожалуйста, подробнее о вашем опыте.",
+    " Какие задачи вы решали на последнем проекте?",
+    " Как вы оценивали результат своей работы, т.е. какие метрики использовали?",
+]
+TOKEN_DELAY = 0.05  # пауза между строками потока
+TTS_SECONDS = 0.1
+
+
+class FakeStreamingServer:
+    """Локальный потоковый endpoint в формате YandexGPT: строки JSON с накопленным текстом."""
+
+    def __init__(self, status=200):
+        fake = self
+        self.status = status
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                assert body["completionOptions"]["stream"] is True
+                self.send_response(fake.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                if fake.status != 200:
+                    self.wfile.write(b'{"error": "unauthorized"}')
+                    return
+
+                text = ""
+                words = "".join(REPLY).split(" ")
+                for index, word in enumerate(words):
+                    text += ("" if index == 0 else " ") + word
+                    final = index == len(words) - 1
+                    line = {"result": {"alternatives": [{
+                        "message": {"role": "assistant", "text": text},
+                        "status": "ALTERNATIVE_STATUS_FINAL" if final else "ALTERNATIVE_STATUS_PARTIAL",
+                    }]}}
+                    self.wfile.write((json.dumps(line, ensure_ascii=False) + "\n").encode())
+                    self.wfile.flush()
+                    time.sleep(TOKEN_DELAY)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/completion"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def fake_gpt(monkeypatch):
+    server = FakeStreamingServer()
+    monkeypatch.setattr(try_generation_Yandex, "API_URL", server.url)
+    monkeypatch.setattr(try_generation_Yandex, "get_cached_iam_token", lambda: "test-iam-token")
+    yield server
+    server.close()
+
+
+def fake_tts(text):
+    time.sleep(TTS_SECONDS)
+    return text.encode("utf-8")
+
+
+def test_parse_stream_line():
+    line = json.dumps({"result": {"alternatives": [{"message": {"text": "Привет"}, "status": "ALTERNATIVE_STATUS_FINAL"}]}})
+    assert parse_stream_line(line) == ("Привет", True)
+
+
+def test_stream_yields_deltas(fake_gpt):
+    async def scenario():
+        start = time.perf_counter()
+        first, fragments = None, []
+        async for fragment in astream_text("вопрос"):
+            first = first or time.perf_counter() - start
+            fragments.append(fragment)
+        return first, time.perf_counter() - start, fragments
+
+    first, total, fragments = asyncio.run(scenario())
+    print(f"\n[STREAM] первый фрагмент через {first:.3f}s, весь ответ через {total:.3f}s")
+    assert "".join(fragments) == "".join(REPLY)
+    assert len(fragments) > 1
+    assert first < total / 3
+
+
+def test_unauthorized_stream_invalidates_token(monkeypatch):
+    server = FakeStreamingServer(status=401)
+    invalidated = []
+    monkeypatch.setattr(try_generation_Yandex, "API_URL", server.url)
+    monkeypatch.setattr(try_generation_Yandex, "get_cached_iam_token", lambda: "expired")
+    monkeypatch.setattr(try_generation_Yandex, "get_iam_cache",
+                        lambda: type("Cache", (), {"invalidate": lambda self: invalidated.append(True)})())
+
+    async def scenario():
+        async for _ in astream_text("вопрос"):
+            pass
+
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(scenario())
+        assert invalidated == [True]
+    finally:
+        server.close()
+
+
+def test_sentence_splitter():
+    splitter = SentenceSplitter(min_chars=10)
+    sentences = []
+    for fragment in ["Опыт в Python, т.е. Django и т. д. Хорошо", ". Что ещё? Да", "! Спасибо за ответ И. Петрову."]:
+        sentences += splitter.feed(fragment)
+    sentences += splitter.flush()
+    assert sentences == [
+        "Опыт в Python, т.е. Django и т. д. Хорошо.",
+        "Что ещё? Да!",
+        "Спасибо за ответ И. Петрову.",
+    ]
+
+
+def test_short_sentences_are_merged():
+    splitter = SentenceSplitter(min_chars=25)
+    assert splitter.feed("Хорошо. Понятно. ") == []
+    assert splitter.feed("Теперь следующий вопрос по SQL. ") == ["Хорошо. Понятно. Теперь следующий вопрос по SQL."]
+
+
+def test_first_audio_tracks_first_sentence(fake_gpt):
+    async def scenario():
+        start = time.perf_counter()
+        first_audio, results = None, []
+        async for sentence, audio in synthesize_sentences(astream_text("вопрос"), fake_tts):
+            first_audio = first_audio or time.perf_counter() - start
+            results.append((sentence, audio))
+        return first_audio, time.perf_counter() - start, results
+
+    first_audio, streamed_total, results = asyncio.run(scenario())
+
+    # Прежний путь: дождаться всего ответа, затем озвучить его целиком
+    words = len("".join(REPLY).split(" "))
+    sequential_first_audio = words * TOKEN_DELAY + TTS_SECONDS
+    print(f"\n[TTS] первое предложение синтезировано: по предложениям {first_audio:.3f}s, целиком ~{sequential_first_audio:.3f}s; "
+          f"весь ответ озвучен за {streamed_total:.3f}s")
+
+    assert [sentence for sentence, _ in results] == [sentence.strip() for sentence in REPLY]
+    assert [audio.decode("utf-8") for _, audio in results] == [sentence.strip() for sentence in REPLY]
+    assert first_audio < sequential_first_audio / 2
+
+
+def test_failed_sentence_cancels_the_rest(fake_gpt):
+    started = []
+
+    def failing_tts(text):
+        started.append(text)
+        if len(started) == 1:
+            # Падает, когда остальные предложения уже сгенерированы и ждут своей очереди
+            time.sleep(len("".join(REPLY).split(" ")) * TOKEN_DELAY + TTS_SECONDS)
+            raise RuntimeError("SpeechKit недоступен")
+        time.sleep(TTS_SECONDS)
+        return text.encode("utf-8")
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        errors = []
+        loop.set_exception_handler(lambda _, context: errors.append(context))
+        with pytest.raises(RuntimeError):
+            async for _ in synthesize_sentences(astream_text("вопрос"), failing_tts, max_parallel=1):
+                pass
+        # Отменённые предложения так и не отправляются на синтез
+        await asyncio.sleep(3 * TTS_SECONDS)
+        return errors
+
+    errors = asyncio.run(scenario())
+    assert started == [REPLY[0].strip()]
+    assert not any("never retrieved" in context.get("message", "") for context in errors)
+
+
+def make_ogg(seconds):
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=330:duration={seconds}",
+        "-c:a", "libopus", "-f", "ogg", "pipe:1",
+    ]
+    return subprocess.run(command, capture_output=True, check=True).stdout
+
+
+def test_stream_reply_audio_joins_sentences(fake_gpt, tmp_path):
+    durations = {sentence.strip(): 0.5 + index * 0.25 for index, sentence in enumerate(REPLY)}
+
+    def ogg_tts(text):
+        return make_ogg(durations[text])
+
+    async def scenario():
+        scratch = TurnScratch("session", root=str(tmp_path))
+        return await stream_reply_audio(astream_text("вопрос"), ogg_tts, scratch)
+
+    text, audio_path, first_audio = asyncio.run(scenario())
+    pcm = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", audio_path, "-f", "s16le", "-ac", "1", "-ar", "16000", "pipe:1"],
+        capture_output=True, check=True,
+    ).stdout
+    assert text == " ".join(sentence.strip() for sentence in REPLY)
+    assert abs(len(pcm) / 2 / 16000 - sum(durations.values())) < 0.1
+    assert first_audio is not None
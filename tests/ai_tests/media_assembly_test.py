@@ -0,0 +1,137 @@
+import os
+import sys
+import asyncio
+import subprocess
+
+import numpy as np
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import media_assembly
+from media_assembly import media_duration, prepare_loop_template, assemble_reply_video, measure_assembly
+from scratch_files import TurnScratch
+
+
+def ffmpeg(*args):
+    subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", *args, "-y"], check=True)
+
+
+@pytest.fixture(scope="module")
+def media(tmp_path_factory):
+    """Шаблон аватара (webm, как после загрузки) и ответ SpeechKit (ogg/opus)."""
+    root = tmp_path_factory.mktemp("media")
+    template = str(root / "uploaded_video_test.webm")
+    audio = str(root / "response_audio.ogg")
+    ffmpeg("-f", "lavfi", "-i", "testsrc=size=320x240:rate=25:duration=2",
+           "-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", template)
+    ffmpeg("-f", "lavfi", "-i", "sine=frequency=300:duration=7", "-c:a", "libopus", audio)
+    return template, audio
+
+
+def decoded_frames(path):
+    """Кадры видео в сером 32x24: для проверки стыков цикла."""
+    raw = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", path,
+         "-vf", "scale=32:24,format=gray", "-f", "rawvideo", "pipe:1"],
+        capture_output=True, check=True,
+    ).stdout
+    return np.frombuffer(raw, np.uint8).reshape(-1, 24, 32).astype(np.int16)
+
+
+def test_loop_is_seamless(media, tmp_path):
+    template, _ = media
+    loop = asyncio.run(prepare_loop_template(template, str(tmp_path / "loop.webm")))
+    assert abs(loop.duration - 4.0) < 0.1  # 2 с вперёд и 2 с обратно
+
+    frames = decoded_frames(loop.path)
+    # Последний кадр цикла совпадает с первым: на стыке повторов нет скачка
+    assert np.abs(frames[-1] - frames[0]).mean() < 3
+
+
+def test_concurrent_preparations_do_not_share_a_temp_file(media, tmp_path):
+    template, _ = media
+
+    async def two_workers():
+        # Два воркера готовят цикл одной сессии одновременно
+        return await asyncio.gather(*(prepare_loop_template(template, str(tmp_path / "loop_s1.webm")) for _ in range(2)))
+
+    loops = asyncio.run(two_workers())
+    assert os.listdir(tmp_path) == ["loop_s1.webm"]
+    assert all(abs(asyncio.run(media_duration(loop.path)) - 4.0) < 0.1 for loop in loops)
+
+
+def test_failed_preparation_leaves_no_temp_file(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(prepare_loop_template(str(tmp_path / "missing.webm"), str(tmp_path / "loop_s1.webm")))
+    assert os.listdir(tmp_path) == []
+
+
+def test_reply_video_is_stream_copied(media, tmp_path):
+    template, audio = media
+    scratch = TurnScratch("test", root=str(tmp_path))
+    loop = asyncio.run(prepare_loop_template(template, str(tmp_path / "loop.webm")))
+    output = asyncio.run(assemble_reply_video(loop, audio, scratch.file("final_response.webm"), scratch))
+
+    # Видео длиннее цикла склеено повторами, длительность — по ответу
+    assert abs(asyncio.run(media_duration(output)) - 7.0) < 0.2
+    streams = subprocess.run(["ffmpeg", "-hide_banner", "-i", output], capture_output=True, text=True).stderr
+    assert "Video: vp9" in streams and "Audio: opus" in streams
+
+
+def test_loop_is_prepared_once_per_session(media, tmp_path, monkeypatch):
+    template, _ = media
+    monkeypatch.setattr(media_assembly, "LOOP_DIR", str(tmp_path))
+    monkeypatch.setattr(media_assembly, "_loops", {})
+    calls = []
+    prepare = media_assembly.prepare_loop_template
+
+    async def counting_prepare(*args):
+        calls.append(args)
+        return await prepare(*args)
+
+    monkeypatch.setattr(media_assembly, "prepare_loop_template", counting_prepare)
+
+    async def turns():
+        return await asyncio.gather(*(media_assembly.get_loop_template("session", template) for _ in range(3)))
+
+    loops = asyncio.run(turns())
+    assert len(calls) == 1 and len({id(loop) for loop in loops}) == 1
+
+    media_assembly.forget_loop_template("session")
+    assert not os.path.exists(loops[0].path)
+
+
+def test_remux_is_faster_than_reencode(media, tmp_path):
+    template, audio = media
+    scratch = TurnScratch("bench", root=str(tmp_path))
+    timings = asyncio.run(measure_assembly(template, audio, scratch))
+    print(f"\nСборка видео ответа: перекодирование {timings['reencode']:.2f} с, "
+          f"склейка цикла {timings['remux']:.2f} с (подготовка цикла один раз {timings['prepare_once']:.2f} с)")
+    assert timings["remux"] < timings["reencode"]
+
+
+@pytest.mark.parametrize("seconds", [0.5, 3.2, 7.0])
+def test_ogg_duration_from_headers(tmp_path, seconds):
+    audio = str(tmp_path / "speech.ogg")
+    ffmpeg("-f", "lavfi", "-i", f"sine=frequency=300:duration={seconds}", "-c:a", "libopus", audio)
+    assert abs(media_assembly.ogg_duration(audio) - seconds) < 0.01
+    # Совпадает с длительностью, которую видит ffmpeg
+    assert abs(media_assembly.audio_duration(audio) - media_assembly.probe_duration(audio)) < 0.02
+
+
+def test_ogg_duration_ignores_other_containers(media):
+    template, _ = media
+    assert media_assembly.ogg_duration(template) is None
+    assert abs(media_assembly.audio_duration(template) - 2.0) < 0.1
+
+
+def test_render_reply_video_is_single_pass(media, tmp_path, monkeypatch):
+    template, audio = media
+    calls = []
+    run = media_assembly.run_ffmpeg_sync
+    monkeypatch.setattr(media_assembly, "run_ffmpeg_sync", lambda *args: calls.append(args) or run(*args))
+
+    output = media_assembly.render_reply_video(template, audio, str(tmp_path / "reply.webm"))
+    assert len(calls) == 1 and "-filter_complex" in calls[0]
+    assert abs(media_assembly.probe_duration(output) - 7.0) < 0.2
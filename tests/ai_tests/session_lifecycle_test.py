@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import session_lifecycle
+import template_store
+from session_lifecycle import SessionLifecycle, iter_artifacts
+from session_store import InterviewSession, MemorySessionStore
+
+
+def touch(path, size=100, age=0):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+    return path
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    greetings, inference = tmp_path / "GREETINGS_TEMP", tmp_path / "TEMP_INFERENCE"
+    greetings.mkdir()
+    inference.mkdir()
+    monkeypatch.setattr(session_lifecycle, "SCRATCH_ROOT", str(greetings / "turns"))
+    monkeypatch.setattr(session_lifecycle, "purge_stale_scratch", lambda: 0)
+    monkeypatch.setattr(template_store, "TEMPLATE_DIR", str(greetings / "templates"))
+    return str(greetings), str(inference)
+
+
+def test_expired_session_and_its_files_are_removed(workdir):
+    greetings, inference = workdir
+    store = MemorySessionStore(ttl=0.05)
+    store.save(InterviewSession("old_1"))
+    time.sleep(0.1)
+    store.ttl = 60
+    store.save(InterviewSession("live"))
+
+    old_files = [touch(os.path.join(greetings, "uploaded_video_old_1.webm"), age=3600),
+                 touch(os.path.join(greetings, "loop_old_1.webm"), age=3600),
+                 touch(os.path.join(inference, "final_response_old_1.webm"), age=3600)]
+    live_file = touch(os.path.join(greetings, "uploaded_video_live.webm"), age=3600)
+    database = touch(os.path.join(greetings, "sessions.sqlite3"), age=3600)
+
+    evicted = []
+    lifecycle = SessionLifecycle(store, dirs=workdir, grace=60, on_evict=[evicted.append])
+    assert lifecycle.sweep() == (1, 3)
+
+    assert evicted == ["old_1"]
+    assert not any(os.path.exists(path) for path in old_files)
+    assert os.path.exists(live_file) and os.path.exists(database)
+    assert lifecycle.gauges()["freed_bytes"] == 300
+
+
+def test_fresh_upload_without_session_is_kept(workdir):
+    greetings, _ = workdir
+    upload = touch(os.path.join(greetings, "uploaded_video_new.webm"))
+    lifecycle = SessionLifecycle(MemorySessionStore(ttl=60), dirs=workdir, grace=60)
+    lifecycle.sweep()
+    assert os.path.exists(upload)
+
+
+def test_gauges(workdir):
+    greetings, inference = workdir
+    store = MemorySessionStore(ttl=60)
+    store.save(InterviewSession("a"))
+    store.save(InterviewSession("b"))
+    touch(os.path.join(greetings, "uploaded_video_a.webm"), size=1000)
+    touch(os.path.join(inference, "response_audio_b.ogg"), size=24)
+
+    gauges = SessionLifecycle(store, dirs=workdir).gauges()
+    assert gauges["live_sessions"] == 2
+    assert gauges["artifact_files"] == 2 and gauges["artifact_bytes"] == 1024
+    assert sorted(sid for _, sid, _, _ in iter_artifacts(workdir)) == ["a", "b"]
+
+
+def test_background_sweep(workdir):
+    store = MemorySessionStore(ttl=0.01)
+    store.save(InterviewSession("old"))
+    lifecycle = SessionLifecycle(store, dirs=workdir, interval=0.02)
+
+    async def run():
+        await asyncio.sleep(0.02)
+        lifecycle.start()
+        await asyncio.sleep(0.1)
+        await lifecycle.stop()
+
+    asyncio.run(run())
+    assert lifecycle.evicted_sessions == 1 and len(store) == 0
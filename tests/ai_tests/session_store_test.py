@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import multiprocessing
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import session_store
+from session_store import InterviewSession, MemorySessionStore, SqliteSessionStore
+
+
+def make_session(session_id="interview-1"):
+    session = InterviewSession(session_id, gender="ЖЕН", skills="Python, SQL", title="Data Scientist",
+                               resume={"specialization": "ML", "key_skills": ["Python"]})
+    session.start({"Python": "Что такое GIL?", "SQL": "Чем JOIN отличается от UNION?"})
+    return session
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore(ttl=60)
+    return SqliteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl=60)
+
+
+def test_session_round_trip(store):
+    session = make_session()
+    session.add_answer("Меня зовут Анна")
+    session.set_reply("Анна, что такое GIL?", "Python")
+    session.skill_scores["Python"].append(8)
+    session.address = "Анна"
+    store.save(session)
+
+    loaded = store.get("interview-1")
+    assert loaded == session
+    assert loaded.asked_skill == "Python"
+    assert store.get("unknown") is None
+
+
+def test_changes_are_visible_after_save(store):
+    store.save(make_session())
+    session = store.get("interview-1")
+    session.advance_stage()
+    session.completed = True
+    store.save(session)
+    assert store.get("interview-1").question_stages["Python"] == 1
+    assert store.get("interview-1").completed
+
+
+def test_expired_sessions_are_evicted(store):
+    store.ttl = 0.05
+    store.save(make_session("old"))
+    time.sleep(0.1)
+    store.ttl = 60
+    store.save(make_session("fresh"))
+
+    assert store.get("old") is None
+    store.purge_expired()
+    assert len(store) == 1 and store.get("fresh") is not None
+
+
+def test_delete(store):
+    store.save(make_session())
+    store.delete("interview-1")
+    assert store.get("interview-1") is None
+
+
+def _advance_stage(path, session_id):
+    """Ход в другом воркере: читает сессию из общего файла и сохраняет новый этап."""
+    store = SqliteSessionStore(path, ttl=60)
+    session = store.get(session_id)
+    session.advance_stage(3)
+    session.advance_stage(2)
+    session.add_answer("ответ из другого воркера")
+    store.save(session)
+
+
+def test_sqlite_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    SqliteSessionStore(path, ttl=60).save(make_session())
+
+    worker = multiprocessing.get_context("spawn").Process(target=_advance_stage, args=(path, "interview-1"))
+    worker.start()
+    worker.join(30)
+    assert worker.exitcode == 0
+
+    # Новый экземпляр — как после перезапуска сервиса
+    session = SqliteSessionStore(path, ttl=60).get("interview-1")
+    assert session.question_stages == {"Python": 3, "SQL": 2}
+    assert session.current_skill == "SQL"
+    assert session.answers() == ["ответ из другого воркера"]
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setattr(session_store, "_store", None)
+    monkeypatch.setattr(session_store, "SESSION_STORE", "postgres")
+    with pytest.raises(ValueError):
+        session_store.get_session_store()
+
+
+def test_current_skill_pointer_moves_forward():
+    session = make_session()
+    asked = []
+    while session.current_skill is not None:
+        asked.append((session.current_skill, session.current_stage))
+        session.advance_stage()
+    assert asked == [("Python", 0), ("Python", 1), ("Python", 2), ("SQL", 0), ("SQL", 1), ("SQL", 2)]
+    assert session.question_stages == {"Python": 3, "SQL": 3}
+
+
+def test_history_log_and_last_reply():
+    session = make_session()
+    session.add_answer("Здравствуйте, я Анна")
+    session.set_reply("Анна, что такое GIL?")
+    session.add_answer("Глобальная блокировка интерпретатора")
+    assert session.last_reply() == "Анна, что такое GIL?"
+    assert session.conversation_log() == [
+        "Пользователь: Здравствуйте, я Анна",
+        "Бот: Анна, что такое GIL?",
+        "Пользователь: Глобальная блокировка интерпретатора",
+    ]
+
+
+def test_session_has_no_instance_dict():
+    with pytest.raises(AttributeError):
+        make_session().unexpected = 1
+
+
+def _legacy_sessions(count):
+    """Прежняя раскладка: параллельные словари по session_id, история — список словарей."""
+    maps = {name: {} for name in ("gender", "skills", "title", "resume", "history", "base_questions",
+                                  "stages", "scores", "first_answer", "completed", "address")}
+    for i in range(count):
+        sid = f"interview-{i}"
+        maps["gender"][sid] = "ЖЕН"
+        maps["skills"][sid] = "Python, SQL, Docker"
+        maps["title"][sid] = "Data Scientist"
+        maps["resume"][sid] = {"specialization": "ML"}
+        maps["base_questions"][sid] = {s: f"Вопрос {s} {i}" for s in ("Python", "SQL", "Docker")}
+        maps["stages"][sid] = {s: 2 for s in ("Python", "SQL", "Docker")}
+        maps["scores"][sid] = {s: [7, 8] for s in ("Python", "SQL", "Docker")}
+        maps["history"][sid] = [{"user": f"ответ {i}-{t}", "ai": f"вопрос {i}-{t}"} for t in range(6)]
+        maps["first_answer"][sid] = True
+        maps["completed"][sid] = False
+        maps["address"][sid] = "Анна"
+    return maps
+
+
+def _slotted_sessions(count):
+    store = {}
+    for i in range(count):
+        session = InterviewSession(f"interview-{i}", gender="ЖЕН", skills="Python, SQL, Docker",
+                                   title="Data Scientist", resume={"specialization": "ML"}, address="Анна")
+        session.start({s: f"Вопрос {s} {i}" for s in ("Python", "SQL", "Docker")})
+        for _ in range(6):
+            session.add_answer(f"ответ {i}-{len(session.history)}")
+            session.set_reply(f"вопрос {i}-{len(session.history)}")
+            session.advance_stage()
+        for skill in session.skill_order:
+            session.skill_scores[skill] += [7, 8]
+        store[session.session_id] = session
+    return store
+
+
+def _allocated(build, count):
+    import gc
+    import tracemalloc
+    gc.collect()
+    tracemalloc.start()
+    data = build(count)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def test_slotted_session_uses_less_memory():
+    count = 1000
+    legacy = _allocated(_legacy_sessions, count) / count
+    slotted = _allocated(_slotted_sessions, count) / count
+    print(f"\nПамять на сессию: параллельные словари {legacy:.0f} Б, InterviewSession {slotted:.0f} Б")
+    assert slotted < legacy
+
+
+def test_completed_sessions_expire_sooner(store):
+    store.completed_ttl = 0.05
+    session = make_session("done")
+    session.completed = True
+    store.save(session)
+    store.save(make_session("active"))
+    time.sleep(0.1)
+
+    assert store.purge_expired() == ["done"]
+    assert store.get("active") is not None
+
+
+def test_cached_report_is_stored_with_session(store):
+    session = make_session()
+    session.completed = True
+    session.report = {"session_id": "interview-1", "summary": "Рекомендуется к найму", "scores_by_skill": {"Python": [8]}}
+    session.report_etag = '"abc"'
+    store.save(session)
+
+    loaded = store.get("interview-1")
+    assert loaded.report == session.report and loaded.report_etag == '"abc"'
+    assert loaded.report_started == 0.0
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import asyncio
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+from session_tasks import SessionTasks
+from session_store import InterviewSession, SqliteSessionStore
+
+LLM_DELAY = 0.2
+
+
+async def fake_llm():
+    await asyncio.sleep(LLM_DELAY)
+
+
+def make_store(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.sqlite3"), ttl=60)
+    session = InterviewSession("s1")
+    session.start({"Python": "Что такое GIL?"})
+    store.save(session)
+    return store
+
+
+async def evaluate(tasks, store, score):
+    """Фоновая оценка: как evaluate_answer в API."""
+    await fake_llm()
+    async with tasks.lock("s1"):
+        session = store.get("s1")
+        session.skill_scores["Python"].append(score)
+        store.save(session)
+
+
+async def turn(tasks, store, answer, score, background):
+    """Ход интервью: оценка ответа и генерация следующего вопроса."""
+    session = store.get("s1")
+    session.add_answer(answer)
+    if background:
+        tasks.spawn("s1", evaluate(tasks, store, score))
+    else:
+        await evaluate(tasks, store, score)
+    await fake_llm()  # уточняющий вопрос
+    session.set_reply("следующий вопрос")
+    async with tasks.lock("s1"):
+        session.skill_scores = store.get("s1").skill_scores
+        store.save(session)
+
+
+def test_scoring_is_off_the_critical_path(tmp_path):
+    store = make_store(tmp_path)
+    tasks = SessionTasks()
+
+    async def run(background):
+        start = time.perf_counter()
+        await turn(tasks, store, "ответ", 7, background)
+        elapsed = time.perf_counter() - start
+        await tasks.wait("s1")
+        return elapsed
+
+    sequential = asyncio.run(run(background=False))
+    parallel = asyncio.run(run(background=True))
+    print(f"\nХод: оценка последовательно {sequential:.2f} с, в фоне {parallel:.2f} с")
+    assert parallel < sequential - LLM_DELAY / 2
+    assert store.get("s1").skill_scores["Python"] == [7, 7]
+
+
+def test_background_scores_are_not_lost(tmp_path):
+    store = make_store(tmp_path)
+    tasks = SessionTasks()
+
+    async def interview():
+        for score in range(1, 6):
+            await turn(tasks, store, f"ответ {score}", score, background=True)
+        await tasks.wait("s1")
+
+    asyncio.run(interview())
+    session = store.get("s1")
+    assert sorted(session.skill_scores["Python"]) == [1, 2, 3, 4, 5]
+    assert len(session.history) == 5
+    assert tasks.stats()["pending"] == 0 and tasks.stats()["completed"] == 5
+
+
+def test_failed_task_is_counted(tmp_path):
+    tasks = SessionTasks()
+
+    async def broken():
+        raise RuntimeError("LLM недоступна")
+
+    async def run():
+        tasks.spawn("s1", broken())
+        await tasks.wait("s1")
+
+    asyncio.run(run())
+    assert tasks.stats()["failed"] == 1 and tasks.pending("s1") == 0
+
+
+def test_forget_cancels_pending_tasks():
+    tasks = SessionTasks()
+
+    async def run():
+        task = tasks.spawn("s1", asyncio.sleep(10))
+        await asyncio.sleep(0)
+        tasks.forget("s1")
+        await asyncio.wait([task], timeout=1)
+        return task
+
+    assert asyncio.run(run()).cancelled()
+
+
+def test_wait_by_kind_lets_background_tasks_wait_for_each_other():
+    tasks = SessionTasks()
+    order = []
+
+    async def evaluation():
+        await fake_llm()
+        order.append("evaluate")
+
+    async def report():
+        # Отчёт ждёт только оценок, а не самого себя и не других задач отчёта
+        await tasks.wait("s1", kind="evaluate")
+        order.append("report")
+
+    async def run():
+        tasks.spawn("s1", evaluation(), kind="evaluate")
+        tasks.spawn("s1", report(), kind="report")
+        await asyncio.wait_for(tasks.wait("s1"), timeout=2)
+
+    asyncio.run(run())
+    assert order == ["evaluate", "report"]
+    assert tasks.pending("s1") == 0
+
+
+def test_drain_waits_for_tasks_and_cancels_the_late_ones():
+    tasks = SessionTasks()
+    finished = []
+
+    async def evaluation():
+        await fake_llm()
+        finished.append("evaluate")
+
+    async def run():
+        tasks.spawn("s1", evaluation(), kind="evaluate")
+        late = tasks.spawn("s2", asyncio.sleep(10), kind="report")
+        await tasks.drain(timeout=LLM_DELAY * 3)
+        return late
+
+    assert asyncio.run(run()).cancelled()
+    assert finished == ["evaluate"]
+    assert tasks.stats()["pending"] == 0
@@ -0,0 +1,182 @@
+import os
+import sys
+import types
+import threading
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+REAL_TIME_HR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR'))
+
+
+class Session:
+    """Заглушка speechkit.Session с тем же API, что в speechkit 2.2.x (нет from_iam_token)."""
+
+    IAM_TOKEN = "iam_token"
+    API_KEY = "api_key"
+
+    def __init__(self, auth_type, credential, folder_id, x_client_request_id_header=False,
+                 x_data_logging_enabled=False):
+        if auth_type not in (self.IAM_TOKEN, self.API_KEY):
+            raise ValueError(f"auth_type must be `Session.IAM_TOKEN` or `Session.API_KEY`, but given {auth_type}")
+        self._auth_method = auth_type
+        self._credential = credential
+        self.folder_id = folder_id
+
+    @classmethod
+    def from_api_key(cls, api_key, folder_id=None, x_client_request_id_header=False, x_data_logging_enabled=False):
+        return cls(cls.API_KEY, api_key, folder_id)
+
+    @classmethod
+    def from_yandex_passport_oauth_token(cls, yandex_passport_oauth_token, folder_id,
+                                         x_client_request_id_header=False, x_data_logging_enabled=False):
+        raise AssertionError("OAuth-токен не должен обмениваться внутри SDK: IAM берётся из yandex_iam")
+
+    @classmethod
+    def from_jwt(cls, jwt_token, x_client_request_id_header=False, x_data_logging_enabled=False):
+        raise AssertionError("JWT не используется")
+
+    @property
+    def header(self):
+        if self._auth_method == self.IAM_TOKEN:
+            return {"Authorization": f"Bearer {self._credential}"}
+        return {"Authorization": f"Api-Key {self._credential}"}
+
+
+class RequestError(Exception):
+    """Как speechkit.exceptions.RequestError: код и текст ошибки из ответа SpeechKit."""
+
+    def __init__(self, answer):
+        self.error_code = answer.get("error_code", "")
+        self.message = answer.get("error_message", "")
+        super().__init__(self.error_code, self.message)
+
+
+class SpeechSynthesis:
+    """Заглушка speechkit.SpeechSynthesis: запоминает заголовки сессии и параметры запросов."""
+
+    requests = []
+    revoked = set()  # токены, которые SpeechKit отклоняет с 401
+
+    def __init__(self, session):
+        self._headers = session.header
+        self._folder_id = session.folder_id
+
+    def synthesize_stream(self, **kwargs):
+        if len(kwargs.get("text", "")) > 5000:
+            raise ValueError("Text must be less than 5000 characters")
+        SpeechSynthesis.requests.append((self._headers, self._folder_id, kwargs))
+        if self._headers["Authorization"].split()[-1] in SpeechSynthesis.revoked:
+            raise RequestError({"error_code": "UNAUTHORIZED", "error_message": "The token is invalid"})
+        return b"OggS" + kwargs["text"].encode("utf-8")
+
+
+@pytest.fixture
+def tts(monkeypatch, tmp_path):
+    """try_TTS_Yandex поверх заглушки speechkit с кэшем фраз во временной папке."""
+    stub = types.ModuleType("speechkit")
+    stub.Session, stub.SpeechSynthesis = Session, SpeechSynthesis
+    monkeypatch.setitem(sys.modules, "speechkit", stub)
+    monkeypatch.syspath_prepend(REAL_TIME_HR)
+    # Одноимённые модули interview_module могли быть импортированы другими тестами
+    for name in ("try_TTS_Yandex", "tts_cache", "yandex_iam"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    monkeypatch.setenv("OAUTH_TOKEN", "oauth")
+    monkeypatch.setenv("CATALOG_ID", "folder-1")
+
+    import try_TTS_Yandex
+    import tts_cache
+    tokens = ["iam-1"]
+    monkeypatch.setattr(try_TTS_Yandex, "get_cached_iam_token", lambda: tokens[0])
+    monkeypatch.setattr(tts_cache, "_default_cache", tts_cache.TtsCache(str(tmp_path / "tts_cache")))
+    monkeypatch.setattr(try_TTS_Yandex, "_synthesizer", None)
+    SpeechSynthesis.requests = []
+    SpeechSynthesis.revoked = set()
+    yield try_TTS_Yandex, tokens
+    # Следующие тесты импортируют модули заново со своими путями
+    for name in ("try_TTS_Yandex", "tts_cache", "yandex_iam"):
+        sys.modules.pop(name, None)
+
+
+def test_session_is_built_from_iam_token(tts):
+    module, _ = tts
+    audio = module.Synthesizer().synthesize("  Здравствуйте!  ", "oksana")
+
+    assert audio == "OggSЗдравствуйте!".encode("utf-8")
+    headers, folder_id, params = SpeechSynthesis.requests[0]
+    assert headers == {"Authorization": "Bearer iam-1"} and folder_id == "folder-1"
+    assert params == {"text": "Здравствуйте!", "voice": "oksana", "format": "oggopus", "sampleRateHertz": "48000"}
+
+
+def test_session_is_recreated_only_after_token_refresh(tts):
+    module, tokens = tts
+    synthesizer = module.Synthesizer()
+    for text in ("раз", "два", "три"):
+        synthesizer.synthesize(text, "zahar")
+    assert synthesizer.sessions_created == 1
+
+    tokens[0] = "iam-2"
+    synthesizer.synthesize("четыре", "zahar")
+    assert synthesizer.sessions_created == 2
+    assert SpeechSynthesis.requests[-1][0] == {"Authorization": "Bearer iam-2"}
+
+
+def test_text_to_audio_uses_shared_synthesizer_and_cache(tts):
+    module, _ = tts
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(module.text_to_audio("Расскажите о себе", "oksana")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert set(results) == {"OggSРасскажите о себе".encode("utf-8")}
+    assert len(SpeechSynthesis.requests) == 1
+    assert module.get_synthesizer() is module.get_synthesizer()
+
+
+def test_missing_credentials_are_rejected(tts, monkeypatch):
+    module, _ = tts
+    monkeypatch.delenv("OAUTH_TOKEN")
+    with pytest.raises(ValueError):
+        module.Synthesizer()
+
+
+class IamCacheStub:
+    """Кэш IAM-токенов: invalidate() выдаёт новый токен при следующем запросе."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.invalidated = 0
+
+    def invalidate(self):
+        self.invalidated += 1
+        self.tokens[0] = f"iam-{self.invalidated + 1}"
+
+
+def test_revoked_token_is_refreshed_and_request_retried_once(tts, monkeypatch):
+    module, tokens = tts
+    iam_cache = IamCacheStub(tokens)
+    monkeypatch.setattr(module, "get_iam_cache", lambda: iam_cache)
+    synthesizer = module.Synthesizer()
+    synthesizer.synthesize("раз", "oksana")
+
+    # Токен отозван раньше срока, фоновое обновление ещё не пришло
+    SpeechSynthesis.revoked.add("iam-1")
+    assert synthesizer.synthesize("два", "oksana") == "OggSдва".encode("utf-8")
+    assert iam_cache.invalidated == 1 and synthesizer.sessions_created == 2
+    assert [headers["Authorization"] for headers, _, _ in SpeechSynthesis.requests] == [
+        "Bearer iam-1", "Bearer iam-1", "Bearer iam-2",
+    ]
+
+
+def test_unauthorized_after_refresh_is_raised(tts, monkeypatch):
+    module, tokens = tts
+    iam_cache = IamCacheStub(tokens)
+    monkeypatch.setattr(module, "get_iam_cache", lambda: iam_cache)
+    SpeechSynthesis.revoked.update({"iam-1", "iam-2"})
+
+    with pytest.raises(RequestError):
+        module.Synthesizer().synthesize("раз", "oksana")
+    assert iam_cache.invalidated == 1 and len(SpeechSynthesis.requests) == 2
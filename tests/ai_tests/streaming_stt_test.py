@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import asyncio
+import subprocess
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import openai_whisper_STT
+import streaming_stt
+from openai_whisper_STT import SAMPLE_RATE
+from streaming_stt import StreamingTranscriber, store_final_transcript, take_final_transcript
+
+# Имитация Whisper на CPU: время распознавания пропорционально длине аудио
+RTF = 0.05
+CHUNK_SECONDS = 0.5
+# Запись идёт быстрее реального времени, чтобы тест был коротким
+REALTIME_SPEEDUP = 10
+
+
+def make_answer_webm(pattern):
+    """
+    webm/opus-запись ответа: чередование «речи» (тон) и пауз.
+    pattern — список длительностей (речь, пауза, речь, ...).
+    """
+    inputs, filters = [], []
+    for index, seconds in enumerate(pattern):
+        if index % 2 == 0:
+            inputs += ["-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}"]
+        else:
+            inputs += ["-f", "lavfi", "-i", f"anullsrc=r=48000:cl=mono:d={seconds}"]
+        filters.append(f"[{index}:a]aresample=48000,aformat=channel_layouts=mono[a{index}]")
+    concat = "".join(f"[a{i}]" for i in range(len(pattern))) + f"concat=n={len(pattern)}:v=0:a=1[out]"
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", *inputs,
+        "-filter_complex", ";".join(filters + [concat]), "-map", "[out]",
+        "-c:a", "libopus", "-f", "webm", "pipe:1",
+    ]
+    return subprocess.run(command, capture_output=True, check=True).stdout
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    """Подменяет модель: запоминаем длительности окон, которые ушли бы в Whisper."""
+    calls = []
+
+    def fake_transcribe(audio, language="ru", backend=None, options=None):
+        seconds = len(audio) / SAMPLE_RATE
+        calls.append(seconds)
+        time.sleep(seconds * RTF)
+        return f"<{seconds:.0f}с>"
+
+    monkeypatch.setattr(openai_whisper_STT, "transcribe_audio", fake_transcribe)
+    monkeypatch.setattr(streaming_stt, "STREAM_STEP", 1.0)
+    monkeypatch.setattr(streaming_stt, "STREAM_COMMIT", 8.0)
+    return calls
+
+
+async def stream_answer(data, total_seconds):
+    """Отправляет запись кусками в темпе MediaRecorder и возвращает (транскрипт, время после остановки)."""
+    transcriber = StreamingTranscriber()
+    await transcriber.start()
+    chunks = max(1, int(total_seconds / CHUNK_SECONDS))
+    size = -(-len(data) // chunks)
+    partials = 0
+    pending = None
+    for start in range(0, len(data), size):
+        await transcriber.feed(data[start:start + size])
+        if pending is None or pending.done():
+            pending = asyncio.create_task(transcriber.maybe_transcribe())
+        await asyncio.sleep(CHUNK_SECONDS / REALTIME_SPEEDUP)
+        partials += bool(transcriber.transcript)
+    if pending is not None:
+        await pending
+
+    stopped = time.perf_counter()
+    text = await transcriber.finish()
+    return transcriber, text, time.perf_counter() - stopped, partials
+
+
+def test_partial_transcript_before_release(decoded):
+    data = make_answer_webm([3.0, 1.0, 3.0])
+    transcriber, text, _, partials = asyncio.run(stream_answer(data, 7.0))
+
+    assert abs(transcriber.audio_seconds - 7.0) < 0.2
+    assert transcriber.passes >= 2
+    assert partials > 0  # промежуточный текст появился до остановки
+    assert text
+
+
+def test_long_answer_commits_window(decoded):
+    # 24 с речи с паузами: окно фиксируется, хвост распознаётся заново не целиком
+    pattern = [3.0, 1.0] * 6
+    data = make_answer_webm(pattern)
+    transcriber, text, after_stop, _ = asyncio.run(stream_answer(data, sum(pattern)))
+
+    print(f"\n[STREAM] {transcriber.audio_seconds:.1f} с аудио, проходов {transcriber.passes}, "
+          f"окно max {max(decoded):.1f} с, текст через {after_stop:.3f} с после остановки")
+    assert transcriber.committed_samples > 0
+    assert max(decoded) < streaming_stt.STREAM_COMMIT + streaming_stt.STREAM_STEP + 4.0
+    # После остановки распознаётся только хвост — быстрее, чем весь ответ целиком
+    assert after_stop < sum(pattern) * RTF
+
+
+def test_final_transcript_is_taken_once():
+    store_final_transcript("session-1", "мой ответ")
+    assert take_final_transcript("session-1") == "мой ответ"
+    assert take_final_transcript("session-1") is None
+
+
+def test_stale_transcript_is_ignored():
+    store_final_transcript("session-2", "старый ответ")
+    assert take_final_transcript("session-2", max_age=0) is None
+
+
+def test_first_chunk_is_decoded_without_waiting_for_probe():
+    # Заголовок webm и первые полсекунды записи: PCM идёт сразу, не дожидаясь остальной записи
+    data = make_answer_webm([7.0])
+
+    async def scenario():
+        transcriber = StreamingTranscriber()
+        await transcriber.start()
+        try:
+            await transcriber.feed(data[:len(data) // 14])
+            deadline = time.perf_counter() + 2.0
+            while not transcriber.pcm and time.perf_counter() < deadline:
+                await asyncio.sleep(0.01)
+            return transcriber.audio_seconds
+        finally:
+            transcriber.abort()
+
+    assert asyncio.run(scenario()) > 0
+
+
+def test_partial_pass_is_skipped_while_turn_slots_are_busy(decoded, monkeypatch):
+    import turn_runtime
+    monkeypatch.setattr(turn_runtime, "MAX_CONCURRENT_TURNS", 1)
+    data = make_answer_webm([3.0])
+
+    async def scenario():
+        transcriber = StreamingTranscriber()
+        await transcriber.start()
+        await transcriber.feed(data)
+        while transcriber.audio_seconds < 2.5:
+            await asyncio.sleep(0.01)
+        # Все слоты заняты ходами интервью — промежуточный текст не считается
+        async with turn_runtime.turn_slot():
+            assert await transcriber.maybe_transcribe() is None
+        assert transcriber.skipped == 1 and decoded == []
+        # Слот освободился — проход идёт
+        assert await transcriber.maybe_transcribe()
+        return await transcriber.finish()
+
+    assert asyncio.run(scenario())
+
+
+def test_decoder_is_killed_when_stream_fails(avatar_api, monkeypatch):
+    from starlette.testclient import TestClient
+    api, _ = avatar_api
+    transcribers = []
+
+    class FailingTranscriber(api.StreamingTranscriber):
+        async def feed(self, chunk):
+            transcribers.append(self)
+            raise RuntimeError("ошибка записи в декодер")
+
+        def abort(self):
+            self.aborted = True
+            super().abort()
+
+    monkeypatch.setattr(api, "StreamingTranscriber", FailingTranscriber)
+    with pytest.raises(RuntimeError):
+        with TestClient(api.app).websocket_connect("/ws/stt/session-1") as websocket:
+            websocket.send_bytes(b"webm")
+            websocket.receive_json()
+
+    transcriber, = transcribers
+    assert transcriber.aborted
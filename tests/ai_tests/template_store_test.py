@@ -0,0 +1,159 @@
+import os
+import sys
+import asyncio
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import template_store
+from template_store import fetch_template, media_path, purge_unused_templates
+
+VIDEO = os.urandom(3 * 1024 * 1024 + 123)
+
+
+@pytest.fixture
+def platform(tmp_path):
+    """Сервис платформы, раздающий /media/; считает запросы к файлам."""
+    media = tmp_path / "media" / "videos"
+    media.mkdir(parents=True)
+    (media / "hr.webm").write_bytes(VIDEO)
+    requests = []
+
+    class Handler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=str(tmp_path), **kwargs)
+
+        def do_GET(self):
+            requests.append(self.path)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", str(tmp_path / "media"), requests
+    server.shutdown()
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "templates"
+    monkeypatch.setattr(template_store, "TEMPLATE_DIR", str(directory))
+    monkeypatch.setattr(template_store, "_by_url", {})
+    monkeypatch.setattr(template_store, "_downloads", {})
+    return directory
+
+
+def test_same_template_is_downloaded_and_stored_once(platform, store_dir, tmp_path, monkeypatch):
+    url, _, requests = platform
+    monkeypatch.setattr(template_store, "TEMPLATE_SOURCE_URL", url)
+    sessions = [str(tmp_path / f"uploaded_video_{i}.webm") for i in range(4)]
+
+    async def upload_all():
+        await asyncio.gather(*(fetch_template("/media/videos/hr.webm", path) for path in sessions[:3]))
+        await fetch_template("/media/videos/hr.webm", sessions[3])
+
+    asyncio.run(upload_all())
+
+    assert len(requests) == 1
+    assert len(os.listdir(store_dir)) == 1
+    for path in sessions:
+        with open(path, "rb") as f:
+            assert f.read() == VIDEO
+    assert len({os.stat(path).st_ino for path in sessions}) == 1
+
+
+def test_shared_media_volume_skips_http(platform, store_dir, tmp_path, monkeypatch):
+    url, media_root, requests = platform
+    monkeypatch.setattr(template_store, "TEMPLATE_SOURCE_URL", url)
+    monkeypatch.setattr(template_store, "TEMPLATE_MEDIA_ROOT", media_root)
+
+    path = asyncio.run(fetch_template("/media/videos/hr.webm", str(tmp_path / "uploaded_video_x.webm")))
+    assert requests == []
+    with open(path, "rb") as f:
+        assert f.read() == VIDEO
+
+
+def test_media_path_stays_inside_root(platform):
+    _, media_root, _ = platform
+    assert media_path("/media/videos/hr.webm", media_root).endswith("hr.webm")
+    assert media_path("/media/../media/videos/hr.webm", media_root) is not None
+    assert media_path("/media/../../etc/passwd", media_root) is None
+    assert media_path("/static/hr.webm", media_root) is None
+
+
+def test_failed_download_leaves_nothing(platform, store_dir, tmp_path, monkeypatch):
+    url, _, _ = platform
+    monkeypatch.setattr(template_store, "TEMPLATE_SOURCE_URL", url)
+    with pytest.raises(Exception):
+        asyncio.run(fetch_template("/media/videos/missing.webm", str(tmp_path / "uploaded_video_y.webm")))
+    assert os.listdir(store_dir) == []
+
+
+def test_unreferenced_templates_are_purged(platform, store_dir, tmp_path, monkeypatch):
+    url, _, _ = platform
+    monkeypatch.setattr(template_store, "TEMPLATE_SOURCE_URL", url)
+    first, second = str(tmp_path / "uploaded_video_1.webm"), str(tmp_path / "uploaded_video_2.webm")
+
+    async def upload():
+        await fetch_template("/media/videos/hr.webm", first)
+        await fetch_template("/media/videos/hr.webm", second)
+
+    asyncio.run(upload())
+    os.remove(first)
+    assert purge_unused_templates() == (0, 0)  # на шаблон ещё ссылается вторая сессия
+    os.remove(second)
+    assert purge_unused_templates() == (1, len(VIDEO))
+    assert template_store._by_url == {}
+
+
+def test_reuploaded_template_at_same_url_is_fetched_again(platform, store_dir, tmp_path, monkeypatch):
+    url, media_root, requests = platform
+    monkeypatch.setattr(template_store, "TEMPLATE_SOURCE_URL", url)
+    first, second = str(tmp_path / "uploaded_video_1.webm"), str(tmp_path / "uploaded_video_2.webm")
+    asyncio.run(fetch_template("/media/videos/hr.webm", first))
+
+    # HR загрузил другое видео по той же ссылке
+    source = os.path.join(media_root, "videos", "hr.webm")
+    new_video = os.urandom(len(VIDEO) // 2)
+    with open(source, "wb") as f:
+        f.write(new_video)
+    os.utime(source, (os.stat(source).st_atime, os.stat(source).st_mtime + 10))
+
+    asyncio.run(fetch_template("/media/videos/hr.webm", second))
+    assert len(requests) == 2
+    with open(first, "rb") as f:
+        assert f.read() == VIDEO
+    with open(second, "rb") as f:
+        assert f.read() == new_video
+
+
+def test_changed_file_on_shared_media_volume_is_reimported(platform, store_dir, tmp_path, monkeypatch):
+    _, media_root, _ = platform
+    monkeypatch.setattr(template_store, "TEMPLATE_MEDIA_ROOT", media_root)
+    source = os.path.join(media_root, "videos", "hr.webm")
+    first = asyncio.run(fetch_template("/media/videos/hr.webm", str(tmp_path / "uploaded_video_1.webm")))
+    with open(source, "wb") as f:
+        f.write(b"new template")
+
+    second = asyncio.run(fetch_template("/media/videos/hr.webm", str(tmp_path / "uploaded_video_2.webm")))
+    with open(first, "rb") as f:
+        assert f.read() == VIDEO
+    with open(second, "rb") as f:
+        assert f.read() == b"new template"
+
+
+def test_stale_partial_downloads_are_purged(store_dir):
+    store_dir.mkdir()
+    stale, fresh = store_dir / "crashed.part", store_dir / "downloading.part"
+    stale.write_bytes(b"x" * 10)
+    fresh.write_bytes(b"y" * 5)
+    old_time = os.stat(stale).st_mtime - 2 * template_store.TEMPLATE_PART_MAX_AGE
+    os.utime(stale, (old_time, old_time))
+
+    assert purge_unused_templates() == (1, 10)
+    assert os.listdir(store_dir) == ["downloading.part"]
@@ -0,0 +1,163 @@
+import os
+import sys
+import time
+import threading
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import tts_cache
+from tts_cache import TtsCache, cache_key
+
+
+class CountingSynthesizer:
+    """Синтезатор-заглушка: считает обращения к SpeechKit."""
+
+    def __init__(self, size=100, delay=0.0):
+        self.calls = []
+        self.size = size
+        self.delay = delay
+
+    def __call__(self, text, voice):
+        time.sleep(self.delay)
+        self.calls.append((text, voice))
+        return f"{voice}:{text}".encode("utf-8").ljust(self.size, b"\0")
+
+
+def synthesize(cache, synth, text, voice="oksana"):
+    return cache.get_or_synthesize(text, voice, synth, "oggopus", "48000")
+
+
+def test_repeated_phrase_is_synthesized_once(tmp_path):
+    cache = TtsCache(str(tmp_path))
+    synth = CountingSynthesizer()
+    first = synthesize(cache, synth, "Перейдем к следующему навыку.")
+    second = synthesize(cache, synth, "  Перейдем   к следующему\nнавыку. ")
+    assert first == second
+    assert len(synth.calls) == 1
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["memory_hits"] == 1
+
+
+def test_key_depends_on_voice_and_format():
+    text = "Благодарю за интервью!"
+    assert cache_key(text, "oksana", "oggopus", 48000) != cache_key(text, "zahar", "oggopus", 48000)
+    assert cache_key(text, "oksana", "oggopus", 48000) != cache_key(text, "oksana", "lpcm", 48000)
+    assert cache_key(text, "oksana", "oggopus", 48000) == cache_key(text, "oksana", "oggopus", "48000")
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    synth = CountingSynthesizer()
+    synthesize(TtsCache(str(tmp_path)), synth, "Благодарю за интервью!")
+
+    restarted = TtsCache(str(tmp_path))
+    assert synthesize(restarted, synth, "Благодарю за интервью!").startswith(b"oksana:")
+    assert len(synth.calls) == 1
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_disk_is_bounded_by_lru(tmp_path):
+    cache = TtsCache(str(tmp_path), max_disk_bytes=250, max_memory_bytes=0)
+    synth = CountingSynthesizer(size=100)
+    synthesize(cache, synth, "первая")
+    synthesize(cache, synth, "вторая")
+    synthesize(cache, synth, "первая")  # первая фраза снова свежая
+    synthesize(cache, synth, "третья")  # вытесняется вторая
+
+    stats = cache.stats()
+    assert stats["disk_entries"] == 2 and stats["disk_bytes"] <= 250
+    assert stats["evictions"] == 1
+    synthesize(cache, synth, "первая")
+    assert len(synth.calls) == 3
+    synthesize(cache, synth, "вторая")
+    assert len(synth.calls) == 4
+
+
+def test_memory_is_bounded(tmp_path):
+    cache = TtsCache(str(tmp_path), max_memory_bytes=150)
+    synth = CountingSynthesizer(size=100)
+    synthesize(cache, synth, "первая")
+    synthesize(cache, synth, "вторая")
+    assert cache.stats()["memory_bytes"] <= 150
+    synthesize(cache, synth, "первая")
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_concurrent_misses_call_synthesizer_once(tmp_path):
+    cache = TtsCache(str(tmp_path))
+    synth = CountingSynthesizer(delay=0.1)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(synthesize(cache, synth, "Расскажите о себе.")))
+        for _ in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(synth.calls) == 1
+    assert len(set(results)) == 1 and len(results) == 6
+
+
+def test_phrase_saved_right_after_a_miss_is_not_synthesized_again(tmp_path, monkeypatch):
+    cache = TtsCache(str(tmp_path))
+    synth = CountingSynthesizer()
+    get = cache.get
+    raced = []
+
+    def get_then_lose_race(key):
+        data = get(key)
+        if data is None and not raced:
+            raced.append(key)
+            # Пока этот поток шёл к блокировке, другой синтезировал и сохранил ту же фразу
+            other = threading.Thread(target=synthesize, args=(cache, synth, "Расскажите о себе."))
+            other.start()
+            other.join()
+        return data
+
+    monkeypatch.setattr(cache, "get", get_then_lose_race)
+    assert synthesize(cache, synth, "Расскажите о себе.").startswith(b"oksana:")
+    assert len(synth.calls) == 1
+
+
+def test_failed_synthesis_is_not_cached(tmp_path):
+    cache = TtsCache(str(tmp_path))
+
+    def failing(text, voice):
+        raise RuntimeError("SpeechKit недоступен")
+
+    try:
+        synthesize(cache, failing, "Добрый день!")
+    except RuntimeError:
+        pass
+    synth = CountingSynthesizer()
+    synthesize(cache, synth, "Добрый день!")
+    assert len(synth.calls) == 1
+
+
+def test_caches_share_one_directory(tmp_path):
+    # Два сервиса с общим томом: фраза, синтезированная одним, не идёт в SpeechKit у другого
+    synth = CountingSynthesizer()
+    avatar, interview = TtsCache(str(tmp_path)), TtsCache(str(tmp_path))
+    synthesize(avatar, synth, "Перейдем к следующему навыку.")
+    assert synthesize(interview, synth, "Перейдем к следующему навыку.").startswith(b"oksana:")
+    assert len(synth.calls) == 1
+    assert interview.stats()["disk_hits"] == 1 and interview.stats()["disk_entries"] == 1
+
+
+def test_shared_directory_is_bounded_as_a_whole(tmp_path, monkeypatch):
+    # Каждая запись сверяет индекс с каталогом (как по истечении TTS_CACHE_RESCAN_SECONDS)
+    monkeypatch.setattr(tts_cache, "TTS_CACHE_RESCAN_SECONDS", 0)
+    first = TtsCache(str(tmp_path), max_disk_bytes=350, max_memory_bytes=0)
+    second = TtsCache(str(tmp_path), max_disk_bytes=350, max_memory_bytes=0)
+    synth = CountingSynthesizer(size=100)
+    synthesize(first, synth, "первая")
+    synthesize(second, synth, "вторая")
+    synthesize(first, synth, "третья")
+    synthesize(second, synth, "четвёртая")  # на диске уже 400 байт: вытесняется самая старая фраза
+
+    files = [os.path.join(root, name) for root, _, names in os.walk(tmp_path) for name in names]
+    assert sum(os.path.getsize(path) for path in files) <= 350
+    assert len(files) == 3
+    synthesize(first, synth, "первая")
+    assert len(synth.calls) == 5
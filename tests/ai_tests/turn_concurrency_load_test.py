@@ -0,0 +1,192 @@
+import os
+import sys
+import time
+import math
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import turn_runtime
+from turn_runtime import turn_slot, TurnsBusyError
+
+POLL_INTERVAL = 0.01
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def start_session(api, session_id):
+    """Сессия после базового вопроса: следующий ход генерирует уточнение (LLM + озвучка по предложениям)."""
+    session = api.InterviewSession(session_id, gender="ЖЕН", address="Анна")
+    session.start({"Python": "Что такое GIL?", "SQL": "Что такое индекс?"})
+    session.add_answer("Здравствуйте, меня зовут Анна")
+    session.set_reply("Анна, что такое GIL?", "Python")
+    session.advance_stage()
+    api.sessions.save(session)
+
+
+async def poll_current_question(api, session_id, stop, lags):
+    """Опрос /current_question/ другим кандидатом: меряем задержку цикла событий."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(POLL_INTERVAL)
+        lags.append(time.perf_counter() - start - POLL_INTERVAL)
+        await api.get_current_question(session_id)
+
+
+async def answer(api, services, session_id, text):
+    """Ход кандидата через /process_audio/ (режим audio: без сборки видео). Возвращает строки потока ответа."""
+    response = await api.process_audio(services.upload(text), session_id, False, "audio")
+    return response, await services.receive(response)
+
+
+async def run_sessions(api, services, count):
+    for index in range(count + 1):
+        start_session(api, f"session-{index}")
+    latencies, first_audio, lags = [], [], []
+    stop = asyncio.Event()
+    poller = asyncio.create_task(poll_current_question(api, f"session-{count}", stop, lags))
+
+    async def one_session(session_id):
+        start = time.perf_counter()
+        response, messages = await answer(api, services, session_id, f"GIL — глобальная блокировка ({session_id})")
+        latencies.append(time.perf_counter() - start)
+        # Первое предложение приходит клиенту до конца ответа; время отсчитываем от отправки хода
+        first_audio.append(latencies[-1] - messages[-1][1] + messages[0][1])
+        assert response.media_type == "application/x-ndjson"
+        assert all(message["audio"] for message, _ in messages[:-1]) and messages[-1][0] == {"done": True}
+
+    await asyncio.gather(*[one_session(f"session-{index}") for index in range(count)])
+    stop.set()
+    await poller
+    for index in range(count):
+        await api.session_tasks.wait(f"session-{index}")
+    return latencies, first_audio, lags
+
+
+@pytest.mark.parametrize("sessions", [1, 4, 8])
+def test_turn_latency_p95(avatar_api, sessions):
+    api, services = avatar_api
+    latencies, first_audio, lags = asyncio.run(run_sessions(api, services, sessions))
+    p50, p95 = percentile(latencies, 50), percentile(latencies, 95)
+    print(f"\n[LOAD] сессий={sessions} p50={p50:.3f}s p95={p95:.3f}s "
+          f"первое предложение p95={percentile(first_audio, 95):.3f}s "
+          f"задержка опроса p95={percentile(lags, 95) * 1000:.1f}ms")
+
+    # Цикл событий остаётся свободным: опрос других кандидатов не ждёт чужой ход
+    assert percentile(lags, 95) < 0.05
+    # STT — единственный последовательный этап, остальные перекрываются
+    serial_stt = math.ceil(sessions / sys.modules["turn_runtime"].STT_WORKERS) * services.STT_SECONDS
+    assert p95 < serial_stt + services.LLM_SECONDS + 2 * services.TTS_SECONDS + 2.0
+    # Клиент начинает слушать раньше, чем ответ озвучен целиком
+    assert max(first_audio[i] - latencies[i] for i in range(sessions)) < 0
+    # Каждый ход оценён в фоне
+    for index in range(sessions):
+        assert api.sessions.get(f"session-{index}").skill_scores["Python"] == [7]
+
+
+def test_process_audio_limits_concurrent_turns(avatar_api, monkeypatch):
+    api, services = avatar_api
+    runtime = sys.modules["turn_runtime"]
+    monkeypatch.setattr(runtime, "MAX_CONCURRENT_TURNS", 2)
+    peak = 0
+    run_turn = api.run_turn
+
+    async def tracked_run_turn(*args):
+        nonlocal peak
+        peak = max(peak, runtime.active_turns)
+        return await run_turn(*args)
+
+    monkeypatch.setattr(api, "run_turn", tracked_run_turn)
+
+    async def scenario():
+        for index in range(6):
+            start_session(api, f"session-{index}")
+        await asyncio.gather(*[answer(api, services, f"session-{index}", "ответ") for index in range(6)])
+        for index in range(6):
+            await api.session_tasks.wait(f"session-{index}")
+
+    asyncio.run(scenario())
+    assert peak == 2
+    assert runtime.active_turns == 0
+
+
+def test_process_audio_answers_503_when_queue_times_out(avatar_api, monkeypatch):
+    api, services = avatar_api
+    runtime = sys.modules["turn_runtime"]
+    monkeypatch.setattr(runtime, "MAX_CONCURRENT_TURNS", 1)
+    monkeypatch.setattr(runtime, "TURN_QUEUE_TIMEOUT", 0.05)
+    monkeypatch.setattr(services, "STT_SECONDS", 0.3)
+
+    async def scenario():
+        start_session(api, "first")
+        start_session(api, "second")
+        first = asyncio.create_task(answer(api, services, "first", "ответ"))
+        await asyncio.sleep(0.01)
+        try:
+            await api.process_audio(services.upload("ответ"), "second", False, "audio")
+        finally:
+            await first
+            await api.session_tasks.wait("first")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 503
+
+
+def test_turn_slot_queue_timeout(monkeypatch):
+    monkeypatch.setattr(turn_runtime, "MAX_CONCURRENT_TURNS", 1)
+
+    async def scenario():
+        async with turn_slot():
+            async with turn_slot(timeout=0.05):
+                pass
+
+    with pytest.raises(TurnsBusyError):
+        asyncio.run(scenario())
+
+
+def test_streamed_reply_failure_is_reported_in_the_stream(avatar_api, monkeypatch):
+    api, services = avatar_api
+    runtime = sys.modules["turn_runtime"]
+
+    def broken_tts(text, voice="oksana"):
+        raise RuntimeError("SpeechKit недоступен")
+
+    monkeypatch.setattr(api, "text_to_audio", broken_tts)
+
+    async def scenario():
+        start_session(api, "broken")
+        response, messages = await answer(api, services, "broken", "ответ")
+        await api.session_tasks.wait("broken")
+        return messages
+
+    messages = asyncio.run(scenario())
+    assert [message for message, _ in messages] == [{"error": "SpeechKit недоступен"}]
+    # Ход не засчитан: кандидат повторит ответ на тот же вопрос
+    session = api.sessions.get("broken")
+    assert session.current_stage == 1 and session.last_reply() == "Анна, что такое GIL?"
+    assert runtime.active_turns == 0
+
+
+def test_streamed_turn_completes_without_the_client(avatar_api):
+    api, services = avatar_api
+    runtime = sys.modules["turn_runtime"]
+
+    async def scenario():
+        start_session(api, "gone")
+        # Клиент отключился, не прочитав ни одной строки
+        await api.process_audio(services.upload("ответ"), "gone", False, "audio")
+        await api.session_tasks.wait("gone")
+
+    asyncio.run(scenario())
+    session = api.sessions.get("gone")
+    assert session.current_stage == 2
+    assert session.last_reply().startswith("Хорошо, спасибо за ответ.")
+    assert runtime.active_turns == 0
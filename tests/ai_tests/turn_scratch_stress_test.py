@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+from scratch_files import TurnScratch, purge_stale_scratch
+
+SESSIONS = 24
+
+
+def start_session(api, session_id):
+    """Сессия на уточняющем вопросе по Python: ответ попадает в промпт следующего вопроса."""
+    session = api.InterviewSession(session_id, gender="МУЖ", address="Иван")
+    session.start({"Python": "Что такое GIL?"})
+    session.add_answer("Здравствуйте, меня зовут Иван")
+    session.set_reply("Иван, что такое GIL?", "Python")
+    session.advance_stage()
+    api.sessions.save(session)
+
+
+def scratch_root():
+    return os.path.join("GREETINGS_TEMP", "turns")
+
+
+def test_concurrent_sessions_get_their_own_transcripts(avatar_api, monkeypatch):
+    api, services = avatar_api
+    monkeypatch.setattr(services, "STT_SECONDS", 0.01)
+    # Ответ одним файлом: аудио хода пишется в его папку (потоковый ответ файлов не создаёт)
+    monkeypatch.setattr(api, "STREAM_REPLY", False)
+    answers = {f"session-{i}": f"ответ кандидата №{i}" for i in range(SESSIONS)}
+    paths = {}
+
+    async def one_turn(session_id, text):
+        response = await api.process_audio(services.upload(text), session_id, False, "audio")
+        paths[session_id] = response.path
+        # Пока ответ не отправлен, его аудио лежит в папке этого хода
+        assert os.path.exists(response.path)
+        await response.background()
+
+    async def scenario():
+        for session_id in answers:
+            start_session(api, session_id)
+        await asyncio.gather(*[one_turn(session_id, text) for session_id, text in answers.items()])
+        for session_id in answers:
+            await api.session_tasks.wait(session_id)
+
+    asyncio.run(scenario())
+    for session_id, text in answers.items():
+        session = api.sessions.get(session_id)
+        assert session.history[-1][0] == text, session_id
+        assert os.path.basename(os.path.dirname(paths[session_id])).startswith(f"{session_id}_")
+    # Уточняющий вопрос каждой сессии построен по её собственному ответу
+    clarifying = [prompt for prompt in services.prompts if "уточняющий вопрос" in prompt]
+    for text in answers.values():
+        assert sum(f'"{text}"' in prompt for prompt in clarifying) == 1, text
+    assert len(set(paths.values())) == SESSIONS
+    # Папки ходов удалены после отправки ответа
+    assert os.listdir(scratch_root()) == []
+
+
+def test_failed_turn_removes_its_scratch_dir(avatar_api, monkeypatch):
+    api, services = avatar_api
+
+    def broken_tts(text, voice="oksana"):
+        raise RuntimeError("SpeechKit недоступен")
+
+    monkeypatch.setattr(api, "text_to_audio", broken_tts)
+    monkeypatch.setattr(api, "STREAM_REPLY", False)
+    start_session(api, "broken")
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(api.process_audio(services.upload("ответ"), "broken", False, "audio"))
+    assert error.value.status_code == 500
+    assert os.listdir(scratch_root()) == []
+
+
+def test_scratch_dir_is_removed_on_error(tmp_path):
+    try:
+        with TurnScratch("session/../x", root=str(tmp_path)) as scratch:
+            scratch.write("user_input.webm", b"data")
+            assert os.path.dirname(scratch.path) == str(tmp_path)
+            raise RuntimeError("ошибка этапа")
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path) == []
+
+
+def test_purge_stale_scratch(tmp_path):
+    stale = TurnScratch("old", root=str(tmp_path))
+    fresh = TurnScratch("new", root=str(tmp_path))
+    old_time = time.time() - 7200
+    os.utime(stale.path, (old_time, old_time))
+
+    assert purge_stale_scratch(root=str(tmp_path), max_age=3600) == 1
+    assert not os.path.exists(stale.path)
+    assert os.path.exists(fresh.path)
@@ -0,0 +1,98 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Добавляем путь к interview_module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'interview_module')))
+import openai_whisper_STT
+from openai_whisper_STT import transcribe_batch, SAMPLE_RATE
+
+# Имитация модели: проход фиксирован по времени (окно 30 с всегда дополняется),
+# поэтому пачка из N кусков стоит почти как один кусок
+PASS_SECONDS = 0.02
+PER_ITEM_SECONDS = 0.002
+
+
+class FakeBackend:
+    """Реализация-заглушка: «распознаёт» длительность куска и запоминает пачки."""
+
+    batches = []
+
+    def __init__(self, model_name=None, device=None):
+        self.compute_type = "int8"
+
+    def transcribe_batch(self, chunks, language="ru", options=None):
+        FakeBackend.batches.append([len(chunk) for chunk in chunks])
+        time.sleep(PASS_SECONDS + PER_ITEM_SECONDS * len(chunks))
+        return [f"{len(chunk) / SAMPLE_RATE:.1f}" for chunk in chunks]
+
+
+@pytest.fixture(autouse=True)
+def fake_backend(monkeypatch):
+    FakeBackend.batches = []
+    monkeypatch.setitem(openai_whisper_STT.BACKENDS, "fake", FakeBackend)
+    monkeypatch.setattr(openai_whisper_STT, "_backends", {})
+    monkeypatch.setattr(openai_whisper_STT, "STT_BACKEND", "fake")
+    monkeypatch.setattr(openai_whisper_STT, "WHISPER_DEVICE", "cpu")
+
+
+def tone(seconds):
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def test_results_keep_clip_order():
+    durations = [3.0, 12.0, 1.0, 7.0, 20.0]
+    texts = transcribe_batch([tone(d) for d in durations], vad=False, batch_size=2)
+    assert texts == [f"{d:.1f}" for d in durations]
+
+
+def test_chunks_are_bucketed_by_length():
+    durations = [3.0, 12.0, 1.0, 7.0, 20.0, 2.0]
+    transcribe_batch([tone(d) for d in durations], vad=False, batch_size=2)
+
+    assert [len(batch) for batch in FakeBackend.batches] == [2, 2, 2]
+    lengths = [length for batch in FakeBackend.batches for length in batch]
+    assert lengths == sorted(lengths, reverse=True)
+
+
+def test_long_clip_is_split_and_joined_in_order():
+    audio = np.concatenate([tone(20.0), np.zeros(SAMPLE_RATE, dtype=np.float32), tone(20.0)])
+    [text] = transcribe_batch([audio], vad=False, batch_size=4)
+    window = openai_whisper_STT.VAD_MAX_CHUNK
+    assert text == f"{window:.1f} {41.0 - window:.1f}"
+
+
+def test_accepts_paths_and_bytes(tmp_path):
+    import io
+    import wave
+
+    samples = (tone(1.0) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    path = tmp_path / "answer.wav"
+    path.write_bytes(buffer.getvalue())
+
+    assert transcribe_batch([str(path), buffer.getvalue()], vad=False) == ["1.0", "1.0"]
+
+
+def test_batching_beats_one_by_one():
+    clips = [tone(2.0 + i % 5) for i in range(16)]
+
+    start = time.perf_counter()
+    transcribe_batch(clips, vad=False, batch_size=1)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transcribe_batch(clips, vad=False, batch_size=8)
+    batched = time.perf_counter() - start
+
+    print(f"\n[BATCH] 16 записей: по одной {single:.2f}s, пачками по 8 {batched:.2f}s")
+    assert batched < single / 2
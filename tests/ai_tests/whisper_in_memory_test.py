@@ -0,0 +1,83 @@
+import os
+import io
+import sys
+import wave
+import subprocess
+
+import numpy as np
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import openai_whisper_STT
+from openai_whisper_STT import decode_audio_bytes, transcribe_audio_data, SAMPLE_RATE
+
+
+def make_webm_opus(duration=1.5, frequency=440):
+    """Кодирует синусоиду в webm/opus — так же, как MediaRecorder в браузере."""
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency={frequency}:duration={duration}",
+        "-c:a", "libopus", "-f", "webm", "pipe:1",
+    ]
+    return subprocess.run(command, capture_output=True, check=True).stdout
+
+
+def make_wav(duration=1.0, sr=44100):
+    t = np.arange(int(duration * sr)) / sr
+    samples = (0.5 * np.sin(2 * np.pi * 440 * t) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sr)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """Подменяет модель: проверяем, что именно попадает в Whisper."""
+    calls = []
+
+    def fake_transcribe(audio, language="ru", backend=None, options=None):
+        calls.append(audio)
+        return "текст"
+
+    monkeypatch.setattr(openai_whisper_STT, "transcribe_audio", fake_transcribe)
+    return calls
+
+
+def test_decode_webm_opus_from_memory():
+    audio = decode_audio_bytes(make_webm_opus(duration=1.5))
+    assert audio.dtype == np.float32
+    assert abs(len(audio) - 1.5 * SAMPLE_RATE) < 0.05 * SAMPLE_RATE
+    assert 0.1 < np.abs(audio).max() <= 1.0
+
+
+def test_decode_resamples_wav_to_16k():
+    audio = decode_audio_bytes(make_wav(duration=1.0, sr=44100))
+    assert abs(len(audio) - SAMPLE_RATE) < 0.01 * SAMPLE_RATE
+
+
+def test_decode_rejects_garbage():
+    with pytest.raises(RuntimeError):
+        decode_audio_bytes(b"not an audio file")
+
+
+def test_transcribe_bytes_passes_array_to_model(captured):
+    assert transcribe_audio_data(make_webm_opus()) == "текст"
+    assert isinstance(captured[0], np.ndarray) and captured[0].dtype == np.float32
+
+
+def test_transcribe_array_is_passed_through(captured):
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float64)
+    transcribe_audio_data(audio, vad=False)
+    assert captured[0].dtype == np.float32 and len(captured[0]) == SAMPLE_RATE
+
+
+def test_transcribe_rejects_stereo_and_paths(captured):
+    with pytest.raises(ValueError):
+        transcribe_audio_data(np.zeros((2, SAMPLE_RATE), dtype=np.float32))
+    with pytest.raises(TypeError):
+        transcribe_audio_data("audio.wav")
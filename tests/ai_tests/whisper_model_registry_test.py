@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import types
+import threading
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import openai_whisper_STT
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    """Подменяет whisper.load_model: считаем загрузки, не скачивая веса."""
+    loads = []
+
+    def load_model(name, device=None):
+        time.sleep(0.1)  # загрузка модели — долгая операция
+        loads.append((name, device))
+        return object()
+
+    monkeypatch.setitem(sys.modules, "whisper", types.SimpleNamespace(load_model=load_model))
+    monkeypatch.setattr(openai_whisper_STT, "_models", {})
+    return loads
+
+
+def test_import_does_not_load_model():
+    # Модель больше не создаётся при импорте модуля
+    assert not hasattr(openai_whisper_STT, "model")
+
+
+def test_model_is_loaded_once_across_threads(loader):
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(openai_whisper_STT.get_model("small", "cpu")))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loader == [("small", "cpu")]
+    assert len({id(m) for m in results}) == 1
+
+
+def test_registry_keeps_models_per_name_and_device(loader):
+    small = openai_whisper_STT.get_model("small", "cpu")
+    large = openai_whisper_STT.get_model("large-v3", "cpu")
+    assert small is not large
+    assert openai_whisper_STT.get_model("small", "cpu") is small
+    assert len(loader) == 2
+
+
+def test_defaults_come_from_environment(loader, monkeypatch):
+    monkeypatch.setattr(openai_whisper_STT, "WHISPER_MODEL", "small")
+    monkeypatch.setattr(openai_whisper_STT, "WHISPER_DEVICE", "cpu")
+    openai_whisper_STT.get_model()
+    assert loader == [("small", "cpu")]
+
+
+def test_compute_type_follows_device():
+    assert openai_whisper_STT.resolve_compute_type("cpu", "auto") == "float32"
+    assert openai_whisper_STT.resolve_compute_type("cuda", "auto") == "float16"
+    assert openai_whisper_STT.resolve_compute_type("cpu", "float16") == "float16"
+
+
+def test_faster_whisper_defaults_to_int8_on_cpu():
+    assert openai_whisper_STT.resolve_compute_type("cpu", "auto", "faster-whisper") == "int8"
+    assert openai_whisper_STT.resolve_compute_type("cuda", "auto", "faster-whisper") == "float16"
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        openai_whisper_STT.get_backend("vosk", device="cpu")
+
+
+def test_backend_is_created_once(monkeypatch):
+    """Подменяет faster_whisper.WhisperModel: проверяем реестр реализаций без весов."""
+    created = []
+
+    class WhisperModel:
+        def __init__(self, name, device, compute_type, cpu_threads=0):
+            created.append((name, device, compute_type))
+
+        def transcribe(self, audio, language="ru", **kwargs):
+            segments = [types.SimpleNamespace(text=" Расскажите"), types.SimpleNamespace(text=" о себе.")]
+            return iter(segments), None
+
+    monkeypatch.setitem(sys.modules, "faster_whisper", types.SimpleNamespace(WhisperModel=WhisperModel))
+    monkeypatch.setattr(openai_whisper_STT, "_backends", {})
+    monkeypatch.setattr(openai_whisper_STT, "STT_BACKEND", "faster-whisper")
+    monkeypatch.setattr(openai_whisper_STT, "WHISPER_DEVICE", "cpu")
+
+    text = openai_whisper_STT.transcribe_audio("audio.wav")
+    openai_whisper_STT.get_backend()
+    assert text == "Расскажите о себе."
+    assert created == [(openai_whisper_STT.WHISPER_MODEL, "cpu", "int8")]
+
+
+@pytest.fixture
+def recorded_calls(monkeypatch):
+    """Подменяет whisper.load_model моделью, которая запоминает параметры декодирования."""
+    calls = []
+
+    class Model:
+        def transcribe(self, audio, **kwargs):
+            calls.append(kwargs)
+            return {"segments": [{"text": " Добрый день."}]}
+
+    monkeypatch.setitem(sys.modules, "whisper", types.SimpleNamespace(load_model=lambda name, device=None: Model()))
+    monkeypatch.setattr(openai_whisper_STT, "_models", {})
+    monkeypatch.setattr(openai_whisper_STT, "_backends", {})
+    monkeypatch.setattr(openai_whisper_STT, "STT_BACKEND", "openai-whisper")
+    monkeypatch.setattr(openai_whisper_STT, "WHISPER_DEVICE", "cpu")
+    return calls
+
+
+def test_fast_profile_is_greedy_without_word_timestamps(recorded_calls):
+    assert openai_whisper_STT.transcribe_audio("audio.wav", options="fast") == "Добрый день."
+    call = recorded_calls[0]
+    assert call["word_timestamps"] is False
+    assert call["beam_size"] is None and call["temperature"] == (0.0,)
+    assert call["verbose"] is None
+
+
+def test_detailed_profile_keeps_word_timestamps(recorded_calls):
+    openai_whisper_STT.transcribe_audio("audio.wav", options="detailed")
+    assert recorded_calls[0]["word_timestamps"] is True
+    assert recorded_calls[0]["beam_size"] == 5
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        openai_whisper_STT.resolve_options("ultra")
@@ -13,6 +13,7 @@ warnings.filterwarnings('ignore')
 import random
 # Добавляем путь к вашему модулю Whisper
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'interview_module')))
+import openai_whisper_STT
 from openai_whisper_STT import transcribe_audio
 
 # Для метрик WER/CER
@@ -34,7 +35,8 @@ except ImportError:
 class WhisperEvaluator:
     """Класс для оценки качества распознавания речи Whisper"""
     
-    def __init__(self, model_name="large-v3", language="ru", use_gpu=True):
+    def __init__(self, model_name="large-v3", language="ru", use_gpu=True, backend=None, profile=None,
+                 batch_size=1):
         """
         Инициализация оценщика STT
         
@@ -42,15 +44,27 @@ class WhisperEvaluator:
             model_name: название модели Whisper
             language: язык распознавания
             use_gpu: использовать ли GPU
+            backend: реализация распознавания (openai-whisper / faster-whisper)
+            profile: профиль декодирования (fast / detailed)
+            batch_size: размер пачки; больше 1 — весь датасет распознаётся через transcribe_batch
         """
         self.device = "cuda" if torch.cuda.is_available() and use_gpu else "cpu"
         self.language = language
+        self.model_name = model_name
+        self.backend = backend or openai_whisper_STT.STT_BACKEND
+        self.profile = profile or openai_whisper_STT.STT_PROFILE
+        self.options = openai_whisper_STT.resolve_options(self.profile)
+        self.batch_size = batch_size
         print(f"Устройство: {self.device}")
         print(f"Язык: {language}")
+        print(f"Реализация: {self.backend}, профиль: {self.profile}")
         
-        # Загружаем модель Whisper (уже загружена в импортированном модуле)
-        # Функция transcribe_audio уже использует загруженную модель
-        print("Модель Whisper готова к использованию")
+        # Загружаем модель Whisper через реестр реализаций модуля STT
+        # Пакетная транскрипция берёт модель по умолчанию — настраиваем её так же
+        openai_whisper_STT.WHISPER_MODEL = model_name
+        openai_whisper_STT.WHISPER_DEVICE = self.device
+        self.stt = openai_whisper_STT.get_backend(self.backend, model_name, self.device)
+        print(f"Модель Whisper {model_name} ({self.stt.compute_type}) готова к использованию")
         
         # Подготовка метрик
         self.metrics = {}
@@ -189,35 +203,68 @@ class WhisperEvaluator:
         return transcripts
     
     def transcribe_audio_file(self, audio_path):
-        """Транскрибирует аудиофайл с помощью Whisper"""
+        """
+        Транскрибирует аудиофайл с помощью Whisper
+        
+        Returns:
+            (текст, время распознавания в секундах) или (None, None) при ошибке
+        """
         try:
             # Проверяем существование файла
             if not os.path.exists(audio_path):
                 print(f"Файл не найден: {audio_path}")
-                return None
+                return None, None
             
             # Проверяем расширение файла
             if not audio_path.lower().endswith(('.mp3', '.wav', '.ogg', '.flac', '.m4a')):
                 print(f"Неподдерживаемый формат: {audio_path}")
-                return None
+                return None, None
             
             print(f"Транскрибирую: {os.path.basename(audio_path)}")
             
-            # Вызываем функцию транскрипции
-            start_time = time.time()
-            transcribed_text = transcribe_audio(audio_path, language=self.language)
-            transcription_time = time.time() - start_time
+            # Вызываем выбранную реализацию транскрипции
+            start_time = time.perf_counter()
+            transcribed_text = self.stt.transcribe(audio_path, language=self.language, options=self.options)
+            transcription_time = time.perf_counter() - start_time
             
             print(f"  Время: {transcription_time:.2f} сек")
             print(f"  Результат: {transcribed_text[:50]}...")
             
-            return transcribed_text
+            return transcribed_text, transcription_time
             
         except Exception as e:
             print(f"Ошибка транскрипции {audio_path}: {e}")
             import traceback
             traceback.print_exc()
-            return None
+            return None, None
+    
+    def transcribe_dataset_batched(self, dataset):
+        """
+        Распознаёт все файлы датасета одним вызовом transcribe_batch
+        
+        Returns:
+            словарь {путь: (текст, время)}; время пачки делится между файлами
+            пропорционально длительности аудио
+        """
+        paths = [item['audio_path'] for item in dataset]
+        durations = [librosa.get_duration(path=path) for path in paths]
+        
+        start_time = time.perf_counter()
+        texts = openai_whisper_STT.transcribe_batch(
+            paths,
+            language=self.language,
+            backend=self.backend,
+            options=self.options,
+            batch_size=self.batch_size
+        )
+        total_time = time.perf_counter() - start_time
+        print(f"Пакетная транскрипция {len(paths)} файлов: {total_time:.2f} сек")
+        
+        total_duration = sum(durations) or 1.0
+        return {
+            path: (text, total_time * duration / total_duration)
+            for path, text, duration in zip(paths, texts, durations)
+        }
     
     def compute_wer_jiwer(self, reference, hypothesis):
         """Вычисляет WER с помощью jiwer"""
@@ -289,27 +336,40 @@ class WhisperEvaluator:
         print(f"\nНачинаю оценку на {len(dataset)} примерах...")
         print("="*60)
         
+        # В пакетном режиме весь датасет распознаётся заранее общими пачками
+        batched = self.transcribe_dataset_batched(dataset) if self.batch_size > 1 else None
+        
         for i, item in enumerate(dataset):
             print(f"\n[{i+1}/{len(dataset)}] {item['filename']}")
             print(f"  Папка: {item['folder']}")
             print(f"  Ground truth: {item['ground_truth'][:50]}...")
             
             # Транскрибируем аудио
-            hypothesis = self.transcribe_audio_file(item['audio_path'])
+            if batched is not None:
+                hypothesis, transcription_time = batched[item['audio_path']]
+            else:
+                hypothesis, transcription_time = self.transcribe_audio_file(item['audio_path'])
             
             if hypothesis is None:
                 print("  Пропуск: ошибка транскрипции")
                 continue
             
             # Вычисляем метрики
+            audio_duration = librosa.get_duration(path=item['audio_path'])
             metrics = {
                 'audio_path': item['audio_path'],
                 'folder': item['folder'],
                 'filename': item['filename'],
+                'backend': self.backend,
+                'profile': self.profile,
                 'ground_truth': item['ground_truth'],
                 'transcription': hypothesis,
                 'ground_truth_length': len(item['ground_truth']),
-                'transcription_length': len(hypothesis)
+                'transcription_length': len(hypothesis),
+                'transcription_time': transcription_time,
+                'audio_duration': audio_duration,
+                # Real-time factor: доля длительности записи, потраченная на распознавание
+                'rtf': transcription_time / audio_duration if audio_duration > 0 else None
             }
             
             # WER с jiwer
@@ -340,6 +400,8 @@ class WhisperEvaluator:
                 print(f"  CER: {metrics['cer_percent']:.2f}%")
             if 'word_accuracy' in metrics:
                 print(f"  Word Accuracy: {metrics['word_accuracy_percent']:.2f}%")
+            if metrics['rtf'] is not None:
+                print(f"  RTF: {metrics['rtf']:.3f}")
             
             # Небольшая пауза между обработкой файлов
             time.sleep(0.1)
@@ -364,12 +426,19 @@ class WhisperEvaluator:
     def print_statistics(self, df):
         """Выводит статистику по результатам"""
         print("\n" + "="*60)
-        print("РЕЗУЛЬТАТЫ ОЦЕНКИ WHISPER")
+        print(f"РЕЗУЛЬТАТЫ ОЦЕНКИ WHISPER ({self.backend}, {self.profile}, {self.model_name})")
         print("="*60)
         
         print(f"\nОбщие результаты:")
         print(f"  Всего примеров: {len(df)}")
         
+        if 'rtf' in df.columns:
+            print(f"\nСкорость (RTF = время распознавания / длительность аудио):")
+            print(f"  Средний RTF: {df['rtf'].mean():.3f}")
+            print(f"  Суммарный RTF: {self.total_rtf(df):.3f}")
+            print(f"  Медиана: {df['rtf'].median():.3f}")
+            print(f"  Максимум: {df['rtf'].max():.3f}")
+        
         if 'wer' in df.columns:
             print(f"\nМетрика WER (Word Error Rate):")
             print(f"  Средний: {df['wer_percent'].mean():.2f}%")
@@ -420,6 +489,11 @@ class WhisperEvaluator:
                 print(f"  {row['filename']}: WER={row['wer_percent']:.2f}%")
                 print(f"    Текст: {row['ground_truth'][:50]}...")
     
+    @staticmethod
+    def total_rtf(df):
+        """Суммарный RTF: общее время распознавания к общей длительности аудио"""
+        return df['transcription_time'].sum() / df['audio_duration'].sum()
+    
     def save_results(self, df):
         """Сохраняет результаты в файлы"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -429,21 +503,30 @@ class WhisperEvaluator:
         os.makedirs(results_dir, exist_ok=True)
         
         # Сохраняем полные результаты в CSV
-        csv_filename = f"{results_dir}/whisper_results_{timestamp}.csv"
+        csv_filename = f"{results_dir}/whisper_results_{self.backend}_{self.profile}_{timestamp}.csv"
         df.to_csv(csv_filename, index=False, encoding='utf-8')
         print(f"\nПолные результаты сохранены в: {csv_filename}")
         
         # Сохраняем сводную статистику
-        stats_filename = f"{results_dir}/whisper_stats_{timestamp}.txt"
+        stats_filename = f"{results_dir}/whisper_stats_{self.backend}_{self.profile}_{timestamp}.txt"
         with open(stats_filename, 'w', encoding='utf-8') as f:
             f.write("СВОДНАЯ СТАТИСТИКА ОЦЕНКИ WHISPER\n")
             f.write("="*60 + "\n")
             f.write(f"Дата оценки: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"Модель: Whisper large-v3\n")
+            f.write(f"Модель: Whisper {self.model_name}\n")
+            f.write(f"Реализация: {self.backend} ({self.stt.compute_type})\n")
+            f.write(f"Профиль: {self.profile} {self.options}\n")
+            f.write(f"Размер пачки: {self.batch_size}\n")
             f.write(f"Язык: {self.language}\n")
             f.write(f"Устройство: {self.device}\n")
             f.write(f"Всего примеров: {len(df)}\n\n")
             
+            if 'rtf' in df.columns:
+                f.write("Скорость (RTF = время распознавания / длительность аудио):\n")
+                f.write(f"  Средний RTF: {df['rtf'].mean():.3f}\n")
+                f.write(f"  Суммарный RTF: {self.total_rtf(df):.3f}\n")
+                f.write(f"  Медиана: {df['rtf'].median():.3f}\n\n")
+            
             if 'wer_percent' in df.columns:
                 f.write("Метрика WER (Word Error Rate):\n")
                 f.write(f"  Средний: {df['wer_percent'].mean():.2f}%\n")
@@ -482,6 +565,9 @@ def main():
   python whisper_evaluator.py                    # Быстрый тест (10 примеров)
   python whisper_evaluator.py --max_samples 50   # 50 примеров
   python whisper_evaluator.py --max_per_folder 10  # 10 примеров из каждой папки
+  python whisper_evaluator.py --backends faster-whisper --model medium  # только CTranslate2 int8
+  python whisper_evaluator.py --profiles fast   # только профиль ходов интервью
+  python whisper_evaluator.py --batch_size 8    # пакетная транскрипция пачками по 8
         
 Пути по умолчанию:
   Базовая директория: data/speech_dataset/ru/
@@ -505,6 +591,14 @@ def main():
                        help='Не использовать GPU даже если доступен')
     parser.add_argument('--quick_test', action='store_true',
                        help='Быстрый тест (5 примеров из каждой папки)')
+    parser.add_argument('--model', type=str, default='large-v3',
+                       help='Модель Whisper (по умолчанию: large-v3)')
+    parser.add_argument('--backends', type=str, default='openai-whisper,faster-whisper',
+                       help='Реализации для сравнения через запятую (по умолчанию: обе)')
+    parser.add_argument('--profiles', type=str, default='fast,detailed',
+                       help='Профили декодирования через запятую (по умолчанию: fast,detailed)')
+    parser.add_argument('--batch_size', type=int, default=1,
+                       help='Размер пачки для пакетной транскрипции (по умолчанию: 1 — по одному файлу)')
     
     args = parser.parse_args()
     
@@ -529,33 +623,61 @@ def main():
     print(f"Файл транскриптов: {args.transcript}")
     print(f"Максимум на папку: {args.max_per_folder}")
     
-    # Создаем оценщик
-    evaluator = WhisperEvaluator(
-        language=args.language,
-        use_gpu=not args.no_gpu
-    )
-    
-    # Загружаем датасет
-    dataset = evaluator.load_audio_dataset(
-        base_dir=args.base_dir,
-        transcript_file=args.transcript,
-        max_samples_per_folder=args.max_per_folder
-    )
-    
-    if not dataset:
-        print("Не удалось загрузить датасет")
-        return
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    profiles = [name.strip() for name in args.profiles.split(',') if name.strip()]
+    results = {}
+    dataset = None
     
-    # Запускаем оценку
-    results = evaluator.evaluate_on_dataset(
-        dataset=dataset,
-        max_samples=args.max_samples,
-        save_results=True
-    )
+    for backend, profile in [(b, p) for b in backends for p in profiles]:
+        # Создаем оценщик для каждой пары реализация/профиль (модель берётся из реестра)
+        evaluator = WhisperEvaluator(
+            model_name=args.model,
+            language=args.language,
+            use_gpu=not args.no_gpu,
+            backend=backend,
+            profile=profile,
+            batch_size=args.batch_size
+        )
+        
+        # Загружаем датасет один раз: все реализации оцениваются на одних и тех же файлах
+        if dataset is None:
+            dataset = evaluator.load_audio_dataset(
+                base_dir=args.base_dir,
+                transcript_file=args.transcript,
+                max_samples_per_folder=args.max_per_folder
+            )
+            if not dataset:
+                print("Не удалось загрузить датасет")
+                return
+            if args.max_samples and len(dataset) > args.max_samples:
+                dataset = random.sample(dataset, args.max_samples)
+        
+        # Запускаем оценку
+        results[f"{backend}/{profile}"] = evaluator.evaluate_on_dataset(
+            dataset=dataset,
+            save_results=True
+        )
     
+    print_backend_comparison(results)
     return results
 
 
+def print_backend_comparison(results):
+    """Сводная таблица качества и скорости по реализациям и профилям"""
+    print("\n" + "="*60)
+    print("СРАВНЕНИЕ РЕАЛИЗАЦИЙ И ПРОФИЛЕЙ")
+    print("="*60)
+    print(f"{'Реализация/профиль':<26} {'WER, %':>8} {'CER, %':>8} {'RTF':>8} {'Время, с':>10}")
+    for backend, df in results.items():
+        if df is None:
+            print(f"{backend:<26} нет результатов")
+            continue
+        wer_mean = df['wer_percent'].mean() if 'wer_percent' in df.columns else float('nan')
+        cer_mean = df['cer_percent'].mean() if 'cer_percent' in df.columns else float('nan')
+        print(f"{backend:<26} {wer_mean:>8.2f} {cer_mean:>8.2f} "
+              f"{WhisperEvaluator.total_rtf(df):>8.3f} {df['transcription_time'].sum():>10.1f}")
+
+
 if __name__ == "__main__":
     # Устанавливаем seed для воспроизводимости
     random.seed(42)
@@ -565,7 +687,7 @@ if __name__ == "__main__":
     try:
         results = main()
         
-        if results is not None:
+        if results:
             print("\n" + "="*60)
             print("ОЦЕНКА ЗАВЕРШЕНА УСПЕШНО!")
             print("="*60)
@@ -0,0 +1,92 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+import openai_whisper_STT
+from openai_whisper_STT import detect_speech, split_speech, transcribe_audio_data, SAMPLE_RATE
+
+rng = np.random.default_rng(0)
+
+
+def silence(seconds):
+    """Фон микрофона: слабый шум около -60 dBFS."""
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.001).astype(np.float32)
+
+
+def speech(seconds):
+    """«Речь»: тон с огибающей слогов ~4 Гц и шумом."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.6 + 0.4 * np.abs(np.sin(2 * np.pi * 4 * t))
+    voice = 0.3 * envelope * np.sin(2 * np.pi * 220 * t) + 0.02 * rng.standard_normal(len(t))
+    return voice.astype(np.float32)
+
+
+def typical_answer():
+    """Кандидат зажал кнопку: 2 с тишины, ответ с паузой, 3 с тишины в конце."""
+    return np.concatenate([silence(2.0), speech(1.5), silence(1.0), speech(2.0), silence(3.0)])
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """Подменяет модель: запоминаем длительности кусков, которые дошли бы до Whisper."""
+    calls = []
+
+    def fake_transcribe(audio, language="ru", backend=None, options=None):
+        calls.append(len(audio) / SAMPLE_RATE)
+        return f"кусок {len(calls)}"
+
+    monkeypatch.setattr(openai_whisper_STT, "transcribe_audio", fake_transcribe)
+    return calls
+
+
+def test_detects_speech_boundaries():
+    segments = detect_speech(typical_answer())
+    # Пауза в 1 с длиннее VAD_MIN_SILENCE: два фрагмента
+    assert len(segments) == 2
+    (first_start, first_end), (second_start, second_end) = [(s / SAMPLE_RATE, e / SAMPLE_RATE) for s, e in segments]
+    assert abs(first_start - 2.0) < 0.3 and abs(first_end - 3.5) < 0.3
+    assert abs(second_start - 4.5) < 0.3 and abs(second_end - 6.5) < 0.3
+
+
+def test_short_pause_stays_inside_phrase():
+    audio = np.concatenate([silence(1.0), speech(1.0), silence(0.2), speech(1.0), silence(1.0)])
+    assert len(detect_speech(audio)) == 1
+
+
+def test_typical_answer_is_trimmed(captured):
+    audio = typical_answer()
+    text = transcribe_audio_data(audio)
+
+    decoded = sum(captured)
+    total = len(audio) / SAMPLE_RATE
+    print(f"\n[VAD] запись {total:.1f} с -> в модель {decoded:.1f} с ({len(captured)} кусок)")
+    # Оба фрагмента речи склеены в один кусок, тишина в начале и конце отброшена
+    assert text == "кусок 1"
+    assert decoded < 0.6 * total
+
+
+def test_long_answer_is_split_into_windows(captured):
+    audio = np.concatenate([speech(20.0), silence(1.0), speech(20.0), silence(1.0), speech(20.0)])
+    transcribe_audio_data(audio)
+    assert len(captured) >= 3
+    assert max(captured) <= openai_whisper_STT.VAD_MAX_CHUNK
+
+
+def test_silence_skips_model(captured):
+    assert transcribe_audio_data(silence(5.0)) == ""
+    assert captured == []
+
+
+def test_skipped_seconds_are_reported(monkeypatch, captured):
+    monkeypatch.setattr(openai_whisper_STT, "vad_stats", {"audio_seconds": 0.0, "skipped_seconds": 0.0})
+    audio = typical_answer()
+    _, skipped = split_speech(audio)
+    transcribe_audio_data(audio)
+
+    assert openai_whisper_STT.vad_stats["audio_seconds"] == pytest.approx(len(audio) / SAMPLE_RATE)
+    assert openai_whisper_STT.vad_stats["skipped_seconds"] == pytest.approx(skipped)
+    assert 3.5 < skipped < 6.0
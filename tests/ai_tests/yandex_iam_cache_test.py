@@ -0,0 +1,143 @@
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Добавляем путь к Real_time_HR
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Real_time_HR')))
+from yandex_iam import IamTokenCache, parse_expires_at
+
+
+class FakeIamServer:
+    """Локальная заглушка iam.api.cloud.yandex.net: выдаёт токены с заданным сроком жизни."""
+
+    def __init__(self, ttl=3600, delay=0.0):
+        self.ttl = ttl
+        self.delay = delay
+        self.requests = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake.lock:
+                    fake.requests += 1
+                    number = fake.requests
+                time.sleep(fake.delay)
+                if body.get("yandexPassportOauthToken") != "oauth-test":
+                    self.send_response(401)
+                    self.end_headers()
+                    return
+                expires = datetime.fromtimestamp(time.time() + fake.ttl, tz=timezone.utc)
+                payload = json.dumps({
+                    "iamToken": f"iam-{number}",
+                    "expiresAt": expires.strftime("%Y-%m-%dT%H:%M:%S.%f") + "123Z",
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/iam/v1/tokens"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def iam_server():
+    server = FakeIamServer()
+    yield server
+    server.close()
+
+
+def test_parse_expires_at_nanoseconds():
+    ts = parse_expires_at("2024-02-15T01:51:42.116540123Z")
+    assert ts == datetime(2024, 2, 15, 1, 51, 42, 116540, tzinfo=timezone.utc).timestamp()
+
+
+def test_token_is_reused_until_expiry(iam_server):
+    cache = IamTokenCache("oauth-test", iam_url=iam_server.url)
+    try:
+        tokens = {cache.get_token() for _ in range(10)}
+        assert tokens == {"iam-1"}
+        assert iam_server.requests == 1
+        assert cache.stats()["fetches"] == 1
+        assert cache.stats()["fetches_avoided"] == 9
+    finally:
+        cache.close()
+
+
+def test_concurrent_callers_share_single_fetch(iam_server):
+    iam_server.delay = 0.2
+    cache = IamTokenCache("oauth-test", iam_url=iam_server.url)
+    results = []
+
+    def worker():
+        results.append(cache.get_token())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == ["iam-1"] * 8
+        assert iam_server.requests == 1
+        assert cache.fetches_avoided == 7
+    finally:
+        cache.close()
+
+
+def test_expired_token_is_fetched_again(iam_server):
+    # Токен живёт 2 секунды, а считается устаревшим за 5 секунд до истечения
+    iam_server.ttl = 2
+    cache = IamTokenCache("oauth-test", iam_url=iam_server.url, expiry_margin=5)
+    try:
+        cache.close()  # отключаем фоновое обновление, проверяем синхронный путь
+        assert cache.get_token() == "iam-1"
+        assert cache.get_token() == "iam-2"
+        assert cache.fetches_avoided == 0
+    finally:
+        cache.close()
+
+
+def test_background_refresh_before_expiry(iam_server):
+    cache = IamTokenCache("oauth-test", iam_url=iam_server.url, refresh_interval=0.3)
+    try:
+        assert cache.get_token() == "iam-1"
+        deadline = time.time() + 5
+        while cache.background_refreshes == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert cache.background_refreshes >= 1
+        # Новый токен получен фоном — вызывающий код в IAM не ходит
+        assert cache.get_token() != "iam-1"
+        assert cache.fetches_avoided >= 1
+    finally:
+        cache.close()
+
+
+def test_failed_background_refresh_keeps_old_token(iam_server):
+    cache = IamTokenCache("oauth-test", iam_url=iam_server.url, refresh_interval=0.2, retry_delay=60)
+    try:
+        assert cache.get_token() == "iam-1"
+        cache.oauth_token = "revoked"
+        deadline = time.time() + 5
+        while cache.refresh_errors == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert cache.refresh_errors == 1
+        assert cache.get_token() == "iam-1"
+    finally:
+        cache.close()
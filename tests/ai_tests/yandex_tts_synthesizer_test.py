@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import threading
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Добавляем путь к interview_module
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'interview_module')))
+import Yandex_TTS1
+import tts_cache
+from Yandex_TTS1 import Synthesizer
+
+# Имитация установки TLS-соединения с SpeechKit
+HANDSHAKE_SECONDS = 0.03
+
+
+class FakeSpeechKit:
+    """Локальный REST-endpoint синтеза: считает соединения и проверяет токен."""
+
+    def __init__(self, valid_token="fresh-token"):
+        self.valid_token = valid_token
+        self.connections = set()
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                time.sleep(HANDSHAKE_SECONDS)
+
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+                fake.connections.add(self.client_address)
+                fake.requests.append(form)
+                if self.headers["Authorization"] != f"Bearer {fake.valid_token}":
+                    payload, status = b'{"error": "unauthorized"}', 401
+                else:
+                    payload, status = b"OggS" + form["text"][0].encode(), 200
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}/speech/v1/tts:synthesize"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def speechkit():
+    server = FakeSpeechKit()
+    yield server
+    server.close()
+
+
+class FakeIamCache:
+    def __init__(self, tokens):
+        self.tokens = list(tokens)
+        self.invalidations = 0
+
+    def get_token(self):
+        return self.tokens[0]
+
+    def invalidate(self):
+        self.invalidations += 1
+        self.tokens.pop(0)
+
+
+@pytest.fixture
+def iam(monkeypatch):
+    cache = FakeIamCache(["fresh-token"])
+    monkeypatch.setattr(Yandex_TTS1, "get_cached_iam_token", cache.get_token)
+    monkeypatch.setattr(Yandex_TTS1, "get_iam_cache", lambda: cache)
+    return cache
+
+
+def test_phrases_reuse_one_connection(speechkit, iam):
+    synthesizer = Synthesizer(folder_id="folder", url=speechkit.url)
+    try:
+        start = time.perf_counter()
+        audios = [synthesizer.synthesize(f"Вопрос номер {i}.", "oksana") for i in range(10)]
+        elapsed = time.perf_counter() - start
+    finally:
+        synthesizer.close()
+
+    print(f"\n[TTS] 10 фраз за {elapsed:.3f}s, соединений: {len(speechkit.connections)}")
+    assert audios[3] == "OggSВопрос номер 3.".encode()
+    assert len(speechkit.connections) == 1
+    assert speechkit.requests[0]["folderId"] == ["folder"]
+    assert speechkit.requests[0]["voice"] == ["oksana"]
+
+
+def test_expired_token_is_refreshed_once(speechkit, iam):
+    iam.tokens = ["revoked-token", "fresh-token"]
+    synthesizer = Synthesizer(folder_id="folder", url=speechkit.url)
+    try:
+        assert synthesizer.synthesize("Здравствуйте!", "alyss") == "OggSЗдравствуйте!".encode()
+    finally:
+        synthesizer.close()
+    assert iam.invalidations == 1
+    assert len(speechkit.requests) == 2
+
+
+def test_text_to_audio_uses_process_synthesizer(speechkit, iam, monkeypatch, tmp_path):
+    monkeypatch.setattr(Yandex_TTS1, "_synthesizer", Synthesizer(folder_id="folder", url=speechkit.url))
+    monkeypatch.setattr(tts_cache, "_default_cache", tts_cache.TtsCache(str(tmp_path)))
+    first = Yandex_TTS1.get_synthesizer()
+    Yandex_TTS1.text_to_audio("Первая фраза.")
+    Yandex_TTS1.text_to_audio("Вторая фраза.")
+    assert Yandex_TTS1.get_synthesizer() is first
+    assert len(speechkit.connections) == 1
+
+
+def test_text_to_audio_reuses_cached_phrase(speechkit, iam, monkeypatch, tmp_path):
+    monkeypatch.setattr(Yandex_TTS1, "_synthesizer", Synthesizer(folder_id="folder", url=speechkit.url))
+    monkeypatch.setattr(tts_cache, "_default_cache", tts_cache.TtsCache(str(tmp_path)))
+    greeting = "Благодарю за интервью!"
+    assert Yandex_TTS1.text_to_audio(greeting, "alyss") == Yandex_TTS1.text_to_audio(greeting, "alyss")
+    assert len(speechkit.requests) == 1